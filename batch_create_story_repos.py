@@ -1,16 +1,69 @@
 import yaml
 import os
+import argparse
+import socket
+import threading
+import time
 from datetime import datetime
 
 from google_functions import fetch_repo_data_from_google_sheet
 from google_functions import copy_story_data_sheet_to_new_sheet
 from google_functions import share_sheet_with_anyone
 from google_functions import edit_sheet_with_project_info
+from google_functions import sanitize_sheet_name
+from google_functions import write_back_urls_to_input_sheet
+from google_functions import get_drive_file_modified_time
+from google_functions import list_google_sheets
+from google_functions import get_story_info_for_sheets
+from google_functions import rename_google_files
+from google_functions import update_story_info_for_sheets
+from google_functions import copy_google_sheets
+from google_functions import share_sheets_with_anyone
 
 from github_functions import login_to_github
 from github_functions import create_repo_from_template
 from github_functions import update_repo_with_google_data_sheet_link
 from github_functions import enable_github_page
+from github_functions import ensure_team
+from github_functions import add_members_to_team
+from github_functions import add_repos_to_team
+from github_functions import create_empty_repo
+from github_functions import get_git_auth_header
+from github_functions import is_repo_empty
+from github_functions import list_owner_repos
+from github_functions import update_repo_descriptions
+from github_functions import get_github_executor
+from github_functions import RepoHandle
+from github_functions import get_rate_limit
+
+from git_functions import ensure_template_cache
+from git_functions import create_commit_with_data_sheet_link
+from git_functions import push_commit_to_repo
+
+from validation_functions import build_name_collision_index
+from validation_functions import run_preflight_checks
+from validation_functions import check_template_repo
+from validation_functions import check_template_file
+from validation_functions import check_template_sheet
+from validation_functions import check_sheet_folder
+from validation_functions import check_github_token
+from validation_functions import check_github_quota
+from validation_functions import check_owner_access
+
+from input_functions import fetch_repo_data_from_file
+
+from queue_functions import ProjectQueue
+
+from pipeline_functions import Stage
+from pipeline_functions import StageResult
+from pipeline_functions import run_pipeline
+
+from sync_functions import locate_project_resources
+from sync_functions import build_sync_plan
+
+from watch_functions import DriveChangesSource
+from watch_functions import watch_for_changes
+from watch_functions import select_new_projects
 
 
 # --- Load config from YAML ---
@@ -27,26 +80,99 @@ BATCH_REPO_NAME_PREFIX = gh_config["batch_repo_name_prefix"]
 BATCH_REPO_DESCRIPTION_PREFIX = gh_config["batch_repo_description_prefix"]
 BATCH_FILE_NAME_TO_EDIT = gh_config["batch_file_name_to_edit_with_new_story_sheet_id"]
 BATCH_FILE_VARIABLE_TO_EDIT = gh_config["batch_file_variable_to_edit_with_new_data_sheet_id"]
+BATCH_TEAM_MODE = gh_config.get("batch_team_mode", "project")
+PROVISIONING_ENGINE = gh_config.get("provisioning_engine", "generate")
+LOCAL_GIT_CACHE_DIR = gh_config.get("local_git_cache_dir", ".cache/template-repo.git")
 
 # Google config
 g_config = config["google"]
-INPUT_DATA_SHEET_ID = g_config["input_data_sheet_id"]
+INPUT_DATA_SHEET_ID = g_config.get("input_data_sheet_id", None)
+INPUT_FILE = g_config.get("input_file", None)
+INPUT_DATA_SHEET_TABS = g_config.get("input_data_sheet_tabs", None)
 TEMPLATE_SHEET_ID = g_config["template_sheet_id"]
 BATCH_SHEET_NAME_PREFIX = g_config["batch_sheet_name_prefix"]
 BATCH_SHEET_FOLDER_ID = g_config.get("batch_sheet_folder_id", None)
+WRITE_BACK_URLS = g_config.get("write_back_urls_to_input_sheet", True)
 
 SUMMARY_HTML_FILE = "batch_summary"
 
-def sanitize_sheet_name(sheet_name):
-    """Sanitize the sheet name to remove unwanted characters."""
-    return ''.join(char for char in sheet_name if char.isalnum() or char.isspace()).strip()
+# How often workers renew their lease, and how often idle workers and the coordinator check the queue
+QUEUE_HEARTBEAT_SECONDS = 60
+QUEUE_POLL_SECONDS = 10
 
-def print_and_verify_repos_with_user(repo_data):
-    """Print the repo data to user and verify if they want to proceed."""
-    print(f"\n{len(all_repo_data)} projects to be processed from 'input_data_sheet_id' file in the config.yaml:")
+# The coordinator stops waiting if no project finishes for this long, e.g. because no workers are running
+QUEUE_STALL_SECONDS = 3600
+
+# Stages report their results from several threads at once
+PRINT_LOCK = threading.Lock()
+
+# Where --watch keeps its Drive changes page token and the projects it has provisioned
+WATCH_STATE_FILE = ".cache/watch_state.json"
+
+def run_preflight(all_repo_data, check_quota=True, creates_projects=True):
+    """Check the configuration and permissions before any project is processed, and exit if anything is wrong.
+
+    Otherwise a bad setting would only show up as the same error for every project, possibly
+    after some repos had already been half created. The API quota only gets a warning, as it resets
+    every hour; check_quota is turned off when the number of projects this process will handle
+    isn't known (queue coordinator and workers, watch). creates_projects is turned off for --sync,
+    which only updates existing projects, so it needs neither the templates nor team access.
+    """
+    # One rate limit read serves both the token and the quota check
+    rate_limit = get_rate_limit()
+    checks = {}
+    if creates_projects:
+        template_path = f"{TEMPLATE_REPO_OWNER}/{TEMPLATE_REPO_NAME}"
+        checks["Template repository"] = lambda: check_template_repo(
+            template_path, require_template=PROVISIONING_ENGINE == "generate")
+        checks["Template file to edit"] = lambda: check_template_file(
+            template_path, BATCH_FILE_NAME_TO_EDIT, BATCH_FILE_VARIABLE_TO_EDIT)
+        checks["Template data sheet"] = lambda: check_template_sheet(TEMPLATE_SHEET_ID)
+    checks["GitHub token"] = lambda: check_github_token(
+        rate_limit, needs_org_write=creates_projects and any(repo_data.get('github-usernames') for repo_data in all_repo_data))
+    checks["Batch repo owner"] = lambda: check_owner_access(BATCH_REPO_OWNER)
+    if BATCH_SHEET_FOLDER_ID:
+        checks["Data sheet folder"] = lambda: check_sheet_folder(BATCH_SHEET_FOLDER_ID)
+
+    warning_checks = {"GitHub API quota": lambda: check_github_quota(rate_limit, len(all_repo_data))} if check_quota else {}
+
+    results = run_preflight_checks({**checks, **warning_checks})
+    failures = [(name, error) for name, error in results if name in checks]
+    for name, warning in results:
+        if name in warning_checks:
+            print(f"\n⚠️  {name}: {warning}")
+    if failures:
+        print(f"\n❌ {len(failures)} of {len(checks)} preflight checks failed, nothing was created:")
+        for name, error in failures:
+            print(f"      {name}: {error}")
+        print("Fix these in config.yaml or your credentials, then run the script again.")
+        exit(1)
+    print(f"\n✓ All {len(checks)} preflight checks passed")
+
+
+def fetch_roster():
+    """Read the projects from the input_file if one is configured, otherwise from the input data sheet."""
+    if INPUT_FILE:
+        return fetch_repo_data_from_file(INPUT_FILE, tabs=INPUT_DATA_SHEET_TABS)
+    return fetch_repo_data_from_google_sheet(INPUT_DATA_SHEET_ID, tabs=INPUT_DATA_SHEET_TABS)
+
+
+def print_repos(repo_data, rejected_repo_data):
+    """Print the projects to be processed, and the ones that will be skipped."""
+    if rejected_repo_data:
+        print(f"\n{len(rejected_repo_data)} projects will be skipped because of problems with their names:")
+        for data, reason in rejected_repo_data:
+            print(f"      ❌ Project: \"{data['title']}\" | Reason: {reason}")
+
+    input_name = f"'input_file' {INPUT_FILE}" if INPUT_FILE else "'input_data_sheet_id' file"
+    print(f"\n{len(repo_data)} projects to be processed from {input_name} in the config.yaml:")
     for data in repo_data:
-        print(f"      Project: \"{data['title']}\" | Repo: {data['repo-name']} | Students: {data['authors']}")
+        print(f"      Project: \"{data['title']}\" | Repo: {data['repo-name']} | Students: {data['authors']} | Tab: {data.get('tab')}")
+
 
+def print_and_verify_repos_with_user(repo_data, rejected_repo_data):
+    """Print the repo data to user and verify if they want to proceed."""
+    print_repos(repo_data, rejected_repo_data)
     print("GitHub repositories and Google data sheets will be created and configured for the projects above, if they do not already exist")
 
     
@@ -55,10 +181,10 @@ def print_and_verify_repos_with_user(repo_data):
         print("Goodbye!")
         exit(0)
 
-def print_processed_repos():
+def print_processed_repos(repos):
     """Print the processed repositories."""
     print("\n\nProcessed Repositories:")
-    for repo in all_processed_repo_URLs:
+    for repo in repos:
         print(f"  - {repo['title']}:")
         print(f"      Google Data Sheet URL: {repo['google_sheet_url']}")
         print(f"      GitHub Pages URL: {repo['pages_url']}")
@@ -130,109 +256,728 @@ def output_summary_to_html_file(repos):
     print(f"\n✓ Local summary file created: {SUMMARY_HTML_FILE}")
 
 
-login_to_github()
 
-all_repo_data = fetch_repo_data_from_google_sheet(INPUT_DATA_SHEET_ID)
-print_and_verify_repos_with_user(all_repo_data)
+def prepare_local_git_cache():
+    """Clone (or update) the local template cache used by the local-git provisioning engine."""
+    result, e = ensure_template_cache(
+        template_url=f"https://github.com/{TEMPLATE_REPO_OWNER}/{TEMPLATE_REPO_NAME}.git",
+        cache_dir=LOCAL_GIT_CACHE_DIR,
+        extra_header=get_git_auth_header())
+    if result == "error":
+        print(f"Error: Could not clone the template repository into {LOCAL_GIT_CACHE_DIR}: {e}")
+        exit(1)
+    print(f"✓ Template repository cached in {LOCAL_GIT_CACHE_DIR}")
 
-all_processed_repo_URLs = []
 
-for repo_data in all_repo_data:
+def get_batch_repo_name(repo_data):
+    """Return the name of the project's GitHub repository."""
+    return f"{BATCH_REPO_NAME_PREFIX}-{repo_data['repo-name']}"
 
-    print(f"\nProcessing repository: {repo_data['title']}...")
-    
-    result, new_repo, e = create_repo_from_template(
-        template_path=f"{TEMPLATE_REPO_OWNER}/{TEMPLATE_REPO_NAME}",
-        batch_repo_owner=BATCH_REPO_OWNER,
-        batch_repo_name=f"{BATCH_REPO_NAME_PREFIX}-{repo_data['repo-name']}",    
-        batch_repo_description=f"{BATCH_REPO_DESCRIPTION_PREFIX} {repo_data['title']}")
-    if result == "error":
-        print(f"     ❌ Failed to create GitHub repository for {repo_data['title']}")
-        print(f"     Error: {str(e)}")
-        print("      Skipping...   ")
-        continue
-    elif result == "exists":
-        print(f"     ✓ GitHub Repository already exists: {new_repo.html_url}")
-    elif result == "created":
-        print(f"     ✓ GitHub Repository created: {new_repo.archive_url}")
-
-
-    result, story_data_sheet_id, story_data_sheet_URL, e = copy_story_data_sheet_to_new_sheet(
-        template_sheet_id=TEMPLATE_SHEET_ID,
-        batch_sheet_name=sanitize_sheet_name(f"{BATCH_SHEET_NAME_PREFIX}{repo_data['title']}"),
-        batch_sheet_folder_id=BATCH_SHEET_FOLDER_ID
-    )
-    if result == "error":
-        print(f"     ❌ Failed to create Google data sheet")
-        print(f"     Error: {str(e)}")
-        print(f"     Skipping...")
-        continue
-    elif result == "exists":
-        print(f"     ✓ Google Data Sheet already exists: {story_data_sheet_URL}")
-    elif result == "created":
-        print(f"     ✓ Google Data Sheet created: {story_data_sheet_URL}")
+def get_batch_sheet_name(repo_data):
+    """Return the name of the project's Google Data Sheet."""
+    return sanitize_sheet_name(f"{BATCH_SHEET_NAME_PREFIX}{repo_data['title']}")
 
 
-    result, e = share_sheet_with_anyone(story_data_sheet_id)
-    if result == "error":
-        print(f"     ❌ Failed to share data sheet to anyone with link")
-        print(f"     Error: {str(e)}")
-    elif result == "already_shared":
-        print(f"     ✓ Google Data sheet already shared with anyone with link")
-    elif result == "shared":
-        print(f"     ✓ Google Data sheet shared with anyone with link")
+class CreateDataSheetStage(Stage):
+    """Copy the template Google Data Sheet for each project.
+
+    In bulk, existing sheets are found with one listing of the sheet folder and the missing ones
+    are copied in batched requests; a copy that fails in the batch (or a batch that fails as a
+    whole) is retried on its own.
+    The result's value is (story_data_sheet_id, story_data_sheet_URL).
+    """
+    name = "sheet"
+    messages = {
+        "created": "Google Data Sheet created",
+        "exists": "Google Data Sheet already exists",
+        "error": "Failed to create Google data sheet",
+    }
 
+    def run_item(self, repo_data):
+        result, story_data_sheet_id, story_data_sheet_URL, e = copy_story_data_sheet_to_new_sheet(
+            template_sheet_id=TEMPLATE_SHEET_ID,
+            batch_sheet_name=get_batch_sheet_name(repo_data),
+            batch_sheet_folder_id=BATCH_SHEET_FOLDER_ID
+        )
+        if result == "error":
+            return StageResult("error", error=e)
+        return StageResult(result, (story_data_sheet_id, story_data_sheet_URL))
+
+    def run_bulk(self, projects, inputs):
+        live_sheets, e = list_google_sheets(BATCH_SHEET_FOLDER_ID, BATCH_SHEET_NAME_PREFIX)
+        if e:
+            return [self.run_item(repo_data) for repo_data in projects]
+        sheets_by_name = {sheet['name']: sheet for sheet in live_sheets.values()}
+
+        missing_names = [get_batch_sheet_name(repo_data) for repo_data in projects
+                         if get_batch_sheet_name(repo_data) not in sheets_by_name]
+        try:
+            copies = copy_google_sheets(TEMPLATE_SHEET_ID, missing_names, BATCH_SHEET_FOLDER_ID)
+        except Exception:
+            # run_item looks for the sheet first, so sheets the failed batch did copy are not copied twice
+            copies = {}
+
+        results = []
+        for repo_data in projects:
+            sheet_name = get_batch_sheet_name(repo_data)
+            if sheet_name in sheets_by_name:
+                sheet = sheets_by_name[sheet_name]
+                results.append(StageResult("exists", (sheet['id'], sheet['webViewLink'])))
+            elif sheet_name in copies and copies[sheet_name][2] is None:
+                story_data_sheet_id, story_data_sheet_URL, _ = copies[sheet_name]
+                results.append(StageResult("created", (story_data_sheet_id, story_data_sheet_URL)))
+            else:
+                # Usually Drive's write rate limit, which a single retry gets past
+                results.append(self.run_item(repo_data))
+        return results
+
+    def describe(self, story_data_sheet):
+        return story_data_sheet[1]
+
+
+class ShareDataSheetStage(Stage):
+    """Share each data sheet with anyone with the link; in bulk with two rounds of batched requests.
+
+    A sheet that fails in the batch is retried on its own."""
+    name = "share_sheet"
+    dependencies = ("sheet",)
+    messages = {
+        "shared": "Google Data sheet shared with anyone with link",
+        "already_shared": "Google Data sheet already shared with anyone with link",
+        "error": "Failed to share data sheet to anyone with link",
+    }
+
+    def run_item(self, repo_data, story_data_sheet):
+        result, e = share_sheet_with_anyone(story_data_sheet[0])
+        return StageResult(result, result, e)
+
+    def run_bulk(self, projects, inputs):
+        shared = share_sheets_with_anyone([story_data_sheet[0] for story_data_sheet, in inputs])
+        results = []
+        for repo_data, (story_data_sheet,), (_, result, e) in zip(projects, inputs, shared):
+            if result == "error":
+                results.append(self.run_item(repo_data, story_data_sheet))
+            else:
+                results.append(StageResult(result, result, e))
+        return results
+
+
+class EditDataSheetStage(Stage):
+    """Fill in the story title and authors of each data sheet; in bulk with batched requests.
+
+    A sheet that fails in the batch is retried on its own."""
+    name = "edit_sheet"
+    dependencies = ("sheet",)
+    messages = {
+        "updated": "Google Data Sheet updated with story title and authors",
+        "error": "Failed to update data sheet with story title and authors",
+    }
+
+    def run_item(self, repo_data, story_data_sheet):
+        result, e = edit_sheet_with_project_info(story_data_sheet[0], repo_data['title'], repo_data['authors'])
+        return StageResult(result, result, e)
+
+    def run_bulk(self, projects, inputs):
+        story_info = {story_data_sheet[0]: (repo_data['title'], repo_data['authors'])
+                      for repo_data, (story_data_sheet,) in zip(projects, inputs)}
+        updated = {sheet_id: (result, e) for sheet_id, result, e in update_story_info_for_sheets(story_info)}
+        results = []
+        for repo_data, (story_data_sheet,) in zip(projects, inputs):
+            result, e = updated[story_data_sheet[0]]
+            if result == "error":
+                results.append(self.run_item(repo_data, story_data_sheet))
+            else:
+                results.append(StageResult(result, result, e))
+        return results
 
-    result, e = edit_sheet_with_project_info(story_data_sheet_id, repo_data['title'], repo_data['authors'])
-    if result == "error":
-        print(f"     ❌ Failed to update data sheet with story title and authors")
-        print(f"     Error: {str(e)}")
-    elif result == "updated":
-        print(f"     ✓ Google Data Sheet updated with story title and authors")
 
+class GitHubStage(Stage):
+    """A stage whose per-project GitHub requests overlap, with their starts spaced out by the shared rate-limited executor."""
+
+    def map_items(self, function, items):
+        return get_github_executor().map(function, items)
+
+
+class CreateRepoStage(GitHubStage):
+    """Create each project's GitHub repository from the template repository.
+
+    In bulk, one listing of the owner's repositories provides the handles of the repositories
+    that already exist, and the ones that have to be created are not looked up first.
+    The result's value is the repository's RepoHandle.
+    """
+    name = "repo"
+    messages = {
+        "created": "GitHub Repository created",
+        "exists": "GitHub Repository already exists",
+        "error": "Failed to create GitHub repository",
+    }
+
+    def run_item(self, repo_data, check_exists=True):
+        result, new_repo, e = create_repo_from_template(
+            template_path=f"{TEMPLATE_REPO_OWNER}/{TEMPLATE_REPO_NAME}",
+            batch_repo_owner=BATCH_REPO_OWNER,
+            batch_repo_name=get_batch_repo_name(repo_data),
+            batch_repo_description=f"{BATCH_REPO_DESCRIPTION_PREFIX} {repo_data['title']}",
+            check_exists=check_exists)
+        if result == "error":
+            return StageResult("error", error=e)
+        elif result == "exists":
+            return self.use_existing_repo(repo_data, new_repo)
+        return StageResult(result, new_repo)
+
+    def use_existing_repo(self, repo_data, new_repo, *inputs):
+        """Return the result for a project whose repository already exists."""
+        return StageResult("exists", new_repo)
+
+    def run_bulk(self, projects, inputs):
+        live_repos, e = list_owner_repos(BATCH_REPO_OWNER)
+        # GitHub repo names are case-insensitive
+        live_repos_by_name = None if e else {name.lower(): repo_json for name, repo_json in live_repos.items()}
+
+        def run_one(item):
+            repo_data, project_inputs = item
+            try:
+                if live_repos_by_name is None:
+                    return self.run_item(repo_data, *project_inputs)
+                repo_json = live_repos_by_name.get(get_batch_repo_name(repo_data).lower())
+                if repo_json:
+                    return self.use_existing_repo(repo_data, RepoHandle.from_json(repo_json), *project_inputs)
+                return self.run_item(repo_data, *project_inputs, check_exists=False)
+            except Exception as e:
+                return StageResult("error", error=e)
+        return self.map_items(run_one, list(zip(projects, inputs)))
+
+    def describe(self, new_repo):
+        return new_repo.html_url
+
+
+class CreateRepoWithLocalGitStage(CreateRepoStage):
+    """Create an empty repository for each project and push the template, already pointing to the data sheet, in one push.
+
+    The repo needs the data sheet's URL, as it is part of the one and only push.
+    """
+    dependencies = ("sheet",)
+    messages = {
+        "created": "GitHub Repository created and pushed, pointing to the Google Data Sheet",
+        "exists": "GitHub Repository already exists",
+        "error": "Failed to create GitHub repository",
+    }
 
-    result, e = update_repo_with_google_data_sheet_link(
+    def run_item(self, repo_data, story_data_sheet, check_exists=True):
+        result, new_repo, e = create_empty_repo(
+            batch_repo_owner=BATCH_REPO_OWNER,
+            batch_repo_name=get_batch_repo_name(repo_data),
+            batch_repo_description=f"{BATCH_REPO_DESCRIPTION_PREFIX} {repo_data['title']}",
+            check_exists=check_exists)
+        if result == "error":
+            return StageResult("error", error=e)
+        elif result == "exists":
+            return self.use_existing_repo(repo_data, new_repo, story_data_sheet)
+        return self.push_template(new_repo, story_data_sheet)
+
+    def use_existing_repo(self, repo_data, new_repo, story_data_sheet):
+        # GitHub updates the size lazily, so a size of 0 only means the repo may still be empty
+        if not new_repo.size:
+            empty, e = is_repo_empty(new_repo)
+            if e:
+                return StageResult("error", error=f"Failed to check whether {new_repo.html_url} is empty: {e}")
+            if empty:
+                # Created by an earlier run that stopped before the push
+                return self.push_template(new_repo, story_data_sheet)
+
+        # Already has content from an earlier run, so only the config file may need updating
+        result, e = update_repo_with_google_data_sheet_link(
             repo=new_repo,
-            story_data_sheet_URL=story_data_sheet_URL,
+            story_data_sheet_URL=story_data_sheet[1],
             file_to_update=BATCH_FILE_NAME_TO_EDIT,
-            variable_to_update=BATCH_FILE_VARIABLE_TO_EDIT
-    )
-    if result == "error":
-        print(f"     ❌ Failed to edit {BATCH_FILE_NAME_TO_EDIT} in the repo to point it back to data sheet")
-        print(f"     Error: {str(e)}")
-    elif result == "no changes":
-        print(f"     ✓ GitHub already updated to point to new Google Data Sheet URL for data. Either already up to date or no variable found.")
-    elif result == "updated":
-        print(f"     ✓ GitHub updated to point to new Google Data Sheet URL for data.")
+            variable_to_update=BATCH_FILE_VARIABLE_TO_EDIT)
+        if result == "error":
+            return StageResult("exists", new_repo, f"Failed to edit {BATCH_FILE_NAME_TO_EDIT} to point it to the data sheet: {e}")
+        return StageResult("exists", new_repo)
+
+    def push_template(self, new_repo, story_data_sheet):
+        """Push the template, pointing to the data sheet, to the new empty repository."""
+        result, commit_sha, e = create_commit_with_data_sheet_link(
+            LOCAL_GIT_CACHE_DIR, story_data_sheet[1], BATCH_FILE_NAME_TO_EDIT, BATCH_FILE_VARIABLE_TO_EDIT)
+        if result == "error":
+            return StageResult("error", error=f"Failed to edit {BATCH_FILE_NAME_TO_EDIT} in the template "
+                                              f"to point it to the data sheet: {e}")
+
+        result, e = push_commit_to_repo(LOCAL_GIT_CACHE_DIR, commit_sha, f"{new_repo.html_url}.git",
+                                        extra_header=get_git_auth_header())
+        if result == "error":
+            return StageResult("error", error=f"Failed to push the template to {new_repo.html_url}: {e}")
+        return StageResult("created", new_repo)
+
+
+class UpdateRepoStage(GitHubStage):
+    """Point each repository's config file to its data sheet through the GitHub contents API.
+
+    An error here doesn't stop the project; later stages only wait for this one.
+    """
+    name = "update_repo"
+    dependencies = ("repo", "sheet")
+    messages = {
+        "updated": "GitHub updated to point to new Google Data Sheet URL for data",
+        "no changes": "GitHub already up to date (or no variable found) for the Google Data Sheet URL",
+        "error": f"Failed to edit {BATCH_FILE_NAME_TO_EDIT} in the repo to point it back to data sheet",
+    }
 
+    def run_item(self, repo_data, new_repo, story_data_sheet):
+        result, e = update_repo_with_google_data_sheet_link(
+                repo=new_repo,
+                story_data_sheet_URL=story_data_sheet[1],
+                file_to_update=BATCH_FILE_NAME_TO_EDIT,
+                variable_to_update=BATCH_FILE_VARIABLE_TO_EDIT
+        )
+        return StageResult(result, result, e)
+
+
+class EnablePagesStage(GitHubStage):
+    """Enable GitHub Pages for each repository. The result's value is the page dictionary."""
+    name = "pages"
+    dependencies = ("repo",)
+    messages = {
+        "created": "Enabled Github Pages link",
+        "exists": "GitHub Pages link already enabled",
+        "error": "Failed to enable GitHub Page",
+    }
 
-    result, page, e = enable_github_page(new_repo)
-    if result == "error":
-        print(f"     ❌ Failed to enable GitHub Page for {new_repo.full_name}")
+    def __init__(self, waits_for=()):
+        self.waits_for = waits_for
+
+    def run_item(self, repo_data, new_repo):
+        result, page, e = enable_github_page(new_repo)
+        if result == "error":
+            return StageResult("error", error=e)
+        return StageResult(result, page)
+
+    def describe(self, page):
+        return page['html_url']
+
+
+def build_stages():
+    """Compose the stages for the configured provisioning engine.
+
+    The GitHub repositories and the Google Data Sheets are created at the same time, and
+    sharing and filling in the sheets overlap with the GitHub work. GitHub Pages is only
+    enabled after the config file points to the data sheet, so each new site is built
+    exactly once, with the right data sheet.
+    """
+    stages = [CreateDataSheetStage(), ShareDataSheetStage(), EditDataSheetStage()]
+    if PROVISIONING_ENGINE == "local-git":
+        stages += [CreateRepoWithLocalGitStage(), EnablePagesStage()]
+    else:
+        stages += [CreateRepoStage(), UpdateRepoStage(), EnablePagesStage(waits_for=("update_repo",))]
+    return stages
+
+
+def report_stage_result(stage, repo_data, result):
+    """Print what a stage did for a project."""
+    with PRINT_LOCK:
+        if result.status == "error":
+            print(f"     ❌ {stage.messages['error']} for \"{repo_data['title']}\"")
+            print(f"     Error: {str(result.error)}")
+            return
+        detail = stage.describe(result.value)
+        print(f"     ✓ {stage.messages.get(result.status, result.status)} for \"{repo_data['title']}\""
+              + (f": {detail}" if detail else ""))
+        if result.error:
+            print(f"     Error: {str(result.error)}")
+
+
+def process_repos(all_repo_data):
+    """Create and configure the GitHub repositories and Google Data Sheets for a batch of projects.
+
+    Each stage runs once for the whole batch, so stages with a bulk backend make a few
+    batched calls instead of several calls per project.
+
+    Returns a list with a dictionary of URLs for each project, or None for projects that had to be skipped.
+    """
+    if len(all_repo_data) == 1:
+        print(f"\nProcessing repository: {all_repo_data[0]['title']}...")
+    else:
+        print(f"\nProcessing {len(all_repo_data)} projects...")
+    results = run_pipeline(build_stages(), all_repo_data, report=report_stage_result)
+
+    all_repo_info = []
+    for index, repo_data in enumerate(all_repo_data):
+        repo, sheet, page = results["repo"][index], results["sheet"][index], results["pages"][index]
+        if not repo.ok or not sheet.ok:
+            all_repo_info.append(None)
+            continue
+        all_repo_info.append({
+            'title': repo_data['title'],
+            'repo_name': get_batch_repo_name(repo_data),
+            'tab': repo_data.get('tab'),
+            'row': repo_data.get('row'),
+            'github_url':  repo.value.html_url,
+            'google_sheet_url': sheet.value[1],
+            'pages_url': page.value['html_url'] if page.ok else None
+        })
+    return all_repo_info
+
+def process_repo(repo_data):
+    """Create and configure the GitHub repository and Google Data Sheet for one project.
+
+    Returns a dictionary of the project's URLs, or None if the project had to be skipped.
+    """
+    return process_repos([repo_data])[0]
+
+
+def provision_teams(all_repo_data, processed_repos):
+    """Give the students listed in the "GitHub Usernames" column write access through GitHub teams.
+
+    Depending on batch_team_mode, there is one team per project repo ("project") or one team
+    for every repo in the batch ("cohort"), so each student is invited once per team instead
+    of once per repo.
+    """
+    processed_repo_names = {repo['repo_name'] for repo in processed_repos}
+
+    # team name -> (repo names, usernames), each kept in input order without duplicates
+    teams = {}
+    for repo_data in all_repo_data:
+        repo_name = f"{BATCH_REPO_NAME_PREFIX}-{repo_data['repo-name']}"
+        if repo_name not in processed_repo_names or not repo_data.get('github-usernames'):
+            continue
+        team_name = BATCH_REPO_NAME_PREFIX if BATCH_TEAM_MODE == "cohort" else repo_name
+        team_repos, team_usernames = teams.setdefault(team_name, ({}, {}))
+        team_repos[repo_name] = None
+        team_usernames.update(dict.fromkeys(repo_data['github-usernames']))
+
+    if not teams:
+        return
+
+    print(f"\nProvisioning {len(teams)} GitHub teams for student write access...")
+    for team_name, (team_repos, team_usernames) in teams.items():
+        result, team_slug, e = ensure_team(BATCH_REPO_OWNER, team_name, f"{BATCH_REPO_DESCRIPTION_PREFIX} {team_name}")
+        if result == "error":
+            print(f"     ❌ Failed to create GitHub team {team_name}")
+            print(f"     Error: {str(e)}")
+            continue
+        elif result == "exists":
+            print(f"     ✓ GitHub team already exists: {team_name}")
+        elif result == "created":
+            print(f"     ✓ GitHub team created: {team_name}")
+
+        for repo_name, result, e in add_repos_to_team(BATCH_REPO_OWNER, team_slug,
+                                                       [f"{BATCH_REPO_OWNER}/{name}" for name in team_repos]):
+            if result == "error":
+                print(f"     ❌ Failed to give team {team_name} write access to {repo_name}")
+                print(f"     Error: {str(e)}")
+
+        for username, result, e in add_members_to_team(BATCH_REPO_OWNER, team_slug, list(team_usernames)):
+            if result == "error":
+                print(f"     ❌ Failed to add {username} to team {team_name}")
+                print(f"     Error: {str(e)}")
+            elif result == "invited":
+                print(f"     ✓ Invited {username} to join {BATCH_REPO_OWNER} and team {team_name}")
+            elif result == "added":
+                print(f"     ✓ Added {username} to team {team_name}")
+
+
+def run_worker(queue_path):
+    """Lease projects from the shared queue and process them until the queue is drained."""
+    queue = ProjectQueue(queue_path)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"\nWorker {worker_id} pulling projects from {queue_path}")
+
+    while True:
+        repo_data = queue.lease_project(worker_id)
+        if repo_data is None:
+            if queue.count_remaining() == 0:
+                break
+            # Other workers still hold leases; wait in case one of them expires and is re-queued
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+
+        # Keep renewing the lease while the project is processed, so it is only re-queued if this worker dies
+        stop_heartbeat = threading.Event()
+        lease_lost = threading.Event()
+        def heartbeat():
+            while not stop_heartbeat.wait(QUEUE_HEARTBEAT_SECONDS):
+                if not queue.heartbeat(repo_data['repo-name'], worker_id):
+                    # The project has been handed to another worker, which may now be changing the same repo
+                    lease_lost.set()
+                    with PRINT_LOCK:
+                        print(f"     ❌ Lost the lease on {repo_data['title']}; another worker may be processing it "
+                              f"at the same time. This worker's result for it will be discarded.")
+                    return
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            repo_info = process_repo(repo_data)
+        except Exception as e:
+            repo_info = None
+            print(f"     ❌ Unexpected error processing {repo_data['title']}: {e}")
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+        if lease_lost.is_set():
+            continue
+        if repo_info is None:
+            queue.fail_project(repo_data['repo-name'], worker_id, "skipped, see worker output for details")
+        elif not queue.complete_project(repo_data['repo-name'], worker_id, repo_info):
+            print(f"     ❌ Lease on {repo_data['title']} expired before it finished; another worker will redo it")
+
+    print(f"\nWorker {worker_id}: no projects left in the queue.")
+
+
+def run_coordinator(queue_path, all_repo_data):
+    """Load the projects into the shared queue and wait for workers to process them all.
+
+    Returns the list of processed repository URL dictionaries.
+    """
+    queue = ProjectQueue(queue_path)
+    added = queue.enqueue_projects(all_repo_data)
+    print(f"\n{added} projects added or re-queued in the queue at {queue_path}.")
+    print(f"Start workers on any machine that can reach the queue with:")
+    print(f"      py .\\batch_create_story_repos.py --queue {queue_path} --worker")
+
+    remaining = queue.count_remaining()
+    last_progress = time.monotonic()
+    if remaining:
+        print(f"      Waiting for workers: {remaining} projects remaining...")
+    while remaining:
+        time.sleep(QUEUE_POLL_SECONDS)
+        now_remaining = queue.count_remaining()
+        if now_remaining != remaining:
+            remaining = now_remaining
+            last_progress = time.monotonic()
+            print(f"      Waiting for workers: {remaining} projects remaining...")
+        elif time.monotonic() - last_progress > QUEUE_STALL_SECONDS:
+            print(f"     ❌ No project finished in the last {QUEUE_STALL_SECONDS // 60} minutes; are any workers running?")
+            print(f"      Stopped waiting with {remaining} projects remaining. They stay in the queue, "
+                  f"so start workers and run the coordinator again to collect their results.")
+            break
+
+    results, failures = queue.get_results()
+    for repo_data, error in failures:
+        print(f"     ❌ Project \"{repo_data['title']}\" failed: {error}")
+    return results
+
+
+def provision_new_projects(state):
+    """Re-read the input sheet and provision the projects that the watch has not provisioned yet.
+
+    A renamed project whose URLs were written back is not provisioned again (see select_new_projects).
+    The repo names that were provisioned, or skipped for that reason, are added to state['provisioned'].
+
+    Returns the input sheet's modified time after the URL write-back, so the watch can ignore the
+    change it made, or None if nothing was written or someone else edited the sheet during the run.
+    """
+    print(f"\n[{datetime.now():%Y-%m-%d %H:%M:%S}] Input data sheet changed, checking for new projects...")
+    read_time, e = get_drive_file_modified_time(INPUT_DATA_SHEET_ID)
+    all_repo_data = fetch_roster()
+    all_repo_data, rejected_repo_data = build_name_collision_index(
+        all_repo_data, BATCH_REPO_NAME_PREFIX, BATCH_SHEET_NAME_PREFIX)
+    for data, reason in rejected_repo_data:
+        print(f"      ❌ Project: \"{data['title']}\" | Reason: {reason}")
+
+    new_repo_data, renamed_repo_data = select_new_projects(all_repo_data, state['provisioned'])
+    for data in renamed_repo_data:
+        print(f"      Project \"{data['title']}\" already has the repo and data sheet in its row's URLs, skipped. "
+              f"If it was renamed, run with --sync to update their names.")
+        # Reported once; the watch leaves the project to --sync from now on
+        state['provisioned'].append(data['repo-name'])
+    if not new_repo_data:
+        print("      ✓ No new projects")
+        return None
+
+    processed_repos = []
+    for repo_data, repo_info in zip(new_repo_data, process_repos(new_repo_data)):
+        if repo_info:
+            processed_repos.append(repo_info)
+            state['provisioned'].append(repo_data['repo-name'])
+
+    provision_teams(new_repo_data, processed_repos)
+    own_modified_time = None
+    if WRITE_BACK_URLS and not INPUT_FILE and processed_repos:
+        # Only an unchanged sheet can be written to without hiding someone else's edit behind our own
+        edited_during_run = get_drive_file_modified_time(INPUT_DATA_SHEET_ID)[0] != read_time
+        result, _, e = write_back_urls_to_input_sheet(INPUT_DATA_SHEET_ID, processed_repos)
+        if result == "error":
+            print(f"\n❌ Failed to write the URLs back to the input data sheet")
+            print(f"     Error: {str(e)}")
+        elif result == "updated" and read_time and not edited_during_run:
+            own_modified_time, e = get_drive_file_modified_time(INPUT_DATA_SHEET_ID)
+    print_processed_repos(processed_repos)
+    return own_modified_time
+
+def run_watch():
+    """Provision new projects whenever the input sheet changes, until interrupted."""
+    if INPUT_FILE:
+        print("Error: --watch follows changes to the input data sheet, so it can't be used with an input_file.")
+        exit(1)
+    login_to_github(BATCH_REPO_OWNER)
+    # Checked once on start, against the roster as it is now; how many projects will be new is not known
+    run_preflight(fetch_roster(), check_quota=False)
+    if PROVISIONING_ENGINE == "local-git":
+        prepare_local_git_cache()
+
+    os.makedirs(os.path.dirname(WATCH_STATE_FILE), exist_ok=True)
+    print(f"\nWatching the input data sheet for changes (state in {WATCH_STATE_FILE}). Press Ctrl+C to stop.")
+    try:
+        watch_for_changes(DriveChangesSource(), INPUT_DATA_SHEET_ID, provision_new_projects, WATCH_STATE_FILE)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def run_sync():
+    """Bring the descriptions, sheet names and story info of existing projects in line with the input sheet.
+
+    All live state is read in bulk (one paged repo listing, one paged sheet listing and batched
+    reads of the Story tabs), and only the projects that changed are updated, in batched calls.
+    """
+    login_to_github(BATCH_REPO_OWNER)
+    # The same filter as when creating, so two rows can never sync to one project's repo and sheet
+    all_repo_data, rejected_repo_data = build_name_collision_index(
+        fetch_roster(), BATCH_REPO_NAME_PREFIX, BATCH_SHEET_NAME_PREFIX)
+    if rejected_repo_data:
+        print(f"\n{len(rejected_repo_data)} projects will be skipped because of problems with their names:")
+        for data, reason in rejected_repo_data:
+            print(f"      ❌ Project: \"{data['title']}\" | Reason: {reason}")
+    run_preflight(all_repo_data, check_quota=False, creates_projects=False)
+
+    print(f"\nReading the current state of the repositories and data sheets...")
+    live_repos, e = list_owner_repos(BATCH_REPO_OWNER)
+    if e:
+        print(f"Error: Could not list the repositories of {BATCH_REPO_OWNER}: {e}")
+        exit(1)
+    live_sheets, e = list_google_sheets(BATCH_SHEET_FOLDER_ID, BATCH_SHEET_NAME_PREFIX)
+    if e:
+        print(f"Error: Could not list the Google Data Sheets: {e}")
+        exit(1)
+    live_sheet_names = {sheet_id: sheet['name'] for sheet_id, sheet in live_sheets.items()}
+
+    located, missing = locate_project_resources(
+        all_repo_data, live_repos, live_sheet_names, BATCH_REPO_NAME_PREFIX, BATCH_SHEET_NAME_PREFIX)
+    story_info = get_story_info_for_sheets([sheet_id for _, _, sheet_id in located])
+    plan = build_sync_plan(located, live_sheet_names, story_info, BATCH_REPO_DESCRIPTION_PREFIX, BATCH_SHEET_NAME_PREFIX)
+
+    if missing:
+        print(f"\n{len(missing)} projects can't be synced; run without --sync to create the ones not found:")
+        for data, reason in missing:
+            print(f"      ❌ Project: \"{data['title']}\" | Reason: {reason}")
+    if plan["unreadable_story_info"]:
+        print(f"\n{len(plan['unreadable_story_info'])} projects' Story tabs could not be read, "
+              f"so their story title and authors are left as they are:")
+        for data in plan["unreadable_story_info"]:
+            print(f"      ❌ Project: \"{data['title']}\"")
+
+    if not plan["changed_projects"]:
+        print(f"\n✓ All {len(located)} existing projects are up to date")
+        return
+
+    print(f"\n{len(plan['changed_projects'])} of {len(located)} existing projects have changed:")
+    for data, changes in plan["changed_projects"]:
+        print(f"      Project: \"{data['title']}\" | Update: {', '.join(changes)}")
+    proceed = input("\nDo you want to proceed with updating these projects? (yes/no): ").strip().lower()
+    if proceed != "yes":
+        print("Goodbye!")
+        exit(0)
+
+    titles = {}  # repo node ID or sheet ID -> project title, to report failures
+    for data, repo, sheet_id in located:
+        titles[repo['node_id']] = titles[sheet_id] = data['title']
+
+    failures = []
+    for node_id, result, e in update_repo_descriptions(plan["repo_descriptions"]):
+        if result == "error":
+            failures.append((f"the repo description of \"{titles[node_id]}\"", e))
+    for sheet_id, result, e in rename_google_files(plan["sheet_names"]):
+        if result == "error":
+            failures.append((f"the data sheet name of \"{titles[sheet_id]}\"", e))
+    for sheet_id, result, e in update_story_info_for_sheets(plan["story_info"]):
+        if result == "error":
+            failures.append((f"the story title and authors of \"{titles[sheet_id]}\"", e))
+
+    for what, e in failures:
+        print(f"     ❌ Failed to update {what}")
         print(f"     Error: {str(e)}")
-    elif result == "exists":
-        print(f"     ✓ GitHub Pages link already enabled: {page['html_url']}")
-    elif result == "created":
-        print(f"     ✓ Enabled Github Pages link: {page['html_url']}")
-
-
-    # Add the processed repository info to the list
-    repo_info = {
-        'title': repo_data['title'],
-        'github_url':  new_repo.html_url,
-        'google_sheet_url': story_data_sheet_URL,
-        'pages_url': page['html_url']
-    }
-    all_processed_repo_URLs.append(repo_info)
+    print(f"\n✓ Updated {len(plan['repo_descriptions'])} repo descriptions, {len(plan['sheet_names'])} sheet names "
+          f"and {len(plan['story_info'])} story titles and authors, with {len(failures)} failures")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch create and configure story repositories and Google Data Sheets.")
+    parser.add_argument("--queue", help="Path to a shared SQLite queue file. Without --worker, load the projects "
+                                        "into the queue and wait for workers to process them.")
+    parser.add_argument("--worker", action="store_true", help="Process projects from the --queue file.")
+    parser.add_argument("--watch", action="store_true", help="Keep running, and provision new or renamed "
+                                                             "projects whenever the input data sheet changes.")
+    parser.add_argument("--sync", action="store_true", help="Update the repo descriptions, sheet names and story "
+                                                            "titles and authors of existing projects to match the input data sheet.")
+    parser.add_argument("--plan", action="store_true", help="Only read the input and list the repos and data sheets "
+                                                            "that would be created; makes no changes. With an input_file "
+                                                            "it needs no network access at all.")
+    args = parser.parse_args()
+
+    if args.plan:
+        # Reading the input is the only step, so nothing logs in to GitHub, or to Google for an input_file
+        all_repo_data, rejected_repo_data = build_name_collision_index(
+            fetch_roster(), BATCH_REPO_NAME_PREFIX, BATCH_SHEET_NAME_PREFIX)
+        print_repos(all_repo_data, rejected_repo_data)
+        exit(0)
+
+    if args.sync:
+        run_sync()
+        exit(0)
+
+    if args.watch:
+        run_watch()
+        exit(0)
+
+    if args.worker:
+        if not args.queue:
+            parser.error("--worker requires --queue")
+        login_to_github(BATCH_REPO_OWNER)
+        # Workers don't read the roster, and the coordinator adds the students to their teams
+        run_preflight([], check_quota=False)
+        if PROVISIONING_ENGINE == "local-git":
+            prepare_local_git_cache()
+        run_worker(args.queue)
+        exit(0)
+
+    login_to_github(BATCH_REPO_OWNER)
+
+    all_repo_data = fetch_roster()
+
+    # Reject name collisions and unusable names before any per-project API calls are made
+    all_repo_data, rejected_repo_data = build_name_collision_index(
+        all_repo_data, BATCH_REPO_NAME_PREFIX, BATCH_SHEET_NAME_PREFIX)
+    # Queue workers spend their own tokens' quota, so the coordinator's says little about the batch
+    run_preflight(all_repo_data, check_quota=not args.queue)
+    print_and_verify_repos_with_user(all_repo_data, rejected_repo_data)
 
-print_processed_repos()
-output_summary_to_html_file(all_processed_repo_URLs)
+    if args.queue:
+        all_processed_repo_URLs = run_coordinator(args.queue, all_repo_data)
+    else:
+        if PROVISIONING_ENGINE == "local-git":
+            prepare_local_git_cache()
+        all_processed_repo_URLs = [repo_info for repo_info in process_repos(all_repo_data) if repo_info]
 
-print("\n\nHave a nice day.\n")
+    provision_teams(all_repo_data, all_processed_repo_URLs)
 
-exit(0)
+    if WRITE_BACK_URLS and not INPUT_FILE:
+        result, updated_cells, e = write_back_urls_to_input_sheet(INPUT_DATA_SHEET_ID, all_processed_repo_URLs)
+        if result == "error":
+            print(f"\n❌ Failed to write the URLs back to the input data sheet")
+            print(f"     Error: {str(e)}")
+        elif result == "no changes":
+            print(f"\n✓ Input data sheet already has the current URLs")
+        elif result == "updated":
+            print(f"\n✓ Input data sheet updated with {updated_cells} new URLs")
 
+    print_processed_repos(all_processed_repo_URLs)
+    output_summary_to_html_file(all_processed_repo_URLs)
 
+    print("\n\nHave a nice day.\n")
 
+    exit(0)
 
 
+if __name__ == "__main__":
+    main()
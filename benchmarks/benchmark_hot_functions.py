@@ -0,0 +1,244 @@
+"""Micro-benchmarks for the pure-Python functions that run on every roster row or repo file.
+
+Run from the project folder:
+    py .\\benchmarks\\benchmark_hot_functions.py                    # compare against the stored baseline
+    py .\\benchmarks\\benchmark_hot_functions.py --update-baseline  # store new baseline numbers
+    py .\\benchmarks\\benchmark_hot_functions.py --full             # include the 1M row / largest file sizes
+
+Throughput (items per second) and peak memory are measured separately, because tracemalloc
+slows the code it traces. Every case is timed in several rounds that take turns with the other
+cases, and each timing is paired with one of a fixed reference workload, so throughput is compared
+relative to how fast the machine was running at that moment; the median round counts.
+The roster parsing functions are also timed in their versions from before the batch sanitizers
+(legacy_roster_functions.py), and the speedup of the current versions over them is reported.
+The benchmark exits with status 1 if any case is slower, or uses more peak memory, than its
+baseline by more than --threshold (a little more for cases that were noisy when the baseline was measured). Baselines are machine specific,
+so benchmarks/baseline.json is not committed; the first run on a machine creates it.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))  # Add parent directory to path
+
+from google_functions import convert_sheet_values_to_repo_names_and_authors
+from google_functions import sanitize_repo_name
+from google_functions import convert_author_names_to_list
+from github_functions import update_variable_with_data_sheet_link
+from github_functions import update_variable_in_source
+import legacy_roster_functions
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+ROW_SIZES = [10_000, 100_000]
+FULL_ROW_SIZES = ROW_SIZES + [1_000_000]
+FILE_SIZES_MB = [1, 4]
+FULL_FILE_SIZES_MB = FILE_SIZES_MB + [16]
+
+# Prefix of the cases that time the legacy version of a function, which are only compared with the current one
+LEGACY_PREFIX = "legacy "
+
+# Each timed sample calls the function until at least this long has passed, so millisecond-scale
+# cases are not dominated by timer resolution and scheduling noise
+MIN_SAMPLE_SECONDS = 0.2
+# A case that was noisy when its baseline was measured may drop this much more than the threshold
+MAX_EXTRA_NOISE_ALLOWANCE = 0.1
+
+WORDS = ["Reclaiming", "the", "City:", "Counter-Map", "of", "St.", "Louis", "Monuments", "Café", "Stories",
+         "Data's", "Science", "101", "Web@App#2024", "  ", "Special!@#$%", "River", "Voices", "—", "Archive"]
+NAMES = ["John  Smith", " Jane Doe ", "Alice   Johnson", "", "Charlie Brown  ", "  David Lee", "Sarah Connor", "   "]
+
+
+def generate_project_titles(count, rng):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))) + f" {i}" for i in range(count)]
+
+def generate_sheet_values(count, rng):
+    sheet_values = [["Faculty Member", "Project Name", "Student 1", "Student 2", "Student 3", "Student 4"]]
+    for title in generate_project_titles(count, rng):
+        sheet_values.append(["Laura L", title] + [rng.choice(NAMES) for _ in range(rng.randint(0, 4))])
+        if rng.random() < 0.01:
+            sheet_values.append([])  # The occasional empty row
+    return sheet_values
+
+def generate_author_columns(count, rng):
+    return [[rng.choice(NAMES) for _ in range(rng.randint(0, 6))] for _ in range(count)]
+
+def generate_js_lines(size_mb, rng):
+    """Generate a config file of roughly size_mb megabytes with the variable near the end."""
+    lines = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        line = f"var setting{len(lines)} = '{rng.random()}'; // " + " ".join(rng.choice(WORDS) for _ in range(8))
+        lines.append(line)
+        size += len(line) + 1
+    lines.insert(len(lines) - 3, 'const googleSheetURL = "https://docs.google.com/spreadsheets/d/OLD_ID/edit";')
+    return lines
+
+
+def build_cases(full):
+    """Return a list of (case name, item count, function to time) tuples.
+
+    Cases named LEGACY_PREFIX + name time the legacy version of the function in case name.
+    """
+    rng = random.Random(2029)
+    cases = []
+    for count in (FULL_ROW_SIZES if full else ROW_SIZES):
+        sheet_values = generate_sheet_values(count, rng)
+        # The legacy version always read the project names from the first column after the header
+        legacy_sheet_values = [row[1:] for row in sheet_values]
+        cases.append((f"convert_sheet_values_to_repo_names_and_authors[{count}]", count,
+                      lambda sheet_values=sheet_values: convert_sheet_values_to_repo_names_and_authors(sheet_values)))
+        cases.append((f"{LEGACY_PREFIX}convert_sheet_values_to_repo_names_and_authors[{count}]", count,
+                      lambda sheet_values=legacy_sheet_values:
+                          legacy_roster_functions.convert_sheet_values_to_repo_names_and_authors(sheet_values)))
+
+        titles = generate_project_titles(count, rng)
+        cases.append((f"sanitize_repo_name[{count}]", count,
+                      lambda titles=titles: [sanitize_repo_name(title) for title in titles]))
+        cases.append((f"{LEGACY_PREFIX}sanitize_repo_name[{count}]", count,
+                      lambda titles=titles: [legacy_roster_functions.sanitize_repo_name(title) for title in titles]))
+
+        author_columns = generate_author_columns(count, rng)
+        cases.append((f"convert_author_names_to_list[{count}]", count,
+                      lambda author_columns=author_columns: [convert_author_names_to_list(columns) for columns in author_columns]))
+        cases.append((f"{LEGACY_PREFIX}convert_author_names_to_list[{count}]", count,
+                      lambda author_columns=author_columns:
+                          [legacy_roster_functions.convert_author_names_to_list(columns) for columns in author_columns]))
+
+    url = "https://docs.google.com/spreadsheets/d/NEW_ID/edit"
+    for size_mb in (FULL_FILE_SIZES_MB if full else FILE_SIZES_MB):
+        lines = generate_js_lines(size_mb, rng)
+        byte_count = sum(len(line) + 1 for line in lines)
+        cases.append((f"update_variable_with_data_sheet_link[{size_mb}MB]", byte_count,
+                      lambda lines=lines: update_variable_with_data_sheet_link(lines, url, "googleSheetURL")))
+
+        # The same file minified onto a single line, as found in bundled sites
+        source = ";".join(lines)
+        cases.append((f"update_variable_in_source[{size_mb}MB minified]", len(source),
+                      lambda source=source: update_variable_in_source(source, url, "googleSheetURL")))
+    return cases
+
+
+def reference_workload(words=tuple(f"{WORDS[i % len(WORDS)]} {i}" for i in range(20_000))):
+    """Fixed string processing work, timed next to every case to measure the machine's current speed."""
+    return sorted(word.lower().replace(" ", "-") for word in words)
+
+def time_sample(function) -> float:
+    """Return the seconds per call, calling the function until at least MIN_SAMPLE_SECONDS have passed."""
+    calls = 0
+    elapsed = 0.0
+    start = time.perf_counter()
+    while elapsed < MIN_SAMPLE_SECONDS:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / calls
+
+def measure_cases(cases, repeats) -> dict:
+    """Measure every case, timing them in round-robin rounds.
+
+    Returns a dictionary of case name -> {'throughput', 'relative', 'noise', 'peak_bytes'}, where
+    throughput is the median of the rounds, relative is the median throughput as a multiple of the
+    reference workload's, and noise is the spread of the relative rounds as a fraction of their median.
+    """
+    for _, _, function in cases:
+        function()  # Warm up caches (e.g. compiled regexes) before timing
+
+    samples = {name: [] for name, _, _ in cases}
+    relative_samples = {name: [] for name, _, _ in cases}
+    for _ in range(repeats):
+        for name, item_count, function in cases:
+            reference_seconds = time_sample(reference_workload)
+            seconds = time_sample(function)
+            samples[name].append(item_count / seconds)
+            relative_samples[name].append(item_count / seconds * reference_seconds)
+
+    results = {}
+    for name, _, function in cases:
+        relative = statistics.median(relative_samples[name])
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"throughput": statistics.median(samples[name]),
+                         "relative": relative,
+                         "noise": (max(relative_samples[name]) - min(relative_samples[name])) / relative,
+                         "peak_bytes": peak}
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold) -> list:
+    """Compare measured results with the baseline.
+
+    Throughput is compared relative to the reference workload (raw throughput for baselines saved
+    without it). It may drop by the threshold, or by the round-to-round noise seen for the case when
+    the baseline was measured (up to MAX_EXTRA_NOISE_ALLOWANCE more than the threshold), before it
+    counts as a regression. The noise of this run is not used, so a slow run can't excuse itself.
+    Returns a list of regression messages, which is empty if nothing regressed beyond the threshold.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name.startswith(LEGACY_PREFIX) or name not in baseline:
+            continue
+        expected = baseline[name]
+        allowed_drop = max(threshold, min(expected.get("noise", 0), threshold + MAX_EXTRA_NOISE_ALLOWANCE))
+        key = "relative" if "relative" in expected else "throughput"
+        if result[key] < expected[key] * (1 - allowed_drop):
+            regressions.append(f"{name}: throughput {result['throughput']:,.0f}/s is below "
+                               f"baseline {expected['throughput']:,.0f}/s")
+        if result["peak_bytes"] > expected["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{name}: peak memory {result['peak_bytes']:,} bytes is above "
+                               f"baseline {expected['peak_bytes']:,} bytes")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot pure-Python functions against a stored baseline.")
+    parser.add_argument("--full", action="store_true", help="Include the largest (1M row, 16MB file) inputs.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed rounds per case; the median one counts.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed regression before failing, as a fraction of the baseline (default 0.25).")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline.")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r") as f:
+            baseline = json.load(f)
+
+    results = measure_cases(build_cases(args.full), args.repeats)
+    for name, result in results.items():
+        print(f"{name:<60} {result['throughput']:>14,.0f} items/s ±{result['noise']:>4.0%} "
+              f"{result['peak_bytes'] / 1024 / 1024:>9.1f} MB peak")
+
+    print("\nSpeedup over the versions from before the batch sanitizers:")
+    for name, result in results.items():
+        legacy = results.get(LEGACY_PREFIX + name)
+        if legacy:
+            print(f"      {name:<54} {result['relative'] / legacy['relative']:>6.2f}x")
+
+    if args.update_baseline or not baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\n✓ Baseline saved to {BASELINE_FILE}")
+        exit(0)
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions beyond {args.threshold:.0%} of the baseline:")
+        for regression in regressions:
+            print(f"      {regression}")
+        exit(1)
+
+    print(f"\n✓ No regressions beyond {args.threshold:.0%} of the baseline")
+    exit(0)
+
+
+if __name__ == "__main__":
+    main()
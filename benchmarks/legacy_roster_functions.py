@@ -0,0 +1,55 @@
+"""The roster parsing functions as they were before the batch sanitizers, kept so the benchmark
+can show the speedup of the current versions in google_functions.py against them.
+
+They look up their regexes on every call, normalize the header name on every comparison and
+sanitize one field at a time. Not used by the script itself.
+"""
+import re
+
+
+def sanitize_repo_name(repo_name):
+    if not repo_name:
+        return ""
+    cleaned = re.sub(r'[^a-zA-Z0-9\s\-]', '', repo_name)
+    cleaned = re.sub(r'\s+', '-', cleaned)
+    cleaned = cleaned.strip('-')
+    return cleaned.lower()
+
+def sanitize_author_name(author_name) -> str:
+    if not author_name:
+        return ""
+    author_name = author_name.strip()
+    return re.sub(r'\s+', ' ', author_name)
+
+def convert_author_names_to_list(author_columns) -> str:
+    author_names = []
+    for column_value in author_columns:
+        sanitized_name = sanitize_author_name(column_value)
+        if sanitized_name:
+            author_names.append(sanitized_name)
+    return ", ".join(author_names)
+
+def find_header_row_index(sheet_values, header_name) -> int:
+    if not sheet_values or sheet_values[0] is None:
+        return -1
+    for index, col_name in enumerate(sheet_values[0]):
+        if header_name.lower().strip() == col_name.lower().strip():
+            return index
+    return -1
+
+def convert_sheet_values_to_repo_names_and_authors(sheet_values) -> list:
+    project_name_col_index = find_header_row_index(sheet_values, "Project Name")
+    if project_name_col_index == -1:
+        return []
+    converted_data = []
+    for row in sheet_values[1:]:
+        if row:
+            original_name = ""
+            if project_name_col_index < len(row) and row[project_name_col_index]:
+                original_name = row[project_name_col_index].strip()
+            converted_data.append({
+                "title": original_name,
+                "repo-name": sanitize_repo_name(original_name),
+                "authors": convert_author_names_to_list(row[project_name_col_index + 1:])
+            })
+    return converted_data
@@ -0,0 +1,118 @@
+import os
+import subprocess
+import tempfile
+
+from github_functions import update_variable_in_source
+
+# Commits are created with git plumbing commands, which need an identity even if the user never configured one
+COMMIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "Batch Create Story Repos",
+    "GIT_AUTHOR_EMAIL": "batch-create-story-repos@users.noreply.github.com",
+    "GIT_COMMITTER_NAME": "Batch Create Story Repos",
+    "GIT_COMMITTER_EMAIL": "batch-create-story-repos@users.noreply.github.com",
+}
+
+
+def run_git(args, cwd=None, input=None, env=None, extra_header=None, raw=False):
+    """Run a git command and return its stripped standard output, or its exact output bytes if raw is True.
+
+    extra_header is an HTTP header (e.g. "Authorization: Basic ...") passed to git through its
+    GIT_CONFIG_* environment variables (git 2.31+), rather than on the command line, where other
+    local users could read it, stored in the repository config, or embedded in the remote URL.
+    Raises subprocess.CalledProcessError with git's error output if the command fails.
+    """
+    command = ["git"] + args
+
+    process_env = None
+    if env or extra_header:
+        process_env = dict(os.environ)
+        process_env.update(env or {})
+    if extra_header:
+        process_env.update({
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.extraHeader",
+            "GIT_CONFIG_VALUE_0": extra_header,
+        })
+
+    result = subprocess.run(command, cwd=cwd, input=input, env=process_env, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command,
+                                            output=result.stdout, stderr=result.stderr.decode("utf-8", "replace"))
+    return result.stdout if raw else result.stdout.decode("utf-8").strip()
+
+def ensure_template_cache(template_url, cache_dir, extra_header=None) -> tuple:
+    """Clone the template repository into a local cache, or bring an existing cache up to date.
+
+    The cache is a bare mirror; every project commit is created inside it, so all projects
+    share one object store and the template is only downloaded once.
+
+    Returns a tuple of (result, error_message).
+        result can be "cloned", "updated", or "error".
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    try:
+        if os.path.exists(os.path.join(cache_dir, "HEAD")):
+            run_git(["fetch", "--prune", "origin"], cwd=cache_dir, extra_header=extra_header)
+            return "updated", None
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_dir)), exist_ok=True)
+        run_git(["clone", "--mirror", template_url, cache_dir], extra_header=extra_header)
+        return "cloned", None
+    except subprocess.CalledProcessError as e:
+        return "error", e.stderr
+    except OSError as e:  # git is not installed
+        return "error", e
+
+def create_commit_with_data_sheet_link(cache_dir, story_data_sheet_URL, file_to_update, variable_to_update) -> tuple:
+    """Create a single commit with the template's files, pointing the repo to the data sheet.
+
+    Like GitHub's "Use this template", the commit has no parents, so a new repo starts with a
+    fresh history of one commit rather than the template's whole history.
+    The commit is written straight into the cache's object store with a temporary index,
+    so no working copy is checked out.
+
+    Returns a tuple of (result, commit_sha, error_message).
+        result can be "updated", "no changes" (the template already points to the data sheet), or "error".
+        commit_sha is the commit to push, or None if an error occurred.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    try:
+        branch = run_git(["symbolic-ref", "--short", "HEAD"], cwd=cache_dir)
+        template_sha = run_git(["rev-parse", f"{branch}^{{commit}}"], cwd=cache_dir)
+
+        # "<mode> blob <sha>\t<path>"
+        mode = run_git(["ls-tree", template_sha, "--", file_to_update], cwd=cache_dir).split(" ", 1)[0]
+        if not mode:
+            return "error", None, f"{file_to_update} not found in the template repository"
+
+        source = run_git(["cat-file", "blob", f"{template_sha}:{file_to_update}"], cwd=cache_dir, raw=True).decode("utf-8")
+        updated, _ = update_variable_in_source(source, story_data_sheet_URL, variable_to_update)
+        if updated == source:
+            result = "no changes"
+            tree_sha = run_git(["rev-parse", f"{template_sha}^{{tree}}"], cwd=cache_dir)
+        else:
+            result = "updated"
+            blob_sha = run_git(["hash-object", "-w", "--stdin"], cwd=cache_dir, input=updated.encode("utf-8"))
+            with tempfile.TemporaryDirectory() as index_dir:
+                index_env = {"GIT_INDEX_FILE": os.path.join(index_dir, "index")}
+                run_git(["read-tree", template_sha], cwd=cache_dir, env=index_env)
+                run_git(["update-index", "--cacheinfo", f"{mode},{blob_sha},{file_to_update}"], cwd=cache_dir, env=index_env)
+                tree_sha = run_git(["write-tree"], cwd=cache_dir, env=index_env)
+
+        commit_sha = run_git(["commit-tree", tree_sha, "-m", "Initial commit"], cwd=cache_dir, env=COMMIT_IDENTITY)
+        return result, commit_sha, None
+    except subprocess.CalledProcessError as e:
+        return "error", None, e.stderr
+
+def push_commit_to_repo(cache_dir, commit_sha, remote_url, branch="main", extra_header=None) -> tuple:
+    """Push a commit from the template cache to a branch of another (usually new, empty) repository.
+
+    Returns a tuple of (result, error_message).
+        result can be "pushed" or "error".
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    try:
+        run_git(["push", remote_url, f"{commit_sha}:refs/heads/{branch}"], cwd=cache_dir, extra_header=extra_header)
+        return "pushed", None
+    except subprocess.CalledProcessError as e:
+        return "error", e.stderr
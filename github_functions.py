@@ -1,18 +1,234 @@
 import os
 import requests
 import base64
+import hashlib
 import re
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from github import Github
 
 # Global variables
-GH = None
-GITHUB_TOKEN = None
-
-def login_to_github():
-    """Authenticate to GitHub using a personal access token."""
-    global GH, GITHUB_TOKEN
-    GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
-    if not GITHUB_TOKEN:
+GITHUB_CLIENT = None
+GITHUB_EXECUTOR = None
+REPO_CREATION_URLS = {}  # Owner -> the URL that creates repositories for it, see get_repo_creation_url
+
+# GitHub asks integrators to leave at least a second between requests that create or change content,
+# otherwise bursts of them hit the secondary rate limits
+GITHUB_WRITE_INTERVAL_SECONDS = 1.0
+GITHUB_EXECUTOR_WORKERS = 4
+
+# Repository updates sent together in one GraphQL request by update_repo_descriptions
+GITHUB_MUTATIONS_PER_REQUEST = 50
+
+# GitHub App installation tokens last an hour; get a new one when less than this is left,
+# so a token never expires in the middle of a project
+GITHUB_APP_TOKEN_REFRESH_SECONDS = 300
+
+
+class RateLimitedExecutor:
+    """A thread pool that starts at most one call every min_interval seconds.
+
+    Calls still overlap while they wait on the network, but their starts are spaced out
+    so a burst of writes stays under GitHub's secondary rate limits.
+    """
+
+    def __init__(self, max_workers=GITHUB_EXECUTOR_WORKERS, min_interval=GITHUB_WRITE_INTERVAL_SECONDS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def _wait_for_turn(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _run(self, fn, args, kwargs):
+        self._wait_for_turn()
+        return fn(*args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) and return its concurrent.futures.Future."""
+        return self._pool.submit(self._run, fn, args, kwargs)
+
+    def map(self, fn, items) -> list:
+        """Call fn on every item and return the results in the same order, waiting for all of them."""
+        futures = [self.submit(fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class RepoHandle:
+    """The few details of a repository that this script uses, taken from API responses it already has.
+
+    Unlike PyGithub's Repository, a handle never makes requests of its own, so reading its
+    attributes can't trigger hidden requests to complete the object.
+    """
+
+    def __init__(self, owner, name, html_url=None, default_branch="main", size=0):
+        self.owner = owner
+        self.name = name
+        self.full_name = f"{owner}/{name}"
+        self.html_url = html_url or f"https://github.com/{owner}/{name}"
+        self.default_branch = default_branch
+        self.size = size  # In KB; 0 for a repository without any commits
+
+    @classmethod
+    def from_json(cls, repo_json):
+        """Build a handle from a repository in a GitHub API response (a listing, /generate, or a repository GET)."""
+        return cls(repo_json['owner']['login'], repo_json['name'], repo_json.get('html_url'),
+                   repo_json.get('default_branch') or "main", repo_json.get('size') or 0)
+
+
+class GitHubAppTokenProvider:
+    """Installation access tokens for a GitHub App, cached in memory and refreshed before they expire.
+
+    The app signs a short-lived JWT with its private key, and exchanges it for a token for its
+    installation on one organization (or user). Installation tokens last an hour and have their
+    own rate limit, which grows with the size of the organization, instead of sharing one user's.
+    Safe to use from several threads; only one of them refreshes an expiring token.
+    """
+
+    def __init__(self, app_id, private_key, installation_owner, clock=time.time):
+        self.app_id = app_id
+        self.private_key = private_key
+        self.installation_owner = installation_owner
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._installation_id = None
+        self._token = None
+        self._expires_at = 0.0
+        self.expires_at = None  # The current token's expiry as a datetime, for display
+
+    def _create_jwt(self) -> str:
+        import jwt  # PyJWT, installed with PyGithub; only needed for GitHub App authentication
+        now = int(self._clock())
+        # Backdated a minute to allow for clock drift; GitHub rejects JWTs valid for more than 10 minutes
+        payload = {"iat": now - 60, "exp": now + 540, "iss": str(self.app_id)}
+        return jwt.encode(payload, self.private_key, algorithm="RS256")
+
+    def _request(self, method, url) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self._create_jwt()}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        response = self._session.request(method, url, headers=headers)
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"GitHub App authentication failed: {response.status_code} - {response.text}")
+        return response.json()
+
+    def _find_installation_id(self) -> int:
+        try:
+            return self._request("GET", f"https://api.github.com/orgs/{self.installation_owner}/installation")['id']
+        except RuntimeError:
+            # The owner is a user rather than an organization
+            return self._request("GET", f"https://api.github.com/users/{self.installation_owner}/installation")['id']
+
+    def get_token(self) -> str:
+        """Return an installation token with at least GITHUB_APP_TOKEN_REFRESH_SECONDS left before it expires."""
+        with self._lock:
+            if self._token is None or self._expires_at - self._clock() < GITHUB_APP_TOKEN_REFRESH_SECONDS:
+                if self._installation_id is None:
+                    self._installation_id = self._find_installation_id()
+                token = self._request("POST", f"https://api.github.com/app/installations/{self._installation_id}/access_tokens")
+                self.expires_at = datetime.strptime(token['expires_at'], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+                self._expires_at = self.expires_at.timestamp()
+                self._token = token['token']
+            return self._token
+
+
+class GitHubClient:
+    """An authenticated GitHub connection that can be used from several threads at once.
+
+    Neither PyGithub objects nor requests sessions are safe to share between threads, so each
+    thread lazily gets its own Github instance and requests.Session, all using the same token.
+    Sessions keep connections to api.github.com alive between calls.
+
+    The token is either a fixed personal access token, or comes from a token_provider such as
+    GitHubAppTokenProvider, in which case each thread's Github instance is rebuilt whenever
+    the token is refreshed.
+    """
+
+    def __init__(self, token=None, token_provider=None):
+        self._token = token
+        self.token_provider = token_provider
+        self._local = threading.local()
+
+    @property
+    def token(self) -> str:
+        """The current token, to send as a Bearer token."""
+        return self.token_provider.get_token() if self.token_provider else self._token
+
+    @property
+    def gh(self) -> Github:
+        """The PyGithub instance for the calling thread."""
+        token = self.token
+        if getattr(self._local, "gh_token", None) != token:
+            self._local.gh = Github(token)
+            self._local.gh_token = token
+        return self._local.gh
+
+    @property
+    def session(self) -> requests.Session:
+        """The requests session for the calling thread."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+
+def get_github_client(client=None) -> GitHubClient:
+    """Return the given client, or the shared client created by login_to_github if none was given."""
+    return client if client is not None else GITHUB_CLIENT
+
+def get_github_executor() -> RateLimitedExecutor:
+    """Return the executor shared by all rate-limited GitHub writes, creating it on first use."""
+    global GITHUB_EXECUTOR
+    if GITHUB_EXECUTOR is None:
+        GITHUB_EXECUTOR = RateLimitedExecutor()
+    return GITHUB_EXECUTOR
+
+def login_to_github(installation_owner=None):
+    """Authenticate to GitHub as a GitHub App installation, or using a personal access token.
+
+    The GitHub App is used if GITHUB_APP_ID and GITHUB_APP_PRIVATE_KEY_PATH are set in the environment;
+    its installation on installation_owner (batch_repo_owner in config.yaml) is used.
+    """
+    global GITHUB_CLIENT
+    app_id = os.environ.get("GITHUB_APP_ID")
+    private_key_path = os.environ.get("GITHUB_APP_PRIVATE_KEY_PATH")
+    if app_id and private_key_path:
+        try:
+            with open(private_key_path, "r") as f:
+                private_key = f.read()
+        except OSError as e:
+            print(f"Error: Could not read the GitHub App private key from GITHUB_APP_PRIVATE_KEY_PATH: {e}")
+            exit(1)
+
+        token_provider = GitHubAppTokenProvider(app_id, private_key, installation_owner)
+        try:
+            token_provider.get_token()
+        except Exception as e:
+            print(f"Error: {e}")
+            print(f"Check that GitHub App {app_id} is installed on {installation_owner} (batch_repo_owner in config.yaml)" \
+                " and that GITHUB_APP_PRIVATE_KEY_PATH points to one of its private keys.")
+            exit(1)
+        GITHUB_CLIENT = GitHubClient(token_provider=token_provider)
+        print(f"Authenticated as GitHub App {app_id} installed on {installation_owner} "
+              f"(token refreshed automatically, current one expires {token_provider.expires_at:%H:%M} UTC)")
+        return
+
+    github_token = os.environ.get("GITHUB_TOKEN")
+    if not github_token:
         print("Error: GITHUB_TOKEN is not set in your environment.")
         print("A Github Personal Access Token is required to access the existing template repository" \
             " and to create the new repositories.")
@@ -21,42 +237,45 @@ def login_to_github():
         print("You can set the token in your enviornment by invoking the commands:")
         print("Unix/Linux/macOS: 'export GITHUB_TOKEN=ghp_XXXXXXXXXXXXXXXXXX'")
         print("Windows: 'set GITHUB_TOKEN=ghp_XXXXXXXXXXXXXXXXXX' or '$env:GITHUB_TOKEN=" +'"ghp_XXXXXXXXXXXXXXXXXX"')
+        print("Alternatively, set GITHUB_APP_ID and GITHUB_APP_PRIVATE_KEY_PATH to authenticate as a GitHub App.")
         exit(1)
 
     # This authenticates (logs in) the user using the provided token
-    GH = Github(GITHUB_TOKEN)
-    user = GH.get_user()
+    GITHUB_CLIENT = GitHubClient(github_token)
+    user = GITHUB_CLIENT.gh.get_user()
     print(f"Authenticed as GitHub User: {user.login} ({user.name})")
 
     
-def get_repository_from_gitHub(repo_path):
-    
-    try:
-        repo = GH.get_repo(repo_path)
-    except Exception as e:
-        return None
-    return repo
+def get_repository_from_gitHub(repo_path, client=None):
+    """Get a repository's handle, or None if it doesn't exist or can't be read."""
+    repo_json, _ = get_repo_json(repo_path, client=client)
+    return RepoHandle.from_json(repo_json) if repo_json else None
 
-def create_repo_from_template(template_path, batch_repo_owner, batch_repo_name, batch_repo_description) -> tuple:
+def create_repo_from_template(template_path, batch_repo_owner, batch_repo_name, batch_repo_description, check_exists=True, client=None) -> tuple:
     """Create a new repository from a template repository.
+
+    check_exists can be turned off when the caller already knows the repository doesn't exist
+    (e.g. from list_owner_repos), which saves a request.
     
     Returns a tuple of (result, new_repo, error_message).
         result can be "created", "exists", or "error" 
-        new_repo is the created repository object or None if an error occurred.
+        new_repo is the RepoHandle of the repository, or None if an error occurred.
         error_message is the error message if an error occurred, otherwise None.
     """
+    client = get_github_client(client)
     
     rep_path = f"{batch_repo_owner}/{batch_repo_name}"
 
     # Check if the repository already exists
-    new_repo = get_repository_from_gitHub(rep_path)
-    if new_repo:
-        return ("exists", new_repo, None)
+    if check_exists:
+        new_repo = get_repository_from_gitHub(rep_path, client=client)
+        if new_repo:
+            return ("exists", new_repo, None)
 
     url = f"https://api.github.com/repos/{template_path}/generate"
 
     headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
+        "Authorization": f"Bearer {client.token}",
     }
 
     data = {
@@ -65,50 +284,222 @@ def create_repo_from_template(template_path, batch_repo_owner, batch_repo_name,
         "description": batch_repo_description,
         "private": False
     }
-    response = requests.post(url, headers=headers, json=data)
+    response = client.session.post(url, headers=headers, json=data)
 
     if response.status_code != 201:
         return ("error", None, response.json())
 
-    new_repo = GH.get_repo(f"{batch_repo_owner}/{batch_repo_name}")
-    return ("created", new_repo, None)
+    # The response is the new repository, so there is no need to fetch it
+    return ("created", RepoHandle.from_json(response.json()), None)
 
-def update_repo_with_google_data_sheet_link(repo, story_data_sheet_URL, file_to_update, variable_to_update) -> tuple:
-    """Update the file in the repository that contains the link to the data sheet.
+def get_repo_creation_url(owner, client=None) -> tuple:
+    """Find the URL that creates repositories for an owner, from whether it is an organization or a user.
+
+    A user can only be the token's own user, as the API can't create repositories for other users.
+    The answer is looked up once per owner and remembered.
+
+    Returns a tuple of (url, error_message).
+        url is the URL to POST new repositories to, or None if an error occurred.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    if owner in REPO_CREATION_URLS:
+        return REPO_CREATION_URLS[owner], None
+
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    try:
+        response = client.session.get(f"https://api.github.com/users/{owner}", headers=headers)
+        if response.status_code == 404:
+            return None, f"GitHub organization or user '{owner}' not found"
+        if response.status_code != 200:
+            return None, f"Failed to look up '{owner}': {response.status_code} - {response.text}"
+
+        if response.json()['type'] == "Organization":
+            url = f"https://api.github.com/orgs/{owner}/repos"
+        else:
+            response = client.session.get("https://api.github.com/user", headers=headers)
+            if response.status_code != 200:
+                return None, f"'{owner}' is a user, and the token's own user can't be read: {response.status_code} - {response.text}"
+            if response.json()['login'].lower() != owner.lower():
+                return None, f"'{owner}' is a different user than the token's user '{response.json()['login']}', so repositories can't be created for it"
+            url = "https://api.github.com/user/repos"
+    except Exception as e:
+        return None, e
+
+    REPO_CREATION_URLS[owner] = url
+    return url, None
+
+def create_empty_repo(batch_repo_owner, batch_repo_name, batch_repo_description, check_exists=True, client=None) -> tuple:
+    """Create a new, empty repository (no commits) that content can be pushed to.
+
+    check_exists can be turned off when the caller already knows the repository doesn't exist.
     
-    Returns a tuple of (result, updated_file, error_message).
+    Returns a tuple of (result, new_repo, error_message).
+        result can be "created", "exists", or "error" 
+        new_repo is the RepoHandle of the repository, or None if an error occurred.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    if check_exists:
+        new_repo = get_repository_from_gitHub(f"{batch_repo_owner}/{batch_repo_name}", client=client)
+        if new_repo:
+            return ("exists", new_repo, None)
+
+    # Decided up front rather than on a 404, so a mistyped organization is never taken for the token's user
+    creation_url, e = get_repo_creation_url(batch_repo_owner, client=client)
+    if e:
+        return ("error", None, e)
+
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+    }
+
+    data = {
+        "name": batch_repo_name,
+        "description": batch_repo_description,
+        "private": False,
+        "auto_init": False
+    }
+    response = client.session.post(creation_url, headers=headers, json=data)
+
+    if response.status_code != 201:
+        return ("error", None, response.json())
+
+    # The response is the new repository, so there is no need to fetch it
+    return ("created", RepoHandle.from_json(response.json()), None)
+
+def is_repo_empty(repo, client=None) -> tuple:
+    """Check whether a repository has no commits yet, e.g. because a push into it never happened.
+
+    The repository's size can't tell, as GitHub only updates it some time after a push.
+    Returns a tuple of (empty, error_message).
+        empty is True if the repository has no commits, otherwise False.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    try:
+        response = client.session.get(f"https://api.github.com/repos/{repo.full_name}/commits", headers={
+            "Authorization": f"Bearer {client.token}",
+            "Accept": "application/vnd.github.v3+json"
+        }, params={"per_page": 1})
+        if response.status_code == 409:  # "Git Repository is empty."
+            return True, None
+        if response.status_code != 200:
+            return False, f"Failed to read commits: {response.status_code} - {response.text}"
+        return not response.json(), None
+    except Exception as e:
+        return False, e
+
+def get_git_auth_header(client=None) -> str:
+    """Return the HTTP header that authenticates git over HTTPS with the GitHub token."""
+    client = get_github_client(client)
+    credentials = base64.b64encode(f"x-access-token:{client.token}".encode("utf-8")).decode("ascii")
+    return f"Authorization: Basic {credentials}"
+
+def update_repo_with_google_data_sheet_link(repo, story_data_sheet_URL, file_to_update, variable_to_update, client=None) -> tuple:
+    """Update the file in the repository that contains the link to the data sheet.
+
+    Uses exactly two requests: the file is read raw (which, unlike the JSON contents API, works
+    for files over 1MB), and written back with the blob SHA computed locally.
+
+    Returns a tuple of (result, error_message).
         result can be "updated", "no changes", or "error".
         error_message is the error message if an error occurred, otherwise None.
     """
+    client = get_github_client(client)
+    url = f"https://api.github.com/repos/{repo.full_name}/contents/{file_to_update}"
 
     try:
-        file = repo.get_contents(file_to_update, ref=repo.default_branch)
+        response = client.session.get(url, headers={
+            "Authorization": f"Bearer {client.token}",
+            "Accept": "application/vnd.github.raw"
+        }, params={"ref": repo.default_branch})
+        if response.status_code != 200:
+            return "error", f"Failed to read {file_to_update}: {response.status_code} - {response.text}"
     except Exception as e:
         return "error", e
-    
-    decoded = base64.b64decode(file.content).decode("utf-8")
-    lines = decoded.splitlines()
-    updated_lines = update_variable_with_data_sheet_link(lines, story_data_sheet_URL, variable_to_update)
 
-    if updated_lines == lines:
+    content = response.content
+    decoded = content.decode("utf-8")
+    updated, _ = update_variable_in_source(decoded, story_data_sheet_URL, variable_to_update)
+
+    if updated == decoded:
         return "no changes", None
-    
-    # Convert list back to string for update_file
-    updated_lines = "\n".join(updated_lines)
 
     # --- Commit change ---
+    # The contents API wants the SHA of the blob being replaced, which is the git hash of its bytes
+    blob_sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
     try:
-        result = repo.update_file(
-            path=file_to_update,
-            message="Update config with new Google Sheet URL",
-            content=updated_lines,
-            sha=file.sha,
-            branch="main"
-        )
+        response = client.session.put(url, headers={
+            "Authorization": f"Bearer {client.token}",
+            "Accept": "application/vnd.github.v3+json"
+        }, json={
+            "message": "Update config with new Google Sheet URL",
+            "content": base64.b64encode(updated.encode("utf-8")).decode("ascii"),
+            "sha": blob_sha,
+            "branch": repo.default_branch
+        })
+        if response.status_code != 200:
+            return "error", f"Failed to update {file_to_update}: {response.status_code} - {response.text}"
     except Exception as e:
         return "error", e
-    
-    return "updated", result
+
+    return "updated", None
+
+@functools.lru_cache(maxsize=None)
+def get_variable_assignment_pattern(variable_to_update):
+    """Compile the pattern that finds quoted string assignments to the variable.
+
+    Matches declarations and assignments ("var x = '...'", "const x=\"...\"", "window.x = '...'"),
+    where the first quoted string after the "=" in the same statement is the URL, so
+    wrapped values such as "x = String('...')" are found too. Also matches object properties
+    ("{x: '...'}", "{a: 1, x: '...'}") whose value is a quoted string; update_variable_in_source
+    checks that a colon form really is an object key, not e.g. the middle of "a ? x : '...'".
+    Any number of them can be on one line, so it also works on minified bundles.
+    Comparisons such as "x == '...'" and arrow functions ("x => '...'") are not matched.
+    The pattern starts with the variable name so the regex engine can skip ahead to it.
+    Captures: (":" for the object property form)(quote type)(old URL)
+    """
+    return re.compile(
+        rf'{re.escape(variable_to_update)}[^\S\r\n]*(?:=(?![=>])[^"\'\r\n;]*?|(:)[^\S\r\n]*)'
+        r'(["\'])([^"\'\r\n]*)\2')
+
+def update_variable_in_source(source, story_data_sheet_URL, variable_to_update) -> tuple:
+    """Update every assignment of the variable in the source text with the new data sheet link.
+
+    The source is scanned once and only the old URLs are replaced, so everything else,
+    including the original line endings, is kept exactly as it was.
+
+    Returns a tuple of (updated_source, replacements).
+        updated_source is the source with the URLs replaced, or the original source if the variable wasn't found.
+        replacements is the number of assignments that were updated.
+    """
+    pieces = []
+    position = 0
+    for match in get_variable_assignment_pattern(variable_to_update).finditer(source):
+        # Skip longer names that merely end with the variable name, e.g. "myGoogleSheetURL"
+        start = match.start()
+        if start and (source[start - 1].isalnum() or source[start - 1] in "_$"):
+            continue
+        # "x: '...'" is only an object property if "x" directly follows "{" or ","
+        if match.group(1):
+            before = start - 1
+            while before >= 0 and source[before].isspace():
+                before -= 1
+            if before < 0 or source[before] not in "{,":
+                continue
+        pieces.append(source[position:match.start(3)])
+        pieces.append(story_data_sheet_URL)
+        position = match.end(3)
+
+    if not pieces:
+        return source, 0
+
+    pieces.append(source[position:])
+    return "".join(pieces), len(pieces) // 2
 
 def update_variable_with_data_sheet_link(lines, story_data_sheet_URL, variable_to_update) -> list:
     """Update the specified variable in the lines with the new data sheet link.
@@ -116,28 +507,10 @@ def update_variable_with_data_sheet_link(lines, story_data_sheet_URL, variable_t
     Returns the updated lines if the variable was found and updated, otherwise returns the original lines.
 
     """
-    
-    updated_lines = []
-    variable_found = False
-    for i, line in enumerate(lines):
-        match = None
-        if not match and variable_to_update in line:
-            # Pattern to match variable declaration with either single or double quotes
-            # Captures: (everything before quotes)(quote type)(old URL)(same quote type)(everything after)
-            pattern = rf'(.*{re.escape(variable_to_update)}.*?=.*?)(["\'])([^"\']*?)(\2)(.*)'
-            match = re.match(pattern, line)
-        
-        if match:
-            # Replace the entire URL while keeping the same quote type and everything else
-            new_line = f'{match.group(1)}{match.group(2)}{story_data_sheet_URL}{match.group(4)}{match.group(5)}'
-            updated_lines.append(new_line)
-            variable_found = True
-        else:
-            updated_lines.append(line)
-
-    return updated_lines if variable_found else lines
+    updated, replacements = update_variable_in_source("\n".join(lines), story_data_sheet_URL, variable_to_update)
+    return updated.split("\n") if replacements else lines
 
-def enable_github_page(repo) -> tuple:
+def enable_github_page(repo, client=None) -> tuple:
     """Enable GitHub Pages for the repository.
     
     Returns a tuple of (result, page, error_message).
@@ -145,15 +518,16 @@ def enable_github_page(repo) -> tuple:
         page is the page object if the page was created or already exists, otherwise None.
         error_message is the error message if an error occurred, otherwise None.
     """
+    client = get_github_client(client)
 
     try:
-        page = get_repo_page(repo)
+        page = get_repo_page(repo, client=client)
         if page:
             return "exists", page, None
     
         url = f"https://api.github.com/repos/{repo.full_name}/pages"
         headers = {
-            "Authorization": f"Bearer {GITHUB_TOKEN}",
+            "Authorization": f"Bearer {client.token}",
             "Accept": "application/vnd.github.v3+json"
         }
         data = {
@@ -163,7 +537,7 @@ def enable_github_page(repo) -> tuple:
             }
         }
         
-        response = requests.post(url, headers=headers, json=data)
+        response = client.session.post(url, headers=headers, json=data)
         
         if response.status_code == 201:
             return "created", response.json(), None
@@ -173,17 +547,325 @@ def enable_github_page(repo) -> tuple:
     except Exception as e:
         return "error", None, e
     
-def get_repo_page(repo):
+def get_repo_page(repo, client=None):
+    client = get_github_client(client)
     url = f"https://api.github.com/repos/{repo.full_name}/pages"
     headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
+        "Authorization": f"Bearer {client.token}",
         "Accept": "application/vnd.github.v3+json"
     }
     
-    response = requests.get(url, headers=headers)
+    response = client.session.get(url, headers=headers)
     
     if response.status_code == 200:
         return response.json()
     else :
         return None
 
+def find_team_by_name(org_name, team_name, client=None) -> tuple:
+    """Find an organization's team by its name, listing the teams 100 per request.
+
+    Team names are matched case-insensitively, as GitHub does when it checks that names are unique.
+    Returns a tuple of (team_slug, error_message).
+        team_slug is the team's URL slug, or None if there is no such team or an error occurred.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    response = client.session.get(f"https://api.github.com/orgs/{org_name}/teams", headers=headers, params={"per_page": 100})
+    while True:
+        if response.status_code != 200:
+            return None, f"Failed to list teams: {response.status_code} - {response.text}"
+        for team in response.json():
+            if team['name'].lower() == team_name.lower():
+                return team['slug'], None
+        next_page = response.links.get('next')
+        if not next_page:
+            return None, None
+        # The next page URL already carries the query parameters
+        response = client.session.get(next_page['url'], headers=headers)
+
+def ensure_team(org_name, team_name, team_description, client=None) -> tuple:
+    """Create a team in the organization, unless a team with that name already exists.
+
+    GitHub derives the slug from the name in ways that are hard to predict (spaces, dots, ...), so the
+    slug is always taken from GitHub: from the new team, or from the existing team found by name.
+    Returns a tuple of (result, team_slug, error_message).
+        result can be "created", "exists", or "error".
+        team_slug is the team's URL slug, used to address the team in other calls, or None if an error occurred.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    try:
+        data = {
+            "name": team_name,
+            "description": team_description,
+            "privacy": "closed"
+        }
+        response = client.session.post(f"https://api.github.com/orgs/{org_name}/teams", headers=headers, json=data)
+        if response.status_code == 201:
+            return "created", response.json()['slug'], None
+        create_error = f"Failed to create team: {response.status_code} - {response.text}"
+        if response.status_code != 422:
+            return "error", None, create_error
+
+        # 422 usually means a team with this name already exists
+        team_slug, e = find_team_by_name(org_name, team_name, client=client)
+        if e:
+            return "error", None, e
+        if team_slug is None:
+            return "error", None, create_error
+        return "exists", team_slug, None
+    except Exception as e:
+        return "error", None, e
+
+def add_members_to_team(org_name, team_slug, usernames, client=None) -> list:
+    """Add GitHub users to a team, inviting them to the organization if they aren't members yet.
+
+    The requests go through the shared rate-limited executor.
+    Returns a list of (username, result, error_message) tuples.
+        result can be "added", "invited", or "error".
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    def add_member(username):
+        try:
+            response = client.session.put(
+                f"https://api.github.com/orgs/{org_name}/teams/{team_slug}/memberships/{username}",
+                headers=headers, json={"role": "member"})
+            if response.status_code != 200:
+                return username, "error", f"{response.status_code} - {response.text}"
+            # "pending" means GitHub sent the user an invitation to join the organization
+            state = response.json().get('state')
+            return username, "invited" if state == "pending" else "added", None
+        except Exception as e:
+            return username, "error", e
+
+    return get_github_executor().map(add_member, usernames)
+
+def add_repos_to_team(org_name, team_slug, repo_full_names, permission="push", client=None) -> list:
+    """Give a team access to repositories; "push" is write access.
+
+    The requests go through the shared rate-limited executor.
+    Returns a list of (repo_full_name, result, error_message) tuples.
+        result can be "added" or "error".
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    def add_repo(repo_full_name):
+        try:
+            response = client.session.put(
+                f"https://api.github.com/orgs/{org_name}/teams/{team_slug}/repos/{repo_full_name}",
+                headers=headers, json={"permission": permission})
+            if response.status_code != 204:
+                return repo_full_name, "error", f"{response.status_code} - {response.text}"
+            return repo_full_name, "added", None
+        except Exception as e:
+            return repo_full_name, "error", e
+
+    return get_github_executor().map(add_repo, repo_full_names)
+
+def list_owner_repos(owner, client=None) -> tuple:
+    """List every repository of an organization (or user), 100 per request.
+
+    Returns a tuple of (repos, error_message).
+        repos is a dictionary of repo name -> the repository's JSON from the GitHub API,
+        which includes its 'node_id', 'description' and 'html_url'.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+    repos = {}
+    url = f"https://api.github.com/orgs/{owner}/repos"
+    params = {"per_page": 100, "type": "all"}
+    try:
+        response = client.session.get(url, headers=headers, params=params)
+        if response.status_code == 404:
+            # The owner is a user rather than an organization
+            response = client.session.get(f"https://api.github.com/users/{owner}/repos", headers=headers, params=params)
+        while True:
+            if response.status_code != 200:
+                return {}, f"Failed to list repositories: {response.status_code} - {response.text}"
+            repos.update((repo['name'], repo) for repo in response.json())
+            next_page = response.links.get('next')
+            if not next_page:
+                return repos, None
+            # The next page URL already carries the query parameters
+            response = client.session.get(next_page['url'], headers=headers)
+    except Exception as e:
+        return {}, e
+
+def update_repo_descriptions(descriptions, client=None) -> list:
+    """Change the descriptions of many repositories with batched GraphQL mutations.
+
+    descriptions is a dictionary of repository node ID -> new description.
+    Up to GITHUB_MUTATIONS_PER_REQUEST repositories are updated per request, and the
+    requests go through the shared rate-limited executor.
+    Returns a list of (node_id, result, error_message) tuples.
+        result can be "updated" or "error".
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+    }
+
+    def update_chunk(node_ids):
+        # One aliased updateRepository mutation per repository, e.g. r0: updateRepository(...)
+        variables = {}
+        parameters = []
+        mutations = []
+        for index, node_id in enumerate(node_ids):
+            variables[f"id{index}"] = node_id
+            variables[f"description{index}"] = descriptions[node_id]
+            parameters.append(f"$id{index}: ID!, $description{index}: String!")
+            mutations.append(f"r{index}: updateRepository(input: {{repositoryId: $id{index}, "
+                             f"description: $description{index}}}) {{ repository {{ id }} }}")
+        query = f"mutation({', '.join(parameters)}) {{ {' '.join(mutations)} }}"
+
+        try:
+            response = client.session.post("https://api.github.com/graphql", headers=headers,
+                                           json={"query": query, "variables": variables})
+            if response.status_code != 200:
+                return [(node_id, "error", f"{response.status_code} - {response.text}") for node_id in node_ids]
+            body = response.json()
+        except Exception as e:
+            return [(node_id, "error", e) for node_id in node_ids]
+
+        # Errors are reported per mutation, with the alias as the first element of their path
+        errors = {}
+        for error in body.get('errors', []):
+            errors.setdefault((error.get('path') or ["request"])[0], error.get('message'))
+        data = body.get('data') or {}
+        results = []
+        for index, node_id in enumerate(node_ids):
+            alias = f"r{index}"
+            if data.get(alias):
+                results.append((node_id, "updated", None))
+            else:
+                results.append((node_id, "error", errors.get(alias) or errors.get("request") or "not updated"))
+        return results
+
+    node_ids = list(descriptions)
+    chunks = [node_ids[start:start + GITHUB_MUTATIONS_PER_REQUEST]
+              for start in range(0, len(node_ids), GITHUB_MUTATIONS_PER_REQUEST)]
+    return [result for chunk_results in get_github_executor().map(update_chunk, chunks) for result in chunk_results]
+
+def get_repo_json(repo_path, client=None) -> tuple:
+    """Get a repository's details (e.g. 'is_template', 'default_branch') from the GitHub API.
+
+    Returns a tuple of (repo, error_message).
+        repo is the repository's JSON, or None if it could not be read.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    try:
+        response = client.session.get(f"https://api.github.com/repos/{repo_path}", headers=headers)
+        if response.status_code != 200:
+            return None, f"{response.status_code} - {response.text}"
+        return response.json(), None
+    except Exception as e:
+        return None, e
+
+def get_file_text(repo_path, file_path, ref=None, client=None) -> tuple:
+    """Read a text file from a repository in one request, without the base64 round trip of the JSON contents API.
+
+    Returns a tuple of (text, error_message).
+        text is the file's content, or None if it could not be read.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.raw"
+    }
+    params = {"ref": ref} if ref else None
+    try:
+        response = client.session.get(f"https://api.github.com/repos/{repo_path}/contents/{file_path}",
+                                      headers=headers, params=params)
+        if response.status_code != 200:
+            return None, f"{response.status_code} - {response.text}"
+        return response.content.decode("utf-8"), None
+    except Exception as e:
+        return None, e
+
+def get_rate_limit(client=None) -> tuple:
+    """Get the remaining core API requests of the current token, and its OAuth scopes.
+
+    Checking the rate limit does not count against it.
+    Returns a tuple of (remaining, limit, scopes, error_message).
+        scopes is the list of the token's scopes, or None for tokens without scopes
+        (fine-grained personal access tokens and GitHub App installation tokens).
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    try:
+        response = client.session.get("https://api.github.com/rate_limit", headers=headers)
+        if response.status_code != 200:
+            return None, None, None, f"{response.status_code} - {response.text}"
+        core = response.json()['resources']['core']
+        scopes_header = response.headers.get("X-OAuth-Scopes")
+        scopes = None if scopes_header is None else [scope.strip() for scope in scopes_header.split(",") if scope.strip()]
+        return core['remaining'], core['limit'], scopes, None
+    except Exception as e:
+        return None, None, None, e
+
+def get_owner_access(owner, client=None) -> tuple:
+    """Find out how the current token is allowed to create repositories for an organization or user.
+
+    Returns a tuple of (result, error_message).
+        result can be "installation" (a GitHub App installed on the owner), "admin" or "member"
+        (the token's user is an active member of the organization with that role), "self" (the owner
+        is the token's user), "none", or "error".
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_github_client(client)
+    if client.token_provider is not None:
+        # The installation was looked up on this owner when logging in
+        return "installation", None
+
+    headers = {
+        "Authorization": f"Bearer {client.token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    try:
+        response = client.session.get(f"https://api.github.com/user/memberships/orgs/{owner}", headers=headers)
+        if response.status_code == 200:
+            membership = response.json()
+            return (membership['role'] if membership.get('state') == "active" else "none"), None
+
+        response = client.session.get("https://api.github.com/user", headers=headers)
+        if response.status_code != 200:
+            return "error", f"{response.status_code} - {response.text}"
+        return ("self" if response.json()['login'].lower() == owner.lower() else "none"), None
+    except Exception as e:
+        return "error", e
+
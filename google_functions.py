@@ -1,25 +1,149 @@
 
 import os
 import re
+import itertools
+import threading
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
 
-GOOGLE_CREDS = None
-SHEETS_SERVICE = None
-DRIVE_SERVICE = None
+GOOGLE_CLIENT = None
+# Held while the shared client is set up, so threads that need it at the same time
+# (e.g. the preflight checks) authenticate only once
+GOOGLE_CLIENT_LOCK = threading.Lock()
 VERBOSE = False
 
+TOKEN_FILE = '.auth/token.json'
+
+# The values read from each input sheet, keyed by sheet ID, as a {tab name: values} dictionary.
+# Kept so the URL write-back can line up with the rows without reading the sheet again.
+INPUT_SHEET_VALUES = {}
+
+
+class GoogleClient:
+    """Google Sheets and Drive services that can be used from several threads at once.
+
+    The API client libraries send requests through an httplib2 transport, which is not
+    thread-safe, so each thread gets its own authorized transport and service objects.
+    All of them share one set of credentials, which are refreshed (and saved back to the
+    token file) under a lock so parallel callers never refresh or write the file at the same time.
+    This includes the refresh a transport makes when a request is rejected with a 401.
+    """
+
+    def __init__(self, creds, token_file=TOKEN_FILE):
+        self._creds = creds
+        self._token_file = token_file
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _ensure_fresh_credentials(self):
+        with self._lock:
+            # "valid" turns False a few minutes before expiry, so the token is refreshed before requests fail
+            if not self._creds.valid:
+                self._refresh_credentials()
+
+    def _apply_credentials(self, headers) -> str:
+        """Add the (refreshed if needed) access token to the request headers, and return it."""
+        with self._lock:
+            if not self._creds.valid:
+                self._refresh_credentials()
+            self._creds.apply(headers)
+            return self._creds.token
+
+    def _refresh_rejected_token(self, rejected_token):
+        with self._lock:
+            # Threads that sent the same token all get the 401; only the first one needs to refresh it
+            if self._creds.token == rejected_token:
+                self._refresh_credentials()
+
+    def _refresh_credentials(self):
+        if VERBOSE:
+            print("Refreshing expired credentials...")
+        self._creds.refresh(Request())
+        save_google_credentials(self._creds, self._token_file)
+
+    def _services(self) -> dict:
+        services = getattr(self._local, "services", None)
+        if services is None:
+            http = AuthorizedHttp(_LockedCredentials(self), http=httplib2.Http())
+            services = {
+                "sheets": build("sheets", "v4", http=http),
+                "drive": build("drive", "v3", http=http)
+            }
+            self._local.services = services
+        return services
+
+    @property
+    def sheets(self):
+        """The Google Sheets v4 service for the calling thread."""
+        self._ensure_fresh_credentials()
+        return self._services()["sheets"]
+
+    @property
+    def drive(self):
+        """The Google Drive v3 service for the calling thread."""
+        self._ensure_fresh_credentials()
+        return self._services()["drive"]
+
+
+class _LockedCredentials:
+    """The shared credentials as one thread's AuthorizedHttp sees them.
+
+    AuthorizedHttp (and the batch requests of the API client) refresh the credentials they are given
+    when they find them expired or a request is rejected; this sends every refresh through the client's lock.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._sent_token = None
+
+    @property
+    def valid(self):
+        return self._client._creds.valid
+
+    # The names the API client's batch requests check on credentials that aren't google.auth ones
+    @property
+    def access_token(self):
+        return self._client._creds.token
+
+    @property
+    def access_token_expired(self):
+        return not self._client._creds.valid
+
+    def before_request(self, request, method, url, headers):
+        self.apply(headers)
+
+    def apply(self, headers, token=None):
+        self._sent_token = self._client._apply_credentials(headers)
+
+    def refresh(self, request):
+        self._client._refresh_rejected_token(self._sent_token)
+
+
 def set_verbose(verbose):
     """Set the global verbose flag"""
     global VERBOSE
     VERBOSE = verbose
 
-def authenticate_google_user() -> None:
-    """Authenticate using OAuth2 user credentials"""
-    global GOOGLE_CREDS
+def save_google_credentials(creds, token_file=TOKEN_FILE) -> None:
+    """Save the credentials for the next run.
+
+    The file is written under a temporary name and then swapped in, so a reader never sees a half-written token.
+    """
+    temp_file = f"{token_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, 'w') as token:
+        token.write(creds.to_json())
+    os.replace(temp_file, token_file)
+
+def authenticate_google_user() -> Credentials:
+    """Authenticate using OAuth2 user credentials
+
+    Returns the authenticated credentials.
+    """
     SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 
               'https://www.googleapis.com/auth/drive']
     creds = None
@@ -27,10 +151,10 @@ def authenticate_google_user() -> None:
     if VERBOSE:
         print("Authenticating Google user...")
     # Token file stores the user's access and refresh tokens
-    if os.path.exists('.auth/token.json'):
+    if os.path.exists(TOKEN_FILE):
         if VERBOSE:
-            print("Loading existing credentials from .auth/token.json...")
-        creds = Credentials.from_authorized_user_file('.auth/token.json', SCOPES)
+            print(f"Loading existing credentials from {TOKEN_FILE}...")
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
     
     # If there are no (valid) credentials available, let the user log in
     if not creds or not creds.valid:
@@ -52,35 +176,68 @@ def authenticate_google_user() -> None:
                 print("Refer to README for instructions on how set up Google Authentication. ")
                 exit(1)
         
-        # Save the credentials for the next run
-        with open('.auth/token.json', 'w') as token:
-            print("Saving new credentials to .auth/token.json...")
-            token.write(creds.to_json())
+        print(f"Saving new credentials to {TOKEN_FILE}...")
+        save_google_credentials(creds)
     print(f"Google user authenticated successfully")
-    GOOGLE_CREDS = creds
+    return creds
 
 def ensure_google_setup() -> None:
-    """Set up Google Sheets and Drive services using the authenticated credentials."""
-    global SHEETS_SERVICE, DRIVE_SERVICE
-    try:
-        if GOOGLE_CREDS is None:
-            authenticate_google_user()
+    """Set up the shared Google client using the authenticated credentials.
 
-        if GOOGLE_CREDS is None:
-            print("Error: Cannot set up Google services: Failed to authenticate with Google")
-            print("If your credentials have expired, delete the .auth/token.json file and try again.")
-            exit(1)
+    Safe to call from several threads at once: only the first one authenticates, and the others wait for it.
+    """
+    global GOOGLE_CLIENT
+    if GOOGLE_CLIENT is not None:
+        return
+    try:
+        with GOOGLE_CLIENT_LOCK:
+            if GOOGLE_CLIENT is None:
+                creds = authenticate_google_user()
 
+                if creds is None:
+                    print("Error: Cannot set up Google services: Failed to authenticate with Google")
+                    print("If your credentials have expired, delete the .auth/token.json file and try again.")
+                    exit(1)
 
-        if SHEETS_SERVICE is None:
-            SHEETS_SERVICE = build("sheets", "v4", credentials=GOOGLE_CREDS)
-        if DRIVE_SERVICE is None:
-            DRIVE_SERVICE = build("drive", "v3", credentials=GOOGLE_CREDS)
+                GOOGLE_CLIENT = GoogleClient(creds)
     except Exception as e:
         print(f"Error setting up Google services: {e}")
         print("If your credentials have expired, delete the .auth/token.json file and try again.")
         exit(1)
 
+def get_google_client(client=None) -> GoogleClient:
+    """Return the given client, or the shared client (authenticating on first use) if none was given."""
+    if client is not None:
+        return client
+    ensure_google_setup()
+    return GOOGLE_CLIENT
+
+# Compiled once at import time: roster parsing calls the sanitizers for every row,
+# and whole-district rosters can have tens of thousands of rows
+REPO_NAME_INVALID_CHARS = re.compile(r'[^a-zA-Z0-9\s\-]')
+USERNAME_SEPARATORS = re.compile(r'[\s,;]+')
+
+# Optional input sheet column with the students' GitHub usernames, comma separated.
+# Like every other column listed in NON_AUTHOR_HEADERS, it is not treated as an author column.
+GITHUB_USERNAMES_HEADER = "GitHub Usernames"
+
+# Input sheet columns the provisioned URLs are written back to, and the processed repo keys they come from
+WRITE_BACK_COLUMNS = [
+    ("GitHub URL", "github_url"),
+    ("Pages URL", "pages_url"),
+    ("Data Sheet URL", "google_sheet_url")
+]
+# Sheet IDs in URLs like https://docs.google.com/spreadsheets/d/<id>/edit
+SHEET_ID_IN_URL = re.compile(r'/spreadsheets/d/([a-zA-Z0-9_-]+)')
+
+# Google's batch endpoints accept at most 100 requests per HTTP call
+GOOGLE_BATCH_MAX_REQUESTS = 100
+
+# Rows converted (and sanitized) together by convert_sheet_values_to_repo_names_and_authors
+CONVERT_CHUNK_ROWS = 10_000
+
+NON_AUTHOR_HEADERS = [GITHUB_USERNAMES_HEADER] + [header for header, _ in WRITE_BACK_COLUMNS]
+
 def sanitize_repo_name(repo_name):
     """
     Convert repo name to contain only alphanumeric characters and dashes.
@@ -93,10 +250,10 @@ def sanitize_repo_name(repo_name):
         return ""
     
     # Remove non-alphanumeric characters except spaces
-    cleaned = re.sub(r'[^a-zA-Z0-9\s\-]', '', repo_name)
+    cleaned = REPO_NAME_INVALID_CHARS.sub('', repo_name)
     
-    # Replace one or more spaces with a single dash
-    cleaned = re.sub(r'\s+', '-', cleaned)
+    # Replace one or more spaces with a single dash (split() also drops leading/trailing spaces)
+    cleaned = '-'.join(cleaned.split())
     
     # Remove leading/trailing dashes
     cleaned = cleaned.strip('-')
@@ -106,6 +263,13 @@ def sanitize_repo_name(repo_name):
     
     return cleaned
 
+def sanitize_repo_names(repo_names) -> list:
+    """Sanitize a whole column of repo names at once, with the same rules as sanitize_repo_name.
+
+    returns: A list of sanitized repo names, in the same order as the input.
+    """
+    return [sanitize_repo_name(repo_name) for repo_name in repo_names]
+
 def sanitize_author_name(author_name) -> str:
     """
     Sanitize author names by removing leading/trailing whitespace and converting to title case.
@@ -115,11 +279,19 @@ def sanitize_author_name(author_name) -> str:
     if not author_name:
         return ""
     
-    # Remove leading/trailing whitespace and convert to title case
-    author_name = author_name.strip()
-    # Normalize remaining spaces
-    author_name = re.sub(r'\s+', ' ', author_name)
-    return author_name
+    # Remove leading/trailing whitespace and normalize remaining spaces
+    return ' '.join(author_name.split())
+
+def sanitize_author_names(author_names) -> list:
+    """Sanitize a whole column of author names at once.
+
+    returns: A list of sanitized author names, in the same order as the input.
+    """
+    return [' '.join(author_name.split()) if author_name else "" for author_name in author_names]
+
+def sanitize_sheet_name(sheet_name):
+    """Sanitize the sheet name to remove unwanted characters."""
+    return ''.join(char for char in sheet_name if char.isalnum() or char.isspace()).strip()
 
 def convert_author_names_to_list(author_columns) -> str:
     """Convert columns of author names into a string with commas separating each author.
@@ -127,14 +299,16 @@ def convert_author_names_to_list(author_columns) -> str:
     returns: A string of author names separated by commas.
     """
 
-    author_names = [] 
-    
-    for column_value in author_columns: 
-        sanitized_name = sanitize_author_name(column_value)
-        if sanitized_name:
-            author_names.append(sanitized_name)
+    return ", ".join([author_name for author_name in sanitize_author_names(author_columns) if author_name])
+
+def convert_github_usernames_to_list(usernames_cell) -> list:
+    """Split a cell of GitHub usernames separated by commas, semicolons or spaces.
 
-    return ", ".join(author_names)
+    returns: A list of usernames without any leading '@'.
+    """
+    if not usernames_cell:
+        return []
+    return [username.lstrip('@') for username in USERNAME_SEPARATORS.split(usernames_cell) if username.lstrip('@')]
 
 def find_header_row_index(sheet_values, header_name) -> int:
     """Find the index of the header row containing the specified header name.
@@ -144,83 +318,483 @@ def find_header_row_index(sheet_values, header_name) -> int:
     if not sheet_values or sheet_values[0] is None:
         return -1
     header = sheet_values[0]  # Assuming the first row is the header row
+    header_name = header_name.lower().strip()
     for index, col_name in enumerate(header):
-        if header_name.lower().strip() == col_name.lower().strip():
+        if header_name == col_name.lower().strip():
             return index
     return -1
 
-def convert_sheet_values_to_repo_names_and_authors(sheet_values) -> list:
+def convert_sheet_values_to_repo_names_and_authors(sheet_values, record_rows=False) -> list:
     """Convert Google Sheet values to a list of repository names.
+
+    sheet_values can be any iterable of rows, header row first, such as a list of lists
+    from the Sheets API or a reader that streams rows from a file. Rows are converted
+    CONVERT_CHUNK_ROWS at a time, so a streamed input is never held in memory all at once.
     
     Returns a list of dictionaries with 'title', 'repo-name', and 'authors' keys.
+    If the sheet has a "GitHub Usernames" column, each dictionary also has a 'github-usernames' list.
+    URLs written back by an earlier run are added under the keys of WRITE_BACK_COLUMNS (e.g. 'github_url'),
+    for the rows that have them.
+    If record_rows is True, each dictionary also has a 'row' key with its 1-based sheet row number.
     """
-    project_name_col_index = find_header_row_index(sheet_values, "Project Name")
+    rows = iter(sheet_values)
+    header_values = [next(rows, None)]
+    project_name_col_index = find_header_row_index(header_values, "Project Name")
     if project_name_col_index == -1:
         print("Error: 'Project Name' column not found in the Google Sheet.")
         return []
+    usernames_col_index = find_header_row_index(header_values, GITHUB_USERNAMES_HEADER)
+    url_col_indexes = [(index, repo_key) for index, repo_key in
+                       ((find_header_row_index(header_values, header), repo_key) for header, repo_key in WRITE_BACK_COLUMNS)
+                       if index != -1]
+
+    first_author_col_index = project_name_col_index + 1  # Subsequent columns are one column per author
+    non_author_col_indexes = {index for index in (find_header_row_index(header_values, header) for header in NON_AUTHOR_HEADERS)
+                              if index >= first_author_col_index}
+
     converted_data = []
-    for row in sheet_values[1:]:  # Skip header row
-         if row:  
-            
-            original_name = ""
-            if project_name_col_index < len(row) and row[project_name_col_index]:
-                original_name = row[project_name_col_index].strip()
-            repo_name = sanitize_repo_name(original_name)  
-            student_names = convert_author_names_to_list(row[project_name_col_index+1:]) # Subsequent columns are one column per author
-            
+    rows = ((row_number, row) for row_number, row in enumerate(rows, start=2) if row)  # Skip empty rows
+    while True:
+        chunk = list(itertools.islice(rows, CONVERT_CHUNK_ROWS))
+        if not chunk:
+            return converted_data
+
+        # Pull the project name column out first so it can be sanitized in one batch
+        titles = [row[project_name_col_index].strip()
+                  if project_name_col_index < len(row) and row[project_name_col_index] else ""
+                  for _, row in chunk]
+        repo_names = sanitize_repo_names(titles)
+
+        for (row_number, row), original_name, repo_name in zip(chunk, titles, repo_names):
+            if non_author_col_indexes:
+                author_columns = [value for index, value in enumerate(row[first_author_col_index:], first_author_col_index)
+                                  if index not in non_author_col_indexes]
+            else:
+                author_columns = row[first_author_col_index:]
             repo_data = {
                 "title": original_name,
                 "repo-name": repo_name,
-                "authors": student_names
+                "authors": convert_author_names_to_list(author_columns)
             }
+            if usernames_col_index != -1:
+                repo_data["github-usernames"] = convert_github_usernames_to_list(
+                    row[usernames_col_index] if usernames_col_index < len(row) else "")
+            for url_col_index, repo_key in url_col_indexes:
+                if url_col_index < len(row) and row[url_col_index].strip():
+                    repo_data[repo_key] = row[url_col_index].strip()
+            if record_rows:
+                repo_data["row"] = row_number
             converted_data.append(repo_data)
-    return converted_data
 
-def fetch_repo_data_from_google_sheet(google_sheet_id) -> list:
-    """Fetch repository names and authors from the first sheet of a Google Sheet.
+def quote_sheet_name(sheet_name) -> str:
+    """Quote a tab name for use in A1 notation ranges, e.g. 'Cohort''s Roster'."""
+    return "'" + sheet_name.replace("'", "''") + "'"
 
-    Returns a list of dictionaries with 'title', 'repo-name', and 'authors' keys.
+def convert_tab_values_to_repo_data(tab_values, record_rows=False) -> list:
+    """Convert the values of several input sheet tabs into one stream of projects.
+
+    tab_values is a list of (tab name, sheet values) tuples; each tab has its own header row.
+    Every project dictionary is tagged with a 'tab' key naming the tab it came from, and with
+    a 'row' key naming its sheet row if record_rows is True.
+    A project listed again in a later tab with the same repo name and authors is dropped;
+    projects that share a repo name but differ are kept, for the name collision check to report.
+
+    Returns a list of dictionaries with 'title', 'repo-name', 'authors' and 'tab' keys.
+    """
+    all_repo_data = []
+    seen = set()
+    for tab_name, sheet_values in tab_values:
+        for repo_data in convert_sheet_values_to_repo_names_and_authors(sheet_values, record_rows=record_rows):
+            key = (repo_data['repo-name'], repo_data['title'], repo_data['authors'])
+            if key in seen:
+                if VERBOSE:
+                    print(f"Skipping duplicate project \"{repo_data['title']}\" in tab '{tab_name}'")
+                continue
+            seen.add(key)
+            repo_data['tab'] = tab_name
+            all_repo_data.append(repo_data)
+    return all_repo_data
+
+def fetch_repo_data_from_google_sheet(google_sheet_id, tabs=None, client=None) -> list:
+    """Fetch repository names and authors from one or more tabs of a Google Sheet.
+
+    tabs can be None (the first tab only), "all" (every tab), or a list of tab names.
+    All the selected tabs are read with a single values.batchGet call.
+
+    Returns a list of dictionaries with 'title', 'repo-name', 'authors', 'tab' and 'row' keys;
+    the tab and row say where to write the project's URLs back to.
     """
     if VERBOSE:
         print("Reading repository names from Google Sheet...")
-    ensure_google_setup()
+    client = get_google_client(client)
 
     try:
 
-        # Get the first sheet's name, as it is required to get the values for the sheet
-        sheet_metadata = SHEETS_SERVICE.spreadsheets().get(spreadsheetId=google_sheet_id).execute()
-        first_sheet_name = sheet_metadata['sheets'][0]['properties']['title']
+        # Get the tab names, as they are required to get the values for the tabs
+        sheet_metadata = client.sheets.spreadsheets().get(
+            spreadsheetId=google_sheet_id,
+            fields="sheets.properties.title"
+        ).execute()
+        all_tab_names = [sheet['properties']['title'] for sheet in sheet_metadata['sheets']]
+
+        if tabs is None:
+            tab_names = all_tab_names[:1]
+        elif tabs == "all":
+            tab_names = all_tab_names
+        else:
+            tab_names = list(tabs)
+            missing_tab_names = [tab_name for tab_name in tab_names if tab_name not in all_tab_names]
+            if missing_tab_names:
+                print(f"Error: Tabs {missing_tab_names} not found in the Google Sheet. It has the tabs {all_tab_names}.")
+                exit(1)
 
-        # Get all the values from the first sheet
-        sheet1_values = SHEETS_SERVICE.spreadsheets().values().get(
+        # Get all the values from every selected tab in one request
+        batch_values = client.sheets.spreadsheets().values().batchGet(
             spreadsheetId=google_sheet_id,
-            range=first_sheet_name
+            ranges=[quote_sheet_name(tab_name) for tab_name in tab_names]
         ).execute()
     except Exception as e:
         print(f"Error reading Google Sheet: {e}")
         print("Ensure the Google Sheet ID is correct and you have access to it.")
         exit(1)
-    
-    sheet1_values = sheet1_values.get('values', [])
-    if not sheet1_values:
+
+    # valueRanges come back in the same order as the requested ranges
+    tab_values = [(tab_name, value_range.get('values', []))
+                  for tab_name, value_range in zip(tab_names, batch_values.get('valueRanges', []))]
+    tab_values = [(tab_name, sheet_values) for tab_name, sheet_values in tab_values if sheet_values]
+    if not tab_values:
         print("No data found in the Google Sheet that is supposed to have repository and author names.")
         return []
-    
-    return convert_sheet_values_to_repo_names_and_authors(sheet1_values)
 
-def get_google_file(folder_id, file_name) -> tuple:
+    INPUT_SHEET_VALUES[google_sheet_id] = dict(tab_values)
+    return convert_tab_values_to_repo_data(tab_values, record_rows=True)
+
+def convert_column_index_to_letters(column_index) -> str:
+    """Convert a zero-based column index to its A1 notation letters (0 -> "A", 26 -> "AA")."""
+    letters = ""
+    column_number = column_index + 1
+    while column_number:
+        column_number, remainder = divmod(column_number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def build_url_write_back_updates(sheet_name, sheet_values, processed_repos) -> list:
+    """Build the cell updates that write the processed repos' URLs back into the input sheet.
+
+    Each processed repo is written to its project's own row (its 'row' key), so rows that were
+    rejected or dropped as duplicates, even ones whose names sanitize to the same repo name,
+    are never written to. A repo is skipped if it has no row, or if that row no longer holds
+    its project. Missing URL columns are added after the widest row, so no cell with data is
+    overwritten, and only cells whose value differs from the sheet are included.
+
+    Returns a list of ValueRange dictionaries for a single values.batchUpdate call.
+    """
+    project_name_col_index = find_header_row_index(sheet_values, "Project Name")
+    if project_name_col_index == -1:
+        return []
+
+    quoted_sheet_name = quote_sheet_name(sheet_name)
+    header = sheet_values[0]
+    updates = []
+
+    # Find the URL columns, adding any that are missing after the last column used by any row
+    url_col_indexes = []
+    next_new_col_index = max(len(header), max(len(row) for row in sheet_values))
+    for header_name, repo_key in WRITE_BACK_COLUMNS:
+        col_index = find_header_row_index(sheet_values, header_name)
+        if col_index == -1:
+            col_index = next_new_col_index
+            next_new_col_index += 1
+            updates.append({
+                "range": f"{quoted_sheet_name}!{convert_column_index_to_letters(col_index)}1",
+                "values": [[header_name]]
+            })
+        url_col_indexes.append((col_index, repo_key))
+
+    for repo in processed_repos:
+        row_index = repo.get('row')  # A1 rows are 1-based, so the header is row 1
+        if not row_index or row_index < 2 or row_index > len(sheet_values):
+            continue
+        row = sheet_values[row_index - 1]
+        if project_name_col_index >= len(row) or row[project_name_col_index].strip() != repo['title']:
+            continue
+        for col_index, repo_key in url_col_indexes:
+            new_value = repo.get(repo_key)
+            current_value = row[col_index] if col_index < len(row) else ""
+            if new_value and new_value != current_value:
+                updates.append({
+                    "range": f"{quoted_sheet_name}!{convert_column_index_to_letters(col_index)}{row_index}",
+                    "values": [[new_value]]
+                })
+    return updates
+
+def write_back_urls_to_input_sheet(google_sheet_id, processed_repos, client=None) -> tuple:
+    """Write the GitHub, Pages and Data Sheet URLs of the processed repos into the input sheet.
+
+    Each processed repo is written to the tab its project came from (its 'tab' key, or the first
+    tab if it has none). All changed cells, across all tabs, are written in one values.batchUpdate
+    call, using the values already read by fetch_repo_data_from_google_sheet when available.
+
+    Returns a tuple of (result, updated_cells, error_message).
+        result can be "updated", "no changes", or "error".
+        updated_cells is the number of cells written.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_google_client(client)
+
+    try:
+        if google_sheet_id not in INPUT_SHEET_VALUES:
+            fetch_repo_data_from_google_sheet(google_sheet_id, client=client)
+        tab_values = INPUT_SHEET_VALUES[google_sheet_id]
+        first_tab_name = next(iter(tab_values))
+
+        updates = []
+        for tab_name, sheet_values in tab_values.items():
+            tab_repos = [repo for repo in processed_repos if (repo.get('tab') or first_tab_name) == tab_name]
+            if tab_repos:
+                updates += build_url_write_back_updates(tab_name, sheet_values, tab_repos)
+        if not updates:
+            return "no changes", 0, None
+
+        client.sheets.spreadsheets().values().batchUpdate(
+            spreadsheetId=google_sheet_id,
+            body={
+                "valueInputOption": "RAW",
+                "data": updates
+            }
+        ).execute()
+        return "updated", len(updates), None
+    except Exception as e:
+        return "error", 0, e
+
+def get_sheet_id_from_url(sheet_url):
+    """Return the spreadsheet ID in a Google Sheets URL, or None if the URL has none."""
+    match = SHEET_ID_IN_URL.search(sheet_url or "")
+    return match.group(1) if match else None
+
+def execute_batch_requests(service, requests) -> dict:
+    """Send many API requests to one Google service in as few HTTP round trips as possible.
+
+    requests is a dictionary of key -> request (e.g. client.drive.files().update(...)), where the
+    keys are strings. They are sent in batches of GOOGLE_BATCH_MAX_REQUESTS.
+    If a whole batch fails (e.g. a network error), its exception is given for each of its requests
+    that got no response, and the other batches are still sent.
+
+    Returns a dictionary of key -> (response, exception); one of the two is always None.
+    """
+    responses = {}
+    def callback(request_id, response, exception):
+        responses[request_id] = (response, exception)
+
+    keys = list(requests)
+    for start in range(0, len(keys), GOOGLE_BATCH_MAX_REQUESTS):
+        batch_keys = keys[start:start + GOOGLE_BATCH_MAX_REQUESTS]
+        batch = service.new_batch_http_request(callback=callback)
+        for key in batch_keys:
+            batch.add(requests[key], request_id=key)
+        try:
+            batch.execute()
+        except Exception as e:
+            for key in batch_keys:
+                responses.setdefault(key, (None, e))
+    return responses
+
+def list_google_sheets(folder_id, name_prefix, client=None) -> tuple:
+    """List the Google Sheets in a Drive folder, or the user's sheets whose names contain name_prefix if there is no folder.
+
+    Returns a tuple of (sheets, error_message).
+        sheets is a dictionary of sheet ID -> the sheet's 'id', 'name' and 'webViewLink'.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_google_client(client)
+
+    query = "mimeType='application/vnd.google-apps.spreadsheet' and trashed=false"
+    if folder_id:
+        query += f" and '{folder_id}' in parents"
+    else:
+        query += f" and name contains '{name_prefix}'"
+
+    sheets = {}
+    page_token = None
+    try:
+        while True:
+            response = client.drive.files().list(
+                q=query, pageSize=1000, pageToken=page_token, fields="nextPageToken,files(id,name,webViewLink)").execute()
+            sheets.update((file['id'], file) for file in response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return sheets, None
+    except Exception as e:
+        return {}, e
+
+def copy_google_sheets(template_sheet_id, sheet_names, folder_id=None, client=None) -> dict:
+    """Make a copy of the template sheet for each of the names, in batched requests.
+
+    Returns a dictionary of sheet name -> (sheet_id, sheet_URL, error_message).
+        sheet_id and sheet_URL are None if the copy failed, and error_message is None if it succeeded.
+    """
+    client = get_google_client(client)
+
+    requests = {}
+    for index, sheet_name in enumerate(sheet_names):
+        copy_body_params = {"name": sheet_name}
+        if folder_id:
+            copy_body_params["parents"] = [folder_id]
+        # Batch request IDs end up in HTTP headers, so use the position rather than the name
+        requests[str(index)] = client.drive.files().copy(
+            fileId=template_sheet_id, body=copy_body_params, fields="id,webViewLink")
+
+    copies = {}
+    for key, (response, exception) in execute_batch_requests(client.drive, requests).items():
+        sheet_name = sheet_names[int(key)]
+        if exception is not None:
+            copies[sheet_name] = (None, None, exception)
+        else:
+            copies[sheet_name] = (response['id'], response['webViewLink'], None)
+    return copies
+
+def share_sheets_with_anyone(sheet_ids, client=None) -> list:
+    """Share many sheets with anyone with the link, in two rounds of batched requests.
+
+    The first round reads every sheet's permissions, the second shares the sheets that aren't shared yet.
+    Returns a list of (sheet_id, result, error_message) tuples.
+        result can be "shared", "already_shared", or "error".
+    """
+    client = get_google_client(client)
+
+    requests = {sheet_id: client.drive.permissions().list(fileId=sheet_id, fields="permissions(type)")
+                for sheet_id in sheet_ids}
+    results = {}
+    for sheet_id, (response, exception) in execute_batch_requests(client.drive, requests).items():
+        if exception is not None:
+            results[sheet_id] = ("error", exception)
+        elif any(permission.get('type') == 'anyone' for permission in response.get('permissions', [])):
+            results[sheet_id] = ("already_shared", None)
+
+    requests = {sheet_id: client.drive.permissions().create(fileId=sheet_id, body={'type': 'anyone', 'role': 'writer'})
+                for sheet_id in sheet_ids if sheet_id not in results}
+    for sheet_id, (_, exception) in execute_batch_requests(client.drive, requests).items():
+        results[sheet_id] = ("error", exception) if exception is not None else ("shared", None)
+
+    return [(sheet_id, *results[sheet_id]) for sheet_id in sheet_ids]
+
+def get_story_info_for_sheets(sheet_ids, client=None) -> dict:
+    """Read the story title (Story!B2) and authors (Story!D2) of many data sheets in batched requests.
+
+    Returns a dictionary of sheet ID -> (title, authors), or (None, None) for sheets that could not be read.
+    """
+    client = get_google_client(client)
+
+    requests = {sheet_id: client.sheets.spreadsheets().values().batchGet(
+                    spreadsheetId=sheet_id, ranges=["Story!B2", "Story!D2"])
+                for sheet_id in sheet_ids}
+    story_info = {}
+    for sheet_id, (response, exception) in execute_batch_requests(client.sheets, requests).items():
+        if exception is not None:
+            story_info[sheet_id] = (None, None)
+            continue
+        # Empty cells have no 'values' at all
+        title, authors = [value_range.get('values', [[""]])[0][0] for value_range in response['valueRanges']]
+        story_info[sheet_id] = (title, authors)
+    return story_info
+
+def rename_google_files(new_names, client=None) -> list:
+    """Rename many Drive files in batched requests.
+
+    new_names is a dictionary of file ID -> new name.
+    Returns a list of (file_id, result, error_message) tuples.
+        result can be "renamed" or "error".
+    """
+    client = get_google_client(client)
+
+    requests = {file_id: client.drive.files().update(fileId=file_id, body={"name": name}, fields="id")
+                for file_id, name in new_names.items()}
+    return [(file_id, "error" if exception else "renamed", exception)
+            for file_id, (_, exception) in execute_batch_requests(client.drive, requests).items()]
+
+def update_story_info_for_sheets(story_info, client=None) -> list:
+    """Write the story title (Story!B2) and authors (Story!D2) of many data sheets in batched requests.
+
+    story_info is a dictionary of sheet ID -> (title, authors).
+    Returns a list of (sheet_id, result, error_message) tuples.
+        result can be "updated" or "error".
+    """
+    client = get_google_client(client)
+
+    requests = {sheet_id: client.sheets.spreadsheets().values().batchUpdate(
+                    spreadsheetId=sheet_id,
+                    body={
+                        "valueInputOption": "RAW",
+                        "data": [
+                            {"range": "Story!B2", "values": [[title]]},
+                            {"range": "Story!D2", "values": [[authors]]}
+                        ]
+                    })
+                for sheet_id, (title, authors) in story_info.items()}
+    return [(sheet_id, "error" if exception else "updated", exception)
+            for sheet_id, (_, exception) in execute_batch_requests(client.sheets, requests).items()]
+
+def get_sheet_tab_sizes(sheet_id, client=None) -> tuple:
+    """Get the tabs of a spreadsheet and their sizes, without reading any cell values.
+
+    Returns a tuple of (tab_sizes, error_message).
+        tab_sizes is a dictionary of tab name -> (row count, column count).
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_google_client(client)
+    try:
+        metadata = client.sheets.spreadsheets().get(
+            spreadsheetId=sheet_id, fields="sheets.properties(title,gridProperties)").execute()
+        tab_sizes = {}
+        for tab in metadata.get('sheets', []):
+            grid = tab['properties'].get('gridProperties', {})
+            tab_sizes[tab['properties']['title']] = (grid.get('rowCount', 0), grid.get('columnCount', 0))
+        return tab_sizes, None
+    except Exception as e:
+        return {}, e
+
+def get_drive_folder(folder_id, client=None) -> tuple:
+    """Get a Drive folder's type and whether the user can add files to it.
+
+    Returns a tuple of (folder, error_message).
+        folder is the file's 'mimeType' and 'capabilities', or None if it could not be read.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_google_client(client)
+    try:
+        folder = client.drive.files().get(
+            fileId=folder_id, fields="mimeType,capabilities(canAddChildren)", supportsAllDrives=True).execute()
+        return folder, None
+    except Exception as e:
+        return None, e
+
+def get_drive_file_modified_time(file_id, client=None) -> tuple:
+    """Get the time a Drive file was last changed, as the RFC 3339 'modifiedTime' string Drive reports.
+
+    Returns a tuple of (modified_time, error_message).
+        modified_time is the file's 'modifiedTime', or None if it could not be read.
+        error_message is the error message if an error occurred, otherwise None.
+    """
+    client = get_google_client(client)
+    try:
+        file = client.drive.files().get(fileId=file_id, fields="modifiedTime", supportsAllDrives=True).execute()
+        return file['modifiedTime'], None
+    except Exception as e:
+        return None, e
+
+def get_google_file(folder_id, file_name, client=None) -> tuple:
     """Check if a file with the given name exists in the specified Google Drive folder.
     
     Returns a tuple of (file_id, file_url) if the file exists, otherwise (None, None).
     """
-    ensure_google_setup()
+    client = get_google_client(client)
 
     try:
         query = f"name='{file_name}' and trashed=false"
         if folder_id:
             query += f" and '{folder_id}' in parents"
 
-        results = DRIVE_SERVICE.files().list(q=query, pageSize=1, fields='files(id,name, webViewLink)').execute()
+        results = client.drive.files().list(q=query, pageSize=1, fields='files(id,name, webViewLink)').execute()
         items = results.get('files', [])
         if items:
             return items[0]['id'], items[0]['webViewLink']
@@ -229,7 +803,7 @@ def get_google_file(folder_id, file_name) -> tuple:
     except Exception as e:
         return None, None
 
-def copy_story_data_sheet_to_new_sheet(template_sheet_id, batch_sheet_name, batch_sheet_folder_id=None) -> tuple:
+def copy_story_data_sheet_to_new_sheet(template_sheet_id, batch_sheet_name, batch_sheet_folder_id=None, client=None) -> tuple:
     """Copy the source Google Sheet to a new sheet with the specified name.
     
     Returns a tuple of (result, new_sheet_id, new_sheet_URL, error_message).
@@ -238,9 +812,9 @@ def copy_story_data_sheet_to_new_sheet(template_sheet_id, batch_sheet_name, batc
         new_sheet_URL is the URL of the newly created sheet or None if an error occurred.
         error_message is the error message if an error occurred, otherwise None.
     """
-    ensure_google_setup()
+    client = get_google_client(client)
 
-    new_sheet_id, new_sheet_URL = get_google_file(batch_sheet_folder_id, batch_sheet_name)
+    new_sheet_id, new_sheet_URL = get_google_file(batch_sheet_folder_id, batch_sheet_name, client=client)
     if new_sheet_URL:
         return "exists", new_sheet_id, new_sheet_URL, None
 
@@ -249,28 +823,28 @@ def copy_story_data_sheet_to_new_sheet(template_sheet_id, batch_sheet_name, batc
         if batch_sheet_folder_id:
             copy_body_params["parents"] = [batch_sheet_folder_id]
 
-        copied_sheet = DRIVE_SERVICE.files().copy(
+        copied_sheet = client.drive.files().copy(
             fileId=template_sheet_id,
             body=copy_body_params
         ).execute()
 
-        new_sheet_id, new_sheet_URL = get_google_file(batch_sheet_folder_id, batch_sheet_name)        
+        new_sheet_id, new_sheet_URL = get_google_file(batch_sheet_folder_id, batch_sheet_name, client=client)        
         return "created", new_sheet_id, new_sheet_URL, None
     except Exception as e:
         return "error", None, None, e
     
 
-def share_sheet_with_anyone(sheet_id) -> tuple:
+def share_sheet_with_anyone(sheet_id, client=None) -> tuple:
     """Share sheet to anyone with the link.
     
     Returns a tuple of (result, error_message).
         result can be "shared", "already_shared", or "error".
         error_message is the error message if an error occurred, otherwise None.
     """
-    ensure_google_setup()
+    client = get_google_client(client)
 
     try:
-        if is_sheet_already_shared(sheet_id) :
+        if is_sheet_already_shared(sheet_id, client=client):
             return "already_shared", None
         
        # Share with anyone who has the link
@@ -279,7 +853,7 @@ def share_sheet_with_anyone(sheet_id) -> tuple:
             'role': 'writer'
         }
         
-        DRIVE_SERVICE.permissions().create(
+        client.drive.permissions().create(
             fileId=sheet_id,
             body=permission
         ).execute()
@@ -289,16 +863,17 @@ def share_sheet_with_anyone(sheet_id) -> tuple:
     except Exception as e:
         return "error", e
     
-def is_sheet_already_shared(sheet_id):
+def is_sheet_already_shared(sheet_id, client=None):
     """Is a sheet already shared with anyone with a link?"""
+    client = get_google_client(client)
 
-    permissions = DRIVE_SERVICE.permissions().list(fileId=sheet_id).execute()
+    permissions = client.drive.permissions().list(fileId=sheet_id).execute()
     for permission in permissions.get('permissions', []):
         if permission.get('type') == 'anyone':
             return True
     return False
 
-def edit_sheet_with_project_info(sheet_id, project_name, authors) -> tuple:
+def edit_sheet_with_project_info(sheet_id, project_name, authors, client=None) -> tuple:
     """Edit the Google Sheet with the project name and authors.
     Returns a tuple of (result, error_message).
         result can be "updated" or "error"
@@ -306,10 +881,10 @@ def edit_sheet_with_project_info(sheet_id, project_name, authors) -> tuple:
     """
 
     try:
-        ensure_google_setup()
+        client = get_google_client(client)
 
         # Update the Scrolly Story Title cell
-        SHEETS_SERVICE.spreadsheets().values().update(
+        client.sheets.spreadsheets().values().update(
             spreadsheetId=sheet_id,
             range="Story!B2",  # The Title of the Scrolly Story
             valueInputOption="RAW", 
@@ -319,7 +894,7 @@ def edit_sheet_with_project_info(sheet_id, project_name, authors) -> tuple:
         ).execute()
         
         # Update the Scrolly Story Authors cell
-        SHEETS_SERVICE.spreadsheets().values().update(
+        client.sheets.spreadsheets().values().update(
             spreadsheetId=sheet_id,
             range="Story!D2",  # The Authors field
             valueInputOption="RAW",
@@ -334,4 +909,32 @@ def edit_sheet_with_project_info(sheet_id, project_name, authors) -> tuple:
         
     except Exception as e:
         return "error", e
-    
\ No newline at end of file
+    
+
+def get_drive_changes_start_page_token(client=None) -> str:
+    """Return the Drive changes page token for "now", to list only the changes made from here on."""
+    client = get_google_client(client)
+    return client.drive.changes().getStartPageToken().execute()['startPageToken']
+
+def list_drive_changes(page_token, client=None) -> tuple:
+    """List the files changed in Drive since the page token was issued.
+
+    Returns a tuple of (changed_files, new_page_token).
+        changed_files is a dictionary of the changed files' IDs -> their 'modifiedTime'
+        (None for removed files), which tells a change apart from one made earlier.
+        new_page_token is the token to pass next time, to list only the changes made after this call.
+    """
+    client = get_google_client(client)
+    changed_files = {}
+    while True:
+        response = client.drive.changes().list(
+            pageToken=page_token,
+            pageSize=1000,
+            fields="nextPageToken,newStartPageToken,changes(fileId,file(modifiedTime))"
+        ).execute()
+        changed_files.update((change['fileId'], (change.get('file') or {}).get('modifiedTime'))
+                             for change in response.get('changes', []) if change.get('fileId'))
+        if 'newStartPageToken' in response:
+            return changed_files, response['newStartPageToken']
+        page_token = response['nextPageToken']
+
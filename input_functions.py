@@ -0,0 +1,84 @@
+import csv
+import os
+
+try:
+    import openpyxl  # Optional; only needed to read .xlsx input files
+except ImportError:
+    openpyxl = None
+
+from google_functions import convert_tab_values_to_repo_data
+
+INPUT_FILE_EXTENSIONS = (".csv", ".xlsx")
+
+
+def trim_row(row) -> list:
+    """Drop a row's trailing empty cells, as the Sheets API does, so file rows match sheet rows."""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+def convert_cell_to_text(value) -> str:
+    """Convert an XLSX cell value to the text the Sheets API would return for it."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # e.g. a student number typed as 1234 is read back as 1234.0
+    return str(value).strip() if isinstance(value, str) else str(value)
+
+def read_csv_rows(csv_file):
+    """Yield the rows of an open CSV file one at a time, as lists of strings."""
+    for row in csv.reader(csv_file):
+        yield trim_row(row)
+
+def read_xlsx_rows(worksheet):
+    """Yield the rows of an XLSX worksheet one at a time, as lists of strings."""
+    for row in worksheet.iter_rows(values_only=True):
+        yield trim_row([convert_cell_to_text(value) for value in row])
+
+def fetch_repo_data_from_file(input_file, tabs=None) -> list:
+    """Read repository names and authors from a local CSV or XLSX file, laid out like the input Google Sheet.
+
+    Rows are streamed from the file one at a time, so even very large rosters are read with
+    little memory, and no Google authentication is needed.
+    tabs only applies to XLSX files, and works as in fetch_repo_data_from_google_sheet:
+    None (the first tab only), "all" (every tab), or a list of tab names.
+
+    Returns a list of dictionaries with 'title', 'repo-name', 'authors' and 'tab' keys.
+    """
+    extension = os.path.splitext(input_file)[1].lower()
+    if extension not in INPUT_FILE_EXTENSIONS:
+        print(f"Error: input_file must be a {' or '.join(INPUT_FILE_EXTENSIONS)} file, not '{input_file}'.")
+        exit(1)
+
+    try:
+        if extension == ".csv":
+            # utf-8-sig skips the byte order mark Excel writes at the start of CSV files
+            with open(input_file, "r", newline="", encoding="utf-8-sig") as csv_file:
+                return convert_tab_values_to_repo_data([(os.path.basename(input_file), read_csv_rows(csv_file))])
+
+        if openpyxl is None:
+            print("Error: Reading .xlsx input files needs the openpyxl package. Install it with 'pip install openpyxl',")
+            print("or save the roster as a .csv file instead.")
+            exit(1)
+
+        # read_only streams the rows from the file instead of loading the whole workbook
+        workbook = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+        try:
+            if tabs is None:
+                tab_names = workbook.sheetnames[:1]
+            elif tabs == "all":
+                tab_names = workbook.sheetnames
+            else:
+                tab_names = list(tabs)
+                missing_tab_names = [tab_name for tab_name in tab_names if tab_name not in workbook.sheetnames]
+                if missing_tab_names:
+                    print(f"Error: Tabs {missing_tab_names} not found in {input_file}. It has the tabs {workbook.sheetnames}.")
+                    exit(1)
+            return convert_tab_values_to_repo_data(
+                [(tab_name, read_xlsx_rows(workbook[tab_name])) for tab_name in tab_names])
+        finally:
+            workbook.close()
+    except Exception as e:  # Missing file, or not a valid CSV/XLSX file
+        print(f"Error reading input file: {e}")
+        exit(1)
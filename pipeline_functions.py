@@ -0,0 +1,108 @@
+from typing import NamedTuple
+
+from step_functions import run_step_graph
+
+# Results with these statuses stop the project: stages that depend on them are skipped for it
+FAILED_STATUSES = ("error", "skipped")
+
+
+class StageResult(NamedTuple):
+    """What one stage did for one project."""
+    status: str            # e.g. "created", "exists", "updated", "no changes", "error" or "skipped"
+    value: object = None   # what later stages need, e.g. the new repository
+    error: object = None   # the error, if status is "error"; set by some stages to report a problem that isn't fatal
+
+    @property
+    def ok(self) -> bool:
+        return self.status not in FAILED_STATUSES
+
+
+class Stage:
+    """One step of the batch, run for every project at once.
+
+    Subclasses set a name, the stages they depend on, and implement run_item to handle a
+    single project. A stage that can handle many projects with fewer API calls (one listing
+    instead of one lookup per project, batched HTTP requests, ...) also implements run_bulk,
+    which run_batch uses for batches of at least bulk_min_projects.
+
+    dependencies are the stages whose values are passed to run_item/run_bulk, and a project is
+    skipped if any of them failed for it. waits_for are stages that must only finish first.
+    messages maps each status to the message printed for it.
+    """
+    name = None
+    dependencies = ()
+    waits_for = ()
+    bulk_min_projects = 2
+    messages = {}
+
+    def run_item(self, project, *inputs) -> StageResult:
+        """Handle one project, given the values of its dependencies' results."""
+        raise NotImplementedError
+
+    def run_bulk(self, projects, inputs) -> list:
+        """Handle all projects at once; inputs has a tuple of dependency values for each project.
+
+        Returns a list of StageResults in the same order as the projects.
+        """
+        raise NotImplementedError
+
+    def map_items(self, function, items) -> list:
+        """Call function on every item, in order. Stages can override this to run items concurrently."""
+        return [function(item) for item in items]
+
+    def run_batch(self, projects, inputs) -> list:
+        """Run the stage for a batch of projects, with the bulk backend if the stage has one and the batch is big enough.
+
+        If the bulk backend raises, the batch is run again with the per-item backend, as the
+        error (e.g. a failed listing or batch request) may not affect single requests.
+        Exceptions are turned into "error" results, so one project can't stop the others.
+        Returns a list of StageResults in the same order as the projects.
+        """
+        if len(projects) >= self.bulk_min_projects and type(self).run_bulk is not Stage.run_bulk:
+            try:
+                return self.run_bulk(projects, inputs)
+            except Exception:
+                pass
+
+        def run_one(item):
+            project, project_inputs = item
+            try:
+                return self.run_item(project, *project_inputs)
+            except Exception as e:
+                return StageResult("error", error=e)
+        return self.map_items(run_one, list(zip(projects, inputs)))
+
+    def describe(self, value) -> str:
+        """Return the detail printed after a successful result's message, e.g. a URL."""
+        return ""
+
+
+def run_pipeline(stages, projects, report=None) -> dict:
+    """Run the stages for all projects, each stage as soon as the stages it depends on are done.
+
+    Independent stages run at the same time. Each stage runs once, for every project whose
+    dependencies succeeded; the other projects get a "skipped" result.
+    report(stage, project, result) is called for every result that isn't "skipped".
+
+    Returns a dictionary of stage name -> list of StageResults in the same order as the projects.
+    """
+    def make_step(stage):
+        def step(*dependency_results):
+            # Only the first len(stage.dependencies) results are passed on; the rest are from waits_for
+            dependency_results = dependency_results[:len(stage.dependencies)]
+            ready = [index for index in range(len(projects))
+                     if all(results[index].ok for results in dependency_results)]
+
+            stage_results = [StageResult("skipped")] * len(projects)
+            batch_results = stage.run_batch(
+                [projects[index] for index in ready],
+                [tuple(results[index].value for results in dependency_results) for index in ready]) if ready else []
+            for index, result in zip(ready, batch_results):
+                stage_results[index] = result
+                if report:
+                    report(stage, projects[index], result)
+            return stage_results
+        return step
+
+    steps = {stage.name: (list(stage.dependencies) + list(stage.waits_for), make_step(stage)) for stage in stages}
+    return run_step_graph(steps, max_workers=max(1, len(stages)))
@@ -0,0 +1,171 @@
+import json
+import sqlite3
+import time
+
+# Leases that are not renewed by a heartbeat within this many seconds are handed to another worker
+DEFAULT_LEASE_SECONDS = 300
+
+# A project whose lease has expired this many times is marked as failed instead of re-queued,
+# so a project that crashes every worker it touches cannot stall the batch forever
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class ProjectQueue:
+    """A lease-based work queue of projects, stored in a single SQLite file.
+
+    The file can live on shared storage so that workers on several machines can pull
+    projects from the same queue without running any extra services. Every operation
+    opens its own short-lived connection, so a queue object can be shared between a
+    worker and its heartbeat thread.
+
+    Each project moves through the statuses "pending" -> "leased" -> "done" or "failed".
+    A leased project whose lease has expired is treated as pending again.
+    """
+
+    def __init__(self, queue_path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS projects (
+                    repo_name TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT
+                )""")
+
+    def _connect(self):
+        # isolation_level=None lets each method control its own transaction.
+        # The rollback journal (not WAL) is kept on purpose: WAL does not work on network file systems.
+        return _Connection(sqlite3.connect(self.queue_path, timeout=60, isolation_level=None))
+
+    def enqueue_projects(self, all_repo_data) -> int:
+        """Add projects to the queue, keyed by their repo name.
+
+        Projects that are already in the queue (from an earlier run) are re-queued if they failed,
+        or if their project data was edited since, so that a re-run retries them with the new data.
+        Pending projects get the new data too. Done projects with unchanged data, and projects that
+        a worker is processing right now, are left untouched.
+        Returns the number of projects that were added, re-queued or updated.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            changes_before = conn.total_changes
+            conn.executemany(
+                """INSERT INTO projects (repo_name, project) VALUES (?, ?)
+                   ON CONFLICT (repo_name) DO UPDATE SET
+                       project = excluded.project, status = 'pending', worker = NULL, lease_expires = NULL,
+                       attempts = 0, result = NULL, error = NULL
+                   WHERE status = 'failed' OR (status IN ('pending', 'done') AND project != excluded.project)""",
+                [(repo_data['repo-name'], json.dumps(repo_data)) for repo_data in all_repo_data])
+            changed = conn.total_changes - changes_before
+            conn.execute("COMMIT")
+        return changed
+
+    def lease_project(self, worker_id) -> dict:
+        """Lease the next pending project (or one whose lease has expired) to the worker.
+
+        Returns the project dictionary, or None if no project is currently available.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers can't lease the same row
+            conn.execute("BEGIN IMMEDIATE")
+            self._fail_exhausted_leases(conn, now)
+            row = conn.execute(
+                """SELECT repo_name, project FROM projects
+                   WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                   ORDER BY rowid LIMIT 1""", (now,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                """UPDATE projects SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1
+                   WHERE repo_name = ?""", (worker_id, now + self.lease_seconds, row[0]))
+            conn.execute("COMMIT")
+        return json.loads(row[1])
+
+    def heartbeat(self, repo_name, worker_id) -> bool:
+        """Extend the worker's lease on a project.
+
+        Returns False if the worker no longer holds the lease (it expired and was re-leased).
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """UPDATE projects SET lease_expires = ?
+                   WHERE repo_name = ? AND worker = ? AND status = 'leased'""",
+                (time.time() + self.lease_seconds, repo_name, worker_id))
+        return cursor.rowcount == 1
+
+    def complete_project(self, repo_name, worker_id, result) -> bool:
+        """Mark a leased project as done and store its (JSON serializable) result.
+
+        Returns False if the worker no longer holds the lease, in which case the result is discarded.
+        """
+        return self._finish(repo_name, worker_id, "done", json.dumps(result), None)
+
+    def fail_project(self, repo_name, worker_id, error) -> bool:
+        """Mark a leased project as failed with the given error message.
+
+        Returns False if the worker no longer holds the lease.
+        """
+        return self._finish(repo_name, worker_id, "failed", None, str(error))
+
+    def _finish(self, repo_name, worker_id, status, result, error) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """UPDATE projects SET status = ?, result = ?, error = ?, lease_expires = NULL
+                   WHERE repo_name = ? AND worker = ? AND status = 'leased'""",
+                (status, result, error, repo_name, worker_id))
+        return cursor.rowcount == 1
+
+    def _fail_exhausted_leases(self, conn, now):
+        conn.execute(
+            """UPDATE projects SET status = 'failed', error = 'lease expired too many times', lease_expires = NULL
+               WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""", (now, self.max_attempts))
+
+    def count_remaining(self) -> int:
+        """Return the number of projects that are not yet done or failed."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._fail_exhausted_leases(conn, time.time())
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM projects WHERE status IN ('pending', 'leased')").fetchone()[0]
+            conn.execute("COMMIT")
+        return remaining
+
+    def get_results(self) -> tuple:
+        """Return the results of all finished projects, in the order they were enqueued.
+
+        Returns a tuple of (results, failures).
+            results is a list of the result objects stored by complete_project.
+            failures is a list of (project, error_message) tuples.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT project, status, result, error FROM projects WHERE status IN ('done', 'failed') ORDER BY rowid"
+            ).fetchall()
+        results = [json.loads(result) for _, status, result, _ in rows if status == "done"]
+        failures = [(json.loads(project), error) for project, status, _, error in rows if status == "failed"]
+        return results, failures
+
+
+class _Connection:
+    """Context manager that closes the SQLite connection (sqlite3's own only ends the transaction)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self.conn.close()
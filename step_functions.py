@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Enough for the independent branches of one project (GitHub repo vs. Google sheet work)
+DEFAULT_STEP_WORKERS = 3
+
+
+def validate_step_graph(steps) -> None:
+    """Check that every dependency names a step and that the steps have no cycles.
+
+    Raises ValueError describing the first problem found.
+    """
+    for name, (dependencies, _) in steps.items():
+        for dependency in dependencies:
+            if dependency not in steps:
+                raise ValueError(f"Step '{name}' depends on unknown step '{dependency}'")
+
+    # Depth-first search, remembering the steps on the current path to spot cycles
+    visited = set()
+    def visit(name, path):
+        if name in path:
+            raise ValueError(f"Steps have a dependency cycle: {' -> '.join(path + [name])}")
+        if name in visited:
+            return
+        for dependency in steps[name][0]:
+            visit(dependency, path + [name])
+        visited.add(name)
+
+    for name in steps:
+        visit(name, [])
+
+def run_step_graph(steps, max_workers=DEFAULT_STEP_WORKERS) -> dict:
+    """Run a graph of steps, starting each one as soon as the steps it depends on have finished.
+
+    steps is a dictionary of step name -> (list of dependency names, function).
+    Each function is called with the results of its dependencies, in the order they are listed,
+    so steps without dependencies between them run at the same time.
+    A step that returns None has failed: every step that depends on it is skipped and also
+    gets None as its result. Exceptions raised by a step are passed on to the caller.
+
+    Returns a dictionary of step name -> result.
+    """
+    validate_step_graph(steps)
+
+    results = {}
+    pending = dict(steps)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Start (or skip) every step whose dependencies are done; skipping can unblock more steps
+            started_or_skipped = True
+            while started_or_skipped:
+                started_or_skipped = False
+                for name, (dependencies, function) in list(pending.items()):
+                    if not all(dependency in results for dependency in dependencies):
+                        continue
+                    del pending[name]
+                    started_or_skipped = True
+                    dependency_results = [results[dependency] for dependency in dependencies]
+                    if any(result is None for result in dependency_results):
+                        results[name] = None
+                    else:
+                        running[pool.submit(function, *dependency_results)] = name
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
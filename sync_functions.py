@@ -0,0 +1,113 @@
+from google_functions import sanitize_sheet_name
+from google_functions import get_sheet_id_from_url
+
+
+def locate_project_resources(all_repo_data, live_repos, live_sheet_names, batch_repo_name_prefix, batch_sheet_name_prefix) -> tuple:
+    """Find the existing GitHub repository and Google Data Sheet of every project.
+
+    Projects whose URLs were written back to the input sheet by an earlier run are found by
+    those URLs, so they are still found after their title (and so their derived names) changed.
+    Other projects are found by the repo and sheet names the script would create them under.
+
+    Each repo and sheet can only belong to one project, or syncing would overwrite one project's
+    description, sheet name and story info with another's. Projects found by URL claim theirs
+    first, then the others in input order; a project that resolves to a repo or sheet already
+    claimed by another project is reported as missing instead.
+
+    live_repos is a dictionary of repo name -> repository JSON, from list_owner_repos.
+    GitHub repo names are case-insensitive, so they are matched regardless of case.
+    live_sheet_names is a dictionary of sheet ID -> sheet name, from list_google_sheets.
+
+    Returns a tuple of (located, missing).
+        located is a list of (project, repo, sheet_id) tuples, in input order.
+        missing is a list of (project, reason) tuples for projects without a repo or sheet to sync.
+    """
+    sheet_ids_by_name = {name: sheet_id for sheet_id, name in live_sheet_names.items()}
+    live_repos_by_name = {name.lower(): repo for name, repo in live_repos.items()}
+
+    resolved = []
+    for repo_data in all_repo_data:
+        if repo_data.get('github_url'):
+            repo_name = repo_data['github_url'].rstrip('/').rsplit('/', 1)[-1]
+        else:
+            repo_name = f"{batch_repo_name_prefix}-{repo_data['repo-name']}"
+        repo = live_repos_by_name.get(repo_name.lower())
+
+        if repo_data.get('google_sheet_url'):
+            sheet_id = get_sheet_id_from_url(repo_data['google_sheet_url'])
+            if sheet_id not in live_sheet_names:
+                sheet_id = None
+        else:
+            sheet_id = sheet_ids_by_name.get(sanitize_sheet_name(f"{batch_sheet_name_prefix}{repo_data['title']}"))
+        resolved.append((repo_data, repo_name, repo, sheet_id))
+
+    claimed_repos = {}   # lower-cased repo name -> project that claimed it
+    claimed_sheets = {}  # sheet ID -> project that claimed it
+    reasons = {}         # index in resolved -> why the project is missing
+    by_url = [bool(repo_data.get('github_url') or repo_data.get('google_sheet_url')) for repo_data, _, _, _ in resolved]
+    claim_order = [index for index in range(len(resolved)) if by_url[index]] + \
+                  [index for index in range(len(resolved)) if not by_url[index]]
+    for index in claim_order:
+        repo_data, repo_name, repo, sheet_id = resolved[index]
+        if repo is None:
+            reasons[index] = f"GitHub repository '{repo_name}' not found"
+        elif sheet_id is None:
+            reasons[index] = "Google Data Sheet not found"
+        elif repo_name.lower() in claimed_repos:
+            reasons[index] = (f"GitHub repository '{repo_name}' belongs to project "
+                              f"\"{claimed_repos[repo_name.lower()]['title']}\"")
+        elif sheet_id in claimed_sheets:
+            reasons[index] = (f"Google Data Sheet '{live_sheet_names[sheet_id]}' belongs to project "
+                              f"\"{claimed_sheets[sheet_id]['title']}\"")
+        else:
+            claimed_repos[repo_name.lower()] = repo_data
+            claimed_sheets[sheet_id] = repo_data
+
+    located = []
+    missing = []
+    for index, (repo_data, _, repo, sheet_id) in enumerate(resolved):
+        if index in reasons:
+            missing.append((repo_data, reasons[index]))
+        else:
+            located.append((repo_data, repo, sheet_id))
+    return located, missing
+
+def build_sync_plan(located, live_sheet_names, story_info, batch_repo_description_prefix, batch_sheet_name_prefix) -> dict:
+    """Compare every located project with its live repo and sheet, and collect the changes to make.
+
+    story_info is a dictionary of sheet ID -> (title, authors) as currently in the sheet's Story tab,
+    or (None, None) for sheets whose Story tab could not be read. Their story info is left alone,
+    since there is no telling whether it changed, and the projects are reported instead.
+
+    Returns a dictionary of:
+        'repo_descriptions': repository node ID -> new description
+        'sheet_names': sheet ID -> new sheet name
+        'story_info': sheet ID -> new (title, authors)
+        'changed_projects': list of (project, list of what changed) tuples, in input order
+        'unreadable_story_info': list of projects whose Story tab could not be read, in input order
+    """
+    plan = {"repo_descriptions": {}, "sheet_names": {}, "story_info": {}, "changed_projects": [],
+            "unreadable_story_info": []}
+    for repo_data, repo, sheet_id in located:
+        changes = []
+
+        description = f"{batch_repo_description_prefix} {repo_data['title']}"
+        if (repo.get('description') or "") != description:
+            plan["repo_descriptions"][repo['node_id']] = description
+            changes.append("repo description")
+
+        sheet_name = sanitize_sheet_name(f"{batch_sheet_name_prefix}{repo_data['title']}")
+        if live_sheet_names[sheet_id] != sheet_name:
+            plan["sheet_names"][sheet_id] = sheet_name
+            changes.append("sheet name")
+
+        current_story_info = story_info.get(sheet_id, (None, None))
+        if current_story_info == (None, None):
+            plan["unreadable_story_info"].append(repo_data)
+        elif current_story_info != (repo_data['title'], repo_data['authors']):
+            plan["story_info"][sheet_id] = (repo_data['title'], repo_data['authors'])
+            changes.append("story title and authors")
+
+        if changes:
+            plan["changed_projects"].append((repo_data, changes))
+    return plan
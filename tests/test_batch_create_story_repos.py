@@ -0,0 +1,138 @@
+import sys
+import os
+from contextlib import contextmanager
+
+sys.path.append('..')  # Add parent directory to path
+
+# The script reads config.yaml from the working directory when it is imported
+working_directory = os.getcwd()
+os.chdir('..')
+try:
+    import batch_create_story_repos
+finally:
+    os.chdir(working_directory)
+from batch_create_story_repos import CreateDataSheetStage
+from batch_create_story_repos import ShareDataSheetStage
+from batch_create_story_repos import EditDataSheetStage
+from batch_create_story_repos import CreateRepoStage
+from batch_create_story_repos import get_batch_sheet_name
+from pipeline_functions import StageResult
+from github_functions import RateLimitedExecutor
+
+
+ALPHA = {"title": "Project Alpha", "repo-name": "project-alpha", "authors": "John Smith"}
+BETA = {"title": "Project Beta", "repo-name": "project-beta", "authors": "Alice Johnson"}
+GAMMA = {"title": "Project Gamma", "repo-name": "project-gamma", "authors": ""}
+
+@contextmanager
+def fake_helpers(**fakes):
+    """Replace the API helpers the script imported with fakes, for the duration of the block."""
+    originals = {name: getattr(batch_create_story_repos, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(batch_create_story_repos, name, fake)
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(batch_create_story_repos, name, original)
+
+def test_create_data_sheet_stage_bulk():
+    """Test the bulk backend that lists the existing sheets and copies the missing ones in batches"""
+    live_sheets = {"sheet-alpha": {"id": "sheet-alpha", "name": get_batch_sheet_name(ALPHA), "webViewLink": "url-alpha"}}
+    single_copies = []
+    def fake_copy_story_data_sheet_to_new_sheet(template_sheet_id, batch_sheet_name, batch_sheet_folder_id=None):
+        single_copies.append(batch_sheet_name)
+        if batch_sheet_name == get_batch_sheet_name(GAMMA):
+            return "error", None, None, "Drive is down"
+        return "created", "sheet-single", "url-single", None
+    def fake_copy_google_sheets(template_sheet_id, sheet_names, folder_id=None):
+        return {get_batch_sheet_name(BETA): ("sheet-beta", "url-beta", None),
+                get_batch_sheet_name(GAMMA): (None, None, "rate limit exceeded")}
+
+    # Test 1: Existing sheets are reused, missing ones copied, and a copy that failed in the batch retried on its own
+    with fake_helpers(list_google_sheets=lambda folder_id, name_prefix: (live_sheets, None),
+                      copy_google_sheets=fake_copy_google_sheets,
+                      copy_story_data_sheet_to_new_sheet=fake_copy_story_data_sheet_to_new_sheet):
+        results = CreateDataSheetStage().run_bulk([ALPHA, BETA, GAMMA], [(), (), ()])
+    assert results == [StageResult("exists", ("sheet-alpha", "url-alpha")),
+                       StageResult("created", ("sheet-beta", "url-beta")),
+                       StageResult("error", error="Drive is down")], f"Unexpected results {results}"
+    assert single_copies == [get_batch_sheet_name(GAMMA)], f"Unexpected single copies {single_copies}"
+    print("✓ Test 1 passed: Sheets reused, copied in bulk, and failed copy retried")
+
+    # Test 2: A batch that fails as a whole falls back to copying the missing sheets one by one
+    def failing_copy_google_sheets(template_sheet_id, sheet_names, folder_id=None):
+        raise ConnectionError("batch request failed")
+    single_copies.clear()
+    with fake_helpers(list_google_sheets=lambda folder_id, name_prefix: (live_sheets, None),
+                      copy_google_sheets=failing_copy_google_sheets,
+                      copy_story_data_sheet_to_new_sheet=fake_copy_story_data_sheet_to_new_sheet):
+        results = CreateDataSheetStage().run_bulk([ALPHA, BETA], [(), ()])
+    assert results == [StageResult("exists", ("sheet-alpha", "url-alpha")),
+                       StageResult("created", ("sheet-single", "url-single"))], f"Unexpected results {results}"
+    assert single_copies == [get_batch_sheet_name(BETA)], f"Unexpected single copies {single_copies}"
+    print("✓ Test 2 passed: Failed batch falls back to single copies")
+
+def test_share_and_edit_data_sheet_stages_bulk():
+    """Test that sheets that fail in a batch are shared and edited again on their own"""
+    projects = [ALPHA, BETA]
+    inputs = [(("sheet-alpha", "url-alpha"),), (("sheet-beta", "url-beta"),)]
+
+    # Test 1: Sharing reports the batch results and retries the failed sheet
+    with fake_helpers(share_sheets_with_anyone=lambda sheet_ids: [("sheet-alpha", "already_shared", None),
+                                                                  ("sheet-beta", "error", "rate limit exceeded")],
+                      share_sheet_with_anyone=lambda sheet_id: ("shared", None)):
+        results = ShareDataSheetStage().run_bulk(projects, inputs)
+    assert results == [StageResult("already_shared", "already_shared"), StageResult("shared", "shared")], results
+    print("✓ Test 1 passed: Failed share retried on its own")
+
+    # Test 2: Editing writes each sheet's own title and authors, and a sheet that fails on its own too stays an error
+    story_info_written = {}
+    def fake_update_story_info_for_sheets(story_info):
+        story_info_written.update(story_info)
+        return [("sheet-alpha", "updated", None), ("sheet-beta", "error", "rate limit exceeded")]
+    with fake_helpers(update_story_info_for_sheets=fake_update_story_info_for_sheets,
+                      edit_sheet_with_project_info=lambda sheet_id, title, authors: ("error", "no Story tab")):
+        results = EditDataSheetStage().run_bulk(projects, inputs)
+    assert story_info_written == {"sheet-alpha": ("Project Alpha", "John Smith"),
+                                  "sheet-beta": ("Project Beta", "Alice Johnson")}, story_info_written
+    assert results == [StageResult("updated", "updated"), StageResult("error", "error", "no Story tab")], results
+    print("✓ Test 2 passed: Story info written in bulk and failed edit retried")
+
+def test_create_repo_stage_bulk():
+    """Test the bulk backend that lists the owner's repos and only creates the missing ones"""
+    owner = batch_create_story_repos.BATCH_REPO_OWNER
+    alpha_name = batch_create_story_repos.get_batch_repo_name(ALPHA)
+    # GitHub keeps the case the repo was created with, and matches names regardless of case
+    live_repos = {alpha_name.upper(): {"owner": {"login": owner}, "name": alpha_name.upper(),
+                                       "html_url": "url-alpha", "default_branch": "main", "size": 12}}
+    created = []
+    def fake_create_repo_from_template(template_path, batch_repo_owner, batch_repo_name, batch_repo_description,
+                                       check_exists=True):
+        created.append((batch_repo_name, check_exists))
+        if batch_repo_name.endswith("gamma"):
+            return "error", None, "name already exists on this account"
+        return "created", f"repo-{batch_repo_name}", None
+
+    with fake_helpers(list_owner_repos=lambda owner: (live_repos, None),
+                      create_repo_from_template=fake_create_repo_from_template,
+                      get_github_executor=lambda: RateLimitedExecutor(min_interval=0)):
+        results = CreateRepoStage().run_bulk([ALPHA, BETA, GAMMA], [(), (), ()])
+
+    # Test 1: The listed repo is reused without a request, and the others are created without looking them up first
+    assert results[0].status == "exists" and results[0].value.html_url == "url-alpha", results[0]
+    beta_name = batch_create_story_repos.get_batch_repo_name(BETA)
+    gamma_name = batch_create_story_repos.get_batch_repo_name(GAMMA)
+    assert results[1] == StageResult("created", f"repo-{beta_name}"), results[1]
+    assert sorted(created) == [(beta_name, False), (gamma_name, False)], f"Unexpected creations {created}"
+    print("✓ Test 1 passed: Existing repo reused and missing repos created")
+
+    # Test 2: A repo that fails to be created is that project's error only
+    assert results[2] == StageResult("error", error="name already exists on this account"), results[2]
+    print("✓ Test 2 passed: Failed creation reported for its project")
+
+
+# Run all the tests
+test_create_data_sheet_stage_bulk()
+test_share_and_edit_data_sheet_stages_bulk()
+test_create_repo_stage_bulk()
@@ -0,0 +1,37 @@
+import sys
+
+sys.path.append('..')  # Add parent directory to path
+sys.path.append('../benchmarks')
+
+from benchmark_hot_functions import compare_with_baseline
+
+
+def make_result(relative, noise, peak_bytes=1000):
+    return {"throughput": relative * 1000, "relative": relative, "noise": noise, "peak_bytes": peak_bytes}
+
+def test_compare_with_baseline():
+    """Test which throughput and memory changes count as regressions"""
+    baseline = {"case": make_result(1.0, 0.05)}
+
+    # Test 1: A drop within the threshold passes, a larger one fails
+    assert compare_with_baseline({"case": make_result(0.8, 0.05)}, baseline, 0.25) == []
+    assert len(compare_with_baseline({"case": make_result(0.7, 0.05)}, baseline, 0.25)) == 1
+    print("✓ Test 1 passed: Throughput drop beyond the threshold fails")
+
+    # Test 2: A 2x slowdown fails even when the baseline and this run were both very noisy
+    noisy_baseline = {"case": make_result(1.0, 0.9)}
+    regressions = compare_with_baseline({"case": make_result(0.5, 0.9)}, noisy_baseline, 0.25)
+    assert len(regressions) == 1, f"2x slowdown passed the gate: {regressions}"
+    assert compare_with_baseline({"case": make_result(0.7, 0.9)}, noisy_baseline, 0.25) == []
+    print("✓ Test 2 passed: Noise widens the allowance only a little")
+
+    # Test 3: Memory growth beyond the threshold fails, and legacy cases are never gated
+    regressions = compare_with_baseline({"case": make_result(1.0, 0.05, peak_bytes=1300)}, baseline, 0.25)
+    assert len(regressions) == 1 and "peak memory" in regressions[0], f"Unexpected {regressions}"
+    legacy_baseline = {"legacy case": make_result(1.0, 0.05)}
+    assert compare_with_baseline({"legacy case": make_result(0.1, 0.05)}, legacy_baseline, 0.25) == []
+    print("✓ Test 3 passed: Memory growth fails and legacy cases are skipped")
+
+
+# Run all the tests
+test_compare_with_baseline()
@@ -0,0 +1,73 @@
+import sys
+import os
+import tempfile
+
+sys.path.append('..')  # Add parent directory to path
+
+from git_functions import ensure_template_cache
+from git_functions import create_commit_with_data_sheet_link
+from git_functions import push_commit_to_repo
+from git_functions import run_git
+from git_functions import COMMIT_IDENTITY
+
+
+def make_template_repo(root):
+    """Create a local template repository with a config file, like the story templates have."""
+    template_dir = os.path.join(root, "template")
+    os.makedirs(template_dir)
+    run_git(["init", "-q", "-b", "main"], cwd=template_dir)
+    with open(os.path.join(template_dir, "google-sheet-config.js"), "w", newline="") as f:
+        f.write('// Config\r\nconst googleSheetURL = "https://docs.google.com/spreadsheets/d/OLD_ID";\r\n')
+    with open(os.path.join(template_dir, "index.html"), "w") as f:
+        f.write("<html></html>\n")
+    run_git(["add", "."], cwd=template_dir)
+    run_git(["commit", "-q", "-m", "Template"], cwd=template_dir, env=COMMIT_IDENTITY)
+    return template_dir
+
+def test_push_template_to_bare_repos():
+    """Test provisioning several repos from one local template cache, end to end"""
+    root = tempfile.mkdtemp()
+    template_dir = make_template_repo(root)
+    cache_dir = os.path.join(root, "cache", "template.git")
+
+    # Test 1: The template is cloned once, then only updated
+    result, e = ensure_template_cache(template_dir, cache_dir)
+    assert result == "cloned", f"Expected cloned, but got {result}: {e}"
+    result, e = ensure_template_cache(template_dir, cache_dir)
+    assert result == "updated", f"Expected updated, but got {result}: {e}"
+    print("✓ Test 1 passed: Template cached")
+
+    # Test 2: Each project gets the template with its own data sheet URL, in one push
+    for project in ("alpha", "beta"):
+        target_dir = os.path.join(root, f"{project}.git")
+        run_git(["init", "-q", "--bare", target_dir])
+        url = f"https://docs.google.com/spreadsheets/d/{project}/edit"
+
+        result, commit_sha, e = create_commit_with_data_sheet_link(cache_dir, url, "google-sheet-config.js", "googleSheetURL")
+        assert result == "updated", f"Expected updated, but got {result}: {e}"
+        result, e = push_commit_to_repo(cache_dir, commit_sha, target_dir)
+        assert result == "pushed", f"Expected pushed, but got {result}: {e}"
+
+        config = run_git(["show", "main:google-sheet-config.js"], cwd=target_dir, raw=True).decode("utf-8")
+        expected = f'// Config\r\nconst googleSheetURL = "{url}";\r\n'
+        assert config == expected, f"Expected {expected!r}, but got {config!r}"
+        assert run_git(["show", "main:index.html"], cwd=target_dir) == "<html></html>"
+        # Like "Use this template", each repo starts with a single commit, not the template's history
+        assert run_git(["rev-list", "--parents", "main"], cwd=target_dir) == commit_sha
+    print("✓ Test 2 passed: Projects pushed with their own data sheet URL, in one commit")
+
+    # Test 3: Missing file is reported as an error
+    result, commit_sha, e = create_commit_with_data_sheet_link(cache_dir, "url", "missing.js", "googleSheetURL")
+    assert result == "error" and commit_sha is None, f"Expected error, but got {result}"
+    print("✓ Test 3 passed: Missing file reported")
+
+def test_extra_header_kept_out_of_arguments():
+    """Test that the auth header reaches git through its environment, not its command line"""
+    header = "Authorization: Basic c2VjcmV0"
+    assert run_git(["config", "--get", "http.extraHeader"], extra_header=header) == header
+    print("✓ Header passed to git in its environment")
+
+
+# Run all the tests
+test_push_template_to_bare_repos()
+test_extra_header_kept_out_of_arguments()
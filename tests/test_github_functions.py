@@ -1,8 +1,20 @@
 import sys
+import base64
+import subprocess
 
 sys.path.append('..')  # Add parent directory to path
 
 from github_functions import update_variable_with_data_sheet_link
+from github_functions import update_variable_in_source
+from github_functions import GitHubAppTokenProvider
+from github_functions import GitHubClient
+from github_functions import RepoHandle
+from github_functions import create_repo_from_template
+from github_functions import update_repo_with_google_data_sheet_link
+from github_functions import enable_github_page
+from github_functions import ensure_team
+from github_functions import create_empty_repo
+from github_functions import REPO_CREATION_URLS
 
 
 def test_update_variable_with_data_sheet_link():
@@ -81,5 +93,286 @@ def test_update_variable_with_data_sheet_link():
     print("✓ Test 4 passed: The variable used further down in the file not changed")
 
 
+def test_update_variable_in_source():
+    """Test the update_variable_in_source function"""
+    story_data_sheet_URL = "https://docs.google.com/spreadsheets/d/NEW_ID/edit"
+    variable_to_update = "googleSheetURL"
+
+    # Test 1: Windows line endings and the trailing newline are kept
+    source = 'Line 1\r\nconst googleSheetURL = "https://docs.google.com/spreadsheets/d/OLD_ID";\r\nAnother line\r\n'
+    result, replacements = update_variable_in_source(source, story_data_sheet_URL, variable_to_update)
+    expected = 'Line 1\r\nconst googleSheetURL = "https://docs.google.com/spreadsheets/d/NEW_ID/edit";\r\nAnother line\r\n'
+    assert result == expected, f"Expected {expected!r}, but got {result!r}"
+    assert replacements == 1, f"Expected 1 replacement, but got {replacements}"
+    print("✓ Test 1 passed: Line endings kept")
+
+    # Test 2: Minified bundle with several assignments on one line
+    source = "var a=1;var googleSheetURL='OLD_1',b={googleSheetURL:\"OLD_2\"};if(googleSheetURL=='OLD_3')a=2;"
+    result, replacements = update_variable_in_source(source, story_data_sheet_URL, variable_to_update)
+    expected = (f"var a=1;var googleSheetURL='{story_data_sheet_URL}',b={{googleSheetURL:\"{story_data_sheet_URL}\"}};"
+                "if(googleSheetURL=='OLD_3')a=2;")
+    assert result == expected, f"Expected {expected!r}, but got {result!r}"
+    assert replacements == 2, f"Expected 2 replacements, but got {replacements}"
+    print("✓ Test 2 passed: Minified bundle, comparisons left alone")
+
+    # Test 3: Variable not found, or only part of a longer name
+    source = "var my_googleSheetURL = 'OLD_ID';\nvar myGoogleSheetURLs = 'OLD_ID';\nvar googleSheetURLBackup = 'OLD_ID';\n"
+    result, replacements = update_variable_in_source(source, story_data_sheet_URL, variable_to_update)
+    assert result is source and replacements == 0, f"Expected no changes, but got {result!r}"
+    print("✓ Test 3 passed: Longer variable names not changed")
+
+    # Test 4: The first quoted string after "=" is replaced, even inside a call
+    source = "const googleSheetURL = String('https://old');\nwindow.googleSheetURL = (\"https://old\");\n"
+    result, replacements = update_variable_in_source(source, story_data_sheet_URL, variable_to_update)
+    expected = (f"const googleSheetURL = String('{story_data_sheet_URL}');\n"
+                f"window.googleSheetURL = (\"{story_data_sheet_URL}\");\n")
+    assert result == expected, f"Expected {expected!r}, but got {result!r}"
+    assert replacements == 2, f"Expected 2 replacements, but got {replacements}"
+    print("✓ Test 4 passed: Wrapped values replaced")
+
+    # Test 5: Only object keys use the colon form; ternaries and later statements are left alone
+    source = ("var url = useLocal ? googleSheetURL : 'https://fallback';\n"
+              "var config = {\n  name: 'Story',\n  googleSheetURL: 'https://old'\n};\n"
+              "googleSheetURL = getUrl(); var other = 'https://other';\n")
+    result, replacements = update_variable_in_source(source, story_data_sheet_URL, variable_to_update)
+    expected = source.replace("'https://old'", f"'{story_data_sheet_URL}'")
+    assert result == expected, f"Expected {expected!r}, but got {result!r}"
+    assert replacements == 1, f"Expected 1 replacement, but got {replacements}"
+    print("✓ Test 5 passed: Ternaries and other statements not changed")
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, content=b"", links=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+        self.content = content
+        self.links = links or {}
+
+    def json(self):
+        return self.body
+
+class FakeAppSession:
+    """Stands in for api.github.com's GitHub App endpoints, for an app installed on a user."""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, headers=None):
+        self.requests.append((method, url))
+        assert headers["Authorization"] == "Bearer signed-jwt"
+        if url.endswith("/orgs/jane/installation"):
+            return FakeResponse(404, {"message": "Not Found"})
+        if url.endswith("/users/jane/installation"):
+            return FakeResponse(200, {"id": 42})
+        if url.endswith("/app/installations/42/access_tokens"):
+            # Tokens last an hour from the first request, 2026-01-01T00:00:00Z
+            token_count = sum(1 for _, request_url in self.requests if request_url.endswith("access_tokens"))
+            return FakeResponse(201, {"token": f"token-{token_count}", "expires_at": "2026-01-01T01:00:00Z"})
+        raise AssertionError(f"Unexpected request {method} {url}")
+
+def test_github_app_token_provider():
+    """Test that installation tokens are cached and refreshed before they expire"""
+    now = [1767225600.0]  # 2026-01-01T00:00:00Z
+    provider = GitHubAppTokenProvider("123", "private key", "jane", clock=lambda: now[0])
+    provider._create_jwt = lambda: "signed-jwt"
+    provider._session = FakeAppSession()
+    client = GitHubClient(token_provider=provider)
+
+    # Test 1: The installation is found once and its token is reused while it is fresh
+    assert client.token == "token-1"
+    now[0] += 3000
+    assert client.token == "token-1"
+    assert [method for method, _ in provider._session.requests] == ["GET", "GET", "POST"], provider._session.requests
+    print("✓ Test 1 passed: Installation token cached")
+
+    # Test 2: Less than 5 minutes before expiry a new token is fetched, without looking up the installation again
+    now[0] += 400
+    assert client.token == "token-2"
+    assert len(provider._session.requests) == 4, provider._session.requests
+    print("✓ Test 2 passed: Installation token refreshed before it expires")
+
+CONFIG_SOURCE = b'const googleSheetURL = "https://docs.google.com/spreadsheets/d/OLD_ID/edit";\n'
+
+class FakeGitHubSession:
+    """Stands in for api.github.com, recording every request made through the client's session."""
+
+    def __init__(self, existing_pages=()):
+        self.requests = []
+        self.bodies = []
+        self.existing_pages = existing_pages
+
+    def _record(self, method, url, json=None):
+        self.requests.append((method, url.replace("https://api.github.com", "")))
+        self.bodies.append(json)
+
+    def get(self, url, headers=None, params=None):
+        self._record("GET", url)
+        if url.endswith("/contents/js/config.js"):
+            assert headers["Accept"] == "application/vnd.github.raw" and params == {"ref": "main"}
+            return FakeResponse(200, None, CONFIG_SOURCE)
+        if url.endswith("/pages"):
+            repo_path = url.split("/repos/")[1].rsplit("/pages", 1)[0]
+            if repo_path in self.existing_pages:
+                return FakeResponse(200, {"html_url": f"https://{repo_path}.pages"})
+        return FakeResponse(404, {"message": "Not Found"})
+
+    def post(self, url, headers=None, json=None):
+        self._record("POST", url, json)
+        if url.endswith("/generate"):
+            return FakeResponse(201, {"name": json["name"], "owner": {"login": json["owner"]},
+                                      "html_url": f"https://github.com/{json['owner']}/{json['name']}",
+                                      "default_branch": "main", "size": 0})
+        if url.endswith("/pages"):
+            return FakeResponse(201, {"html_url": "https://codes.github.io/story/"})
+        raise AssertionError(f"Unexpected POST {url}")
+
+    def put(self, url, headers=None, json=None):
+        self._record("PUT", url, json)
+        return FakeResponse(200, {"content": {}, "commit": {}})
+
+def make_client(session):
+    client = GitHubClient("token")
+    client._local.session = session
+    return client
+
+def test_requests_per_project():
+    """Test that creating and configuring a repo makes only the requests it needs"""
+    url = "https://docs.google.com/spreadsheets/d/NEW_ID/edit"
+
+    # Test 1: A new repo (known to be missing from the org listing) takes five requests
+    session = FakeGitHubSession()
+    client = make_client(session)
+    result, new_repo, e = create_repo_from_template("codes/template", "codes", "codes-story", "Story",
+                                                    check_exists=False, client=client)
+    assert result == "created" and new_repo.html_url == "https://github.com/codes/codes-story", (result, e)
+    assert update_repo_with_google_data_sheet_link(new_repo, url, "js/config.js", "googleSheetURL", client=client) == ("updated", None)
+    assert enable_github_page(new_repo, client=client)[0] == "created"
+    assert session.requests == [
+        ("POST", "/repos/codes/template/generate"),
+        ("GET", "/repos/codes/codes-story/contents/js/config.js"),
+        ("PUT", "/repos/codes/codes-story/contents/js/config.js"),
+        ("GET", "/repos/codes/codes-story/pages"),
+        ("POST", "/repos/codes/codes-story/pages"),
+    ], session.requests
+    print("✓ Test 1 passed: New repo created and configured in five requests")
+
+    # Test 2: The update sends the new content with the SHA git gives the old content
+    put_body = session.bodies[2]
+    expected_sha = subprocess.run(["git", "hash-object", "--stdin"], input=CONFIG_SOURCE,
+                                  capture_output=True, check=True).stdout.decode().strip()
+    assert put_body["sha"] == expected_sha, put_body
+    assert base64.b64decode(put_body["content"]) == CONFIG_SOURCE.replace(b"OLD_ID", b"NEW_ID"), put_body
+    print("✓ Test 2 passed: Config file updated with the locally computed blob SHA")
+
+    # Test 3: An existing repo from the org listing needs no requests of its own, and only reads once configured
+    session = FakeGitHubSession(existing_pages=["codes/codes-story"])
+    client = make_client(session)
+    existing_repo = RepoHandle.from_json({"name": "codes-story", "owner": {"login": "codes"},
+                                          "html_url": "https://github.com/codes/codes-story",
+                                          "default_branch": "main", "size": 120})
+    assert existing_repo.full_name == "codes/codes-story" and existing_repo.size == 120
+    assert update_repo_with_google_data_sheet_link(existing_repo, "https://docs.google.com/spreadsheets/d/OLD_ID/edit",
+                                                   "js/config.js", "googleSheetURL", client=client) == ("no changes", None)
+    assert enable_github_page(existing_repo, client=client)[0] == "exists"
+    assert session.requests == [
+        ("GET", "/repos/codes/codes-story/contents/js/config.js"),
+        ("GET", "/repos/codes/codes-story/pages"),
+    ], session.requests
+    print("✓ Test 3 passed: Existing, configured repo checked in two reads")
+
+class FakeTeamSession:
+    """Stands in for api.github.com's team endpoints, for an org with two pages of teams."""
+
+    def __init__(self):
+        self.requests = []
+        self.teams = {"Other Team": "other-team", "codes_2029.fall": "codes_2029-fall"}
+
+    def get(self, url, headers=None, params=None):
+        self.requests.append(("GET", url))
+        if url == "https://api.github.com/orgs/codes/teams":
+            assert params == {"per_page": 100}
+            return FakeResponse(200, [{"name": "Other Team", "slug": "other-team"}],
+                                links={"next": {"url": "https://api.github.com/orgs/codes/teams?per_page=100&page=2"}})
+        if url.endswith("page=2"):
+            return FakeResponse(200, [{"name": "codes_2029.fall", "slug": "codes_2029-fall"}])
+        raise AssertionError(f"Unexpected GET {url}")
+
+    def post(self, url, headers=None, json=None):
+        self.requests.append(("POST", url))
+        if json["name"].lower() in (name.lower() for name in self.teams):
+            return FakeResponse(422, {"message": "Name must be unique for this org"})
+        return FakeResponse(201, {"name": json["name"], "slug": "slug-from-github"})
+
+def test_ensure_team():
+    """Test that team slugs come from GitHub rather than from lower-casing the name"""
+    # Test 1: A new team's slug is taken from the create response
+    session = FakeTeamSession()
+    assert ensure_team("codes", "codes_2029.spring", "Story", client=make_client(session)) == (
+        "created", "slug-from-github", None)
+    assert len(session.requests) == 1, session.requests
+    print("✓ Test 1 passed: New team created in one request")
+
+    # Test 2: An existing team is found by name, on any page of the listing
+    session = FakeTeamSession()
+    assert ensure_team("codes", "Codes_2029.Fall", "Story", client=make_client(session)) == (
+        "exists", "codes_2029-fall", None)
+    print("✓ Test 2 passed: Existing team found by name")
+
+class FakeOwnerSession:
+    """Stands in for api.github.com's owner lookups and repository creation, for the token's user 'jane'."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, params=None):
+        self.requests.append(("GET", url.replace("https://api.github.com", "")))
+        if url.endswith("/users/codes"):
+            return FakeResponse(200, {"login": "codes", "type": "Organization"})
+        if url.endswith("/users/jane") or url.endswith("/users/bob"):
+            return FakeResponse(200, {"login": url.rsplit("/", 1)[1], "type": "User"})
+        if url.endswith("/user"):
+            return FakeResponse(200, {"login": "jane"})
+        return FakeResponse(404, {"message": "Not Found"})
+
+    def post(self, url, headers=None, json=None):
+        self.requests.append(("POST", url.replace("https://api.github.com", "")))
+        owner = "jane" if url.endswith("/user/repos") else url.split("/orgs/")[1].split("/")[0]
+        return FakeResponse(201, {"name": json["name"], "owner": {"login": owner},
+                                  "html_url": f"https://github.com/{owner}/{json['name']}"})
+
+def test_create_empty_repo_owner():
+    """Test that repos are only created for an owner that was found, never for the token's user by mistake"""
+    REPO_CREATION_URLS.clear()
+    session = FakeOwnerSession()
+    client = make_client(session)
+
+    # Test 1: An organization is looked up once
+    for name in ("story-1", "story-2"):
+        result, new_repo, e = create_empty_repo("codes", name, "Story", check_exists=False, client=client)
+        assert result == "created" and new_repo.full_name == f"codes/{name}", (result, e)
+    assert session.requests == [("GET", "/users/codes"), ("POST", "/orgs/codes/repos"), ("POST", "/orgs/codes/repos")], session.requests
+    print("✓ Test 1 passed: Organization repos created")
+
+    # Test 2: The token's own user
+    result, new_repo, e = create_empty_repo("jane", "story", "Story", check_exists=False, client=client)
+    assert result == "created" and new_repo.full_name == "jane/story", (result, e)
+    print("✓ Test 2 passed: User repo created")
+
+    # Test 3: A mistyped organization, or another user, is an error and nothing is created
+    session.requests.clear()
+    for owner in ("codez", "bob"):
+        result, new_repo, e = create_empty_repo(owner, "story", "Story", check_exists=False, client=client)
+        assert result == "error" and new_repo is None and owner in str(e), (result, e)
+    assert not [request for request in session.requests if request[0] == "POST"], session.requests
+    print("✓ Test 3 passed: Unknown owners reported without creating anything")
+    REPO_CREATION_URLS.clear()
+
+
 # Run all the tests
-test_update_variable_with_data_sheet_link()
\ No newline at end of file
+test_update_variable_with_data_sheet_link()
+test_update_variable_in_source()
+test_github_app_token_provider()
+test_requests_per_project()
+test_ensure_team()
+test_create_empty_repo_owner()
@@ -1,11 +1,24 @@
 import sys
+import os
 import pprint
+import tempfile
+import threading
+import time
 
 sys.path.append('..')  # Add parent directory to path
 
 from google_functions import convert_sheet_values_to_repo_names_and_authors
 from google_functions import sanitize_repo_name
 from google_functions import find_header_row_index
+from google_functions import sanitize_repo_names
+from google_functions import sanitize_author_names
+from google_functions import build_url_write_back_updates
+from google_functions import convert_column_index_to_letters
+from google_functions import GoogleClient
+from google_functions import convert_tab_values_to_repo_data
+from google_functions import get_google_client
+from google_functions import execute_batch_requests
+import google_functions
 
 def test_convert_sheet_values_to_repo_names_and_authors():
     """Test the convert_sheet_values_to_repo_names_and_authors function"""
@@ -158,6 +171,32 @@ def test_convert_sheet_values_to_repo_names_and_authors():
     assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
     print("✓ Test 11 passed: Column before Project Name ignored")
 
+    # Test 12: GitHub Usernames column is not an author column
+    sheet_values = [
+        ["Project Name", "Student 1", "GitHub Usernames", "Student 2"],
+        ["Project Alpha", "John Smith", "@jsmith, jdoe", "Jane Doe"],
+        ["Project Beta", "Alice Johnson"]
+    ]
+    result = convert_sheet_values_to_repo_names_and_authors(sheet_values)
+    expected = [
+        {"title": "Project Alpha", "repo-name": "project-alpha", "authors": "John Smith, Jane Doe", "github-usernames": ["jsmith", "jdoe"]},
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": "Alice Johnson", "github-usernames": []}
+    ]
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    print("✓ Test 12 passed: GitHub Usernames column parsed separately from authors")
+
+    # Test 13: URL columns written back by a previous run are not author columns
+    sheet_values = [
+        ["Project Name", "Student 1", "GitHub URL", "Pages URL", "Data Sheet URL"],
+        ["Project Alpha", "John Smith", "https://github.com/o/alpha", "https://o.github.io/alpha/", "https://docs.google.com/alpha"]
+    ]
+    result = convert_sheet_values_to_repo_names_and_authors(sheet_values)
+    expected = [{"title": "Project Alpha", "repo-name": "project-alpha", "authors": "John Smith",
+                 "github_url": "https://github.com/o/alpha", "pages_url": "https://o.github.io/alpha/",
+                 "google_sheet_url": "https://docs.google.com/alpha"}]
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    print("✓ Test 13 passed: URL columns are not authors, but kept with the project")
+
 
 
 def test_sanitize_repo_name():
@@ -184,6 +223,246 @@ def test_sanitize_repo_name():
         else:
             print(f"✗ '{original}' -> '{result}' (expected '{expected}')")
 
+def test_batch_sanitizers():
+    """Test that the batch sanitizers match the single-value sanitizers"""
+
+    repo_names = ["My Project Alpha", "Project -  Beta!!!", "", None, "   Multiple    Spaces   ", "Café Stories"]
+    result = sanitize_repo_names(repo_names)
+    expected = [sanitize_repo_name(name) for name in repo_names]
+    assert result == expected, f"Expected {expected}, but got {result}"
+    print("✓ sanitize_repo_names matches sanitize_repo_name")
+
+    author_names = ["  John S.  Smith  ", "", None, "   ", "Jane\tDoe"]
+    result = sanitize_author_names(author_names)
+    expected = ["John S. Smith", "", "", "", "Jane Doe"]
+    assert result == expected, f"Expected {expected}, but got {result}"
+    print("✓ sanitize_author_names normalizes whitespace")
+
+def test_build_url_write_back_updates():
+    """Test the build_url_write_back_updates function"""
+
+    assert [convert_column_index_to_letters(i) for i in (0, 25, 26, 51, 701, 702)] == ["A", "Z", "AA", "AZ", "ZZ", "AAA"]
+    print("✓ Column letters")
+
+    processed_repos = [
+        {"title": "Project Alpha", "row": 2, "github_url": "https://github.com/o/alpha", "pages_url": "https://o.github.io/alpha/",
+         "google_sheet_url": "https://docs.google.com/alpha"},
+        {"title": "Project Beta", "row": 5, "github_url": "https://github.com/o/beta", "pages_url": "https://o.github.io/beta/",
+         "google_sheet_url": "https://docs.google.com/beta"}
+    ]
+
+    # Test 1: URL columns are added after the last header, unprocessed rows are left alone
+    sheet_values = [
+        ["Project Name", "Student 1"],
+        ["Project Alpha", "John Smith"],
+        [],
+        ["Project Unprocessed"],
+        ["Project Beta"]
+    ]
+    result = build_url_write_back_updates("Cohort's Roster", sheet_values, processed_repos)
+    expected = [
+        {"range": "'Cohort''s Roster'!C1", "values": [["GitHub URL"]]},
+        {"range": "'Cohort''s Roster'!D1", "values": [["Pages URL"]]},
+        {"range": "'Cohort''s Roster'!E1", "values": [["Data Sheet URL"]]},
+        {"range": "'Cohort''s Roster'!C2", "values": [["https://github.com/o/alpha"]]},
+        {"range": "'Cohort''s Roster'!D2", "values": [["https://o.github.io/alpha/"]]},
+        {"range": "'Cohort''s Roster'!E2", "values": [["https://docs.google.com/alpha"]]},
+        {"range": "'Cohort''s Roster'!C5", "values": [["https://github.com/o/beta"]]},
+        {"range": "'Cohort''s Roster'!D5", "values": [["https://o.github.io/beta/"]]},
+        {"range": "'Cohort''s Roster'!E5", "values": [["https://docs.google.com/beta"]]}
+    ]
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    print("✓ Test 1 passed: Missing URL columns added")
+
+    # Test 2: Only cells whose value changed are written
+    sheet_values = [
+        ["Project Name", "GitHub URL", "Student 1", "Pages URL", "Data Sheet URL"],
+        ["Project Alpha", "https://github.com/o/alpha", "John Smith", "https://o.github.io/alpha/", "https://docs.google.com/old"],
+        ["Project Beta", "https://github.com/o/beta", "", "https://o.github.io/beta/", "https://docs.google.com/beta"]
+    ]
+    processed_repos[1]["row"] = 3
+    result = build_url_write_back_updates("Sheet1", sheet_values, processed_repos)
+    expected = [{"range": "'Sheet1'!E2", "values": [["https://docs.google.com/alpha"]]}]
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    print("✓ Test 2 passed: Unchanged cells skipped")
+
+    # Test 3: A rejected row whose name sanitizes to the same repo name gets nothing, and
+    # new columns go after the widest row, not over an unlabeled author cell
+    sheet_values = [
+        ["Project Name", "Student 1"],
+        ["Café Stories", "Alice", "Bob"],
+        ["Caf Stories", "Bob"]
+    ]
+    processed_repos = [{"title": "Café Stories", "row": 2, "github_url": "https://github.com/o/caf-stories"}]
+    result = build_url_write_back_updates("Sheet1", sheet_values, processed_repos)
+    expected = [
+        {"range": "'Sheet1'!D1", "values": [["GitHub URL"]]},
+        {"range": "'Sheet1'!E1", "values": [["Pages URL"]]},
+        {"range": "'Sheet1'!F1", "values": [["Data Sheet URL"]]},
+        {"range": "'Sheet1'!D2", "values": [["https://github.com/o/caf-stories"]]}
+    ]
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    print("✓ Test 3 passed: Only the project's own row written, after the widest row")
+
+    # Test 4: Rows are recorded when converting, so the write-back can find them
+    repo_data = convert_tab_values_to_repo_data([("Sheet1", sheet_values)], record_rows=True)
+    assert [(data['title'], data['row']) for data in repo_data] == [("Café Stories", 2), ("Caf Stories", 3)], repo_data
+    print("✓ Test 4 passed: Source rows recorded")
+
+def test_convert_tab_values_to_repo_data():
+    """Test merging several input sheet tabs into one project stream"""
+    tab_values = [
+        ("Section 1", [
+            ["Project Name", "Student 1"],
+            ["Project Alpha", "John Smith"],
+            ["Project Beta", "Jane Doe"]
+        ]),
+        ("Section 2", [
+            ["Faculty Member", "Project Name", "Student 1"],
+            ["Laura L", "Project Gamma", "Alice Johnson"],
+            ["Laura L", "Project Alpha", "John Smith"],    # Exact duplicate of Section 1, dropped
+            ["Laura L", "Project Beta", "Charlie Brown"]  # Same repo name, different students, kept
+        ])
+    ]
+    result = convert_tab_values_to_repo_data(tab_values)
+    expected = [
+        {"title": "Project Alpha", "repo-name": "project-alpha", "authors": "John Smith", "tab": "Section 1"},
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": "Jane Doe", "tab": "Section 1"},
+        {"title": "Project Gamma", "repo-name": "project-gamma", "authors": "Alice Johnson", "tab": "Section 2"},
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": "Charlie Brown", "tab": "Section 2"}
+    ]
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    print("✓ Tabs merged, tagged and deduplicated")
+
+class FakeCredentials:
+    """Stands in for google.oauth2 credentials, counting how often they are refreshed."""
+    def __init__(self):
+        self.valid = False
+        self.token = None
+        self.refresh_count = 0
+
+    def refresh(self, request):
+        time.sleep(0.05)  # Give other threads the chance to race
+        self.refresh_count += 1
+        self.token = f"token-{self.refresh_count}"
+        self.valid = True
+
+    def apply(self, headers):
+        headers["authorization"] = f"Bearer {self.token}"
+
+    def to_json(self):
+        return "{}"
+
+def test_google_client_shared_between_threads():
+    """Test that parallel callers refresh the shared credentials once and get their own services"""
+    creds = FakeCredentials()
+    token_file = os.path.join(tempfile.mkdtemp(), "token.json")
+    client = GoogleClient(creds, token_file=token_file)
+
+    services = []
+    def use_client():
+        services.append(client.drive)
+        services.append(client.drive)
+    threads = [threading.Thread(target=use_client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert creds.refresh_count == 1, f"Expected 1 refresh, but got {creds.refresh_count}"
+    assert os.path.exists(token_file), "Expected the refreshed token to be saved"
+    # Each thread gets its own service object, and keeps reusing it
+    assert len({id(service) for service in services}) == 8, "Expected one Drive service per thread"
+    print("✓ Credentials refreshed once, one service per thread")
+
+def test_google_client_refreshes_rejected_token_once():
+    """Test that threads whose requests are rejected with a 401 refresh the shared credentials once, under the lock"""
+    creds = FakeCredentials()
+    creds.valid = True
+    creds.token = "revoked-token"
+    client = GoogleClient(creds, token_file=os.path.join(tempfile.mkdtemp(), "token.json"))
+
+    retried_headers = []
+    def send_rejected_request():
+        # What AuthorizedHttp does with its credentials: apply them, and refresh them after a 401
+        transport_creds = google_functions._LockedCredentials(client)
+        headers = {}
+        transport_creds.before_request(None, "GET", "https://sheets.googleapis.com", headers)
+        time.sleep(0.05)  # Wait for the 401, so every thread sends the revoked token
+        transport_creds.refresh(None)
+        headers = {}
+        transport_creds.before_request(None, "GET", "https://sheets.googleapis.com", headers)
+        retried_headers.append(headers)
+    threads = [threading.Thread(target=send_rejected_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert creds.refresh_count == 1, f"Expected 1 refresh, but got {creds.refresh_count}"
+    assert retried_headers == [{"authorization": "Bearer token-1"}] * 8, f"Unexpected retries {retried_headers}"
+    print("✓ Rejected token refreshed once for all threads")
+
+def test_google_client_set_up_once():
+    """Test that threads asking for the shared client at the same time authenticate only once"""
+    authentications = []
+    def fake_authenticate_google_user():
+        time.sleep(0.05)  # Give other threads the chance to race
+        authentications.append(threading.current_thread())
+        return FakeCredentials()
+
+    original_authenticate = google_functions.authenticate_google_user
+    original_client = google_functions.GOOGLE_CLIENT
+    google_functions.authenticate_google_user = fake_authenticate_google_user
+    google_functions.GOOGLE_CLIENT = None
+    try:
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(get_google_client())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        google_functions.authenticate_google_user = original_authenticate
+        google_functions.GOOGLE_CLIENT = original_client
+
+    assert len(authentications) == 1, f"Expected 1 authentication, but got {len(authentications)}"
+    assert len({id(client) for client in clients}) == 1, "Expected every thread to get the same client"
+    print("✓ Shared client set up once")
+
+class FakeBatch:
+    """Stands in for a BatchHttpRequest; a request that is an exception makes the whole batch raise it."""
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            if isinstance(request, Exception):
+                raise request
+            self.callback(request_id, f"response-{request}", None)
+
+class FakeBatchService:
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+def test_execute_batch_requests():
+    """Test that a batch that fails as a whole gives its error to each of its requests, and the other batches still run"""
+    original_max_requests = google_functions.GOOGLE_BATCH_MAX_REQUESTS
+    google_functions.GOOGLE_BATCH_MAX_REQUESTS = 2
+    try:
+        error = ConnectionError("connection reset")
+        responses = execute_batch_requests(FakeBatchService(), {"a": "a", "b": "b", "c": "c", "d": error, "e": "e"})
+    finally:
+        google_functions.GOOGLE_BATCH_MAX_REQUESTS = original_max_requests
+
+    assert responses == {"a": ("response-a", None), "b": ("response-b", None), "c": ("response-c", None),
+                         "d": (None, error), "e": ("response-e", None)}, f"Unexpected responses {responses}"
+    print("✓ Failed batch reported per request, other batches sent")
+
 def test_find_header_row_index():
     """Test the find_header_row_index function"""
     sheet_values = [
@@ -244,4 +523,11 @@ def test_find_header_row_index():
 # Run all the tests
 test_find_header_row_index()
 test_sanitize_repo_name()
+test_batch_sanitizers()
+test_build_url_write_back_updates()
+test_google_client_shared_between_threads()
+test_google_client_refreshes_rejected_token_once()
+test_google_client_set_up_once()
+test_execute_batch_requests()
+test_convert_tab_values_to_repo_data()
 test_convert_sheet_values_to_repo_names_and_authors()
\ No newline at end of file
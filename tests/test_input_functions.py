@@ -0,0 +1,62 @@
+import os
+import pprint
+import sys
+import tempfile
+
+sys.path.append('..')  # Add parent directory to path
+
+from input_functions import fetch_repo_data_from_file
+from input_functions import read_xlsx_rows
+from google_functions import convert_tab_values_to_repo_data
+
+
+SHEET_VALUES = [
+    ["Project Name", "Student 1", "Student 2"],
+    ["Project Alpha", "John Smith", "Jane Doe"],
+    [],
+    ["Project Beta", "Alice Johnson"],
+]
+
+def test_fetch_repo_data_from_csv_file():
+    """Test reading the projects from a CSV file saved by Excel"""
+    with tempfile.TemporaryDirectory() as directory:
+        input_file = os.path.join(directory, "roster.csv")
+        # Excel writes a byte order mark, CRLF line endings and a cell for every column
+        with open(input_file, "w", newline="", encoding="utf-8-sig") as csv_file:
+            csv_file.write("Project Name,Student 1,Student 2\r\n"
+                           "Project Alpha,John Smith,Jane Doe\r\n"
+                           ",,\r\n"
+                           "Project Beta,Alice Johnson,\r\n")
+        result = fetch_repo_data_from_file(input_file)
+
+    # Test 1: The file gives the same projects as the same rows in the input sheet
+    expected = convert_tab_values_to_repo_data([("roster.csv", SHEET_VALUES)])
+    assert result == expected, f"Expected:\n{pprint.pformat(expected)}\n\nGot:\n{pprint.pformat(result)}"
+    assert result[0]['title'] == "Project Alpha", f"Byte order mark not skipped: {result[0]}"
+    print("✓ Test 1 passed: CSV file read like the input sheet")
+
+class FakeWorksheet:
+    """Stands in for an openpyxl read-only worksheet."""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def iter_rows(self, values_only=False):
+        return iter(self.rows)
+
+def test_read_xlsx_rows():
+    """Test converting XLSX cell values to the text the Sheets API returns"""
+    worksheet = FakeWorksheet([
+        ("Project Name", "Student 1", "Student 2", None),
+        (" Project Alpha ", "John Smith", None, None),
+        (None, None, None, None),
+        (2029.0, 1.5, None, None),
+    ])
+    rows = list(read_xlsx_rows(worksheet))
+    expected = [["Project Name", "Student 1", "Student 2"], ["Project Alpha", "John Smith"], [], ["2029", "1.5"]]
+    assert rows == expected, f"Expected {expected}, got {rows}"
+    print("✓ XLSX cells converted and trailing empty cells dropped")
+
+
+# Run all the tests
+test_fetch_repo_data_from_csv_file()
+test_read_xlsx_rows()
@@ -0,0 +1,108 @@
+import sys
+
+sys.path.append('..')  # Add parent directory to path
+
+from pipeline_functions import Stage
+from pipeline_functions import StageResult
+from pipeline_functions import run_pipeline
+
+
+class SheetStage(Stage):
+    """Creates a "sheet" per project, one at a time or all at once."""
+    name = "sheet"
+
+    def __init__(self, bulk_error=None):
+        self.calls = []
+        self.bulk_error = bulk_error
+
+    def run_item(self, project):
+        self.calls.append(("item", project['title']))
+        if project['title'] == "Broken":
+            raise RuntimeError("quota exceeded")
+        return StageResult("created", f"sheet-{project['title']}")
+
+    def run_bulk(self, projects, inputs):
+        self.calls.append(("bulk", [project['title'] for project in projects]))
+        if self.bulk_error:
+            raise self.bulk_error
+        return [StageResult("created", f"sheet-{project['title']}") for project in projects]
+
+class RepoStage(Stage):
+    name = "repo"
+
+    def run_item(self, project):
+        if project['title'] == "Taken":
+            return StageResult("error", error="name already taken")
+        return StageResult("exists", f"repo-{project['title']}")
+
+class UpdateStage(Stage):
+    name = "update"
+    dependencies = ("repo", "sheet")
+
+    def run_item(self, project, repo, sheet):
+        return StageResult("error", error="no variable") if project['title'] == "Alpha" else StageResult("updated", f"{repo}+{sheet}")
+
+class PagesStage(Stage):
+    name = "pages"
+    dependencies = ("repo",)
+    waits_for = ("update",)
+
+    def __init__(self, finished):
+        self.finished = finished
+
+    def run_item(self, project, repo):
+        assert "update" in self.finished, "pages started before the update stage finished"
+        return StageResult("created", f"page-{repo}")
+
+
+def test_run_pipeline():
+    """Test running stages for a batch of projects"""
+    projects = [{"title": "Alpha"}, {"title": "Taken"}, {"title": "Gamma"}]
+    sheet_stage = SheetStage()
+    finished = set()
+    reported = []
+    def report(stage, project, result):
+        reported.append((stage.name, project['title'], result.status))
+        # Alpha and Gamma are the two projects that reach the update stage
+        if sum(1 for name, _, _ in reported if name == "update") == 2:
+            finished.add("update")
+
+    results = run_pipeline([sheet_stage, RepoStage(), UpdateStage(), PagesStage(finished)], projects, report=report)
+
+    # Test 1: A stage with a bulk backend handles the whole batch in one call
+    assert sheet_stage.calls == [("bulk", ["Alpha", "Taken", "Gamma"])], sheet_stage.calls
+    print("✓ Test 1 passed: Bulk backend used for the batch")
+
+    # Test 2: A failed dependency skips the project's later stages, but a failure in waits_for does not
+    assert [result.status for result in results["update"]] == ["error", "skipped", "updated"], results["update"]
+    assert results["update"][2].value == "repo-Gamma+sheet-Gamma"
+    assert [result.status for result in results["pages"]] == ["created", "skipped", "created"], results["pages"]
+    assert ("pages", "Taken", "skipped") not in reported
+    print("✓ Test 2 passed: Failed projects skipped, waits_for only orders the stages")
+
+def test_stage_run_batch():
+    """Test choosing the backend and handling exceptions"""
+    # Test 1: A single project uses the per-item backend
+    stage = SheetStage()
+    assert stage.run_batch([{"title": "Alpha"}], [()]) == [StageResult("created", "sheet-Alpha")]
+    assert stage.calls == [("item", "Alpha")], stage.calls
+    print("✓ Test 1 passed: Per-item backend used for a single project")
+
+    # Test 2: An exception in one project becomes that project's error result
+    stage.bulk_min_projects = 10
+    results = stage.run_batch([{"title": "Broken"}, {"title": "Beta"}], [(), ()])
+    assert results[0].status == "error" and "quota" in str(results[0].error), results
+    assert results[1] == StageResult("created", "sheet-Beta") and results[1].ok
+    print("✓ Test 2 passed: Exceptions become error results")
+
+    # Test 3: A bulk backend that raises falls back to the per-item backend
+    stage = SheetStage(bulk_error=ConnectionError("batch request failed"))
+    results = stage.run_batch([{"title": "Alpha"}, {"title": "Beta"}], [(), ()])
+    assert results == [StageResult("created", "sheet-Alpha"), StageResult("created", "sheet-Beta")], results
+    assert stage.calls == [("bulk", ["Alpha", "Beta"]), ("item", "Alpha"), ("item", "Beta")], stage.calls
+    print("✓ Test 3 passed: Failed bulk backend falls back to per-item")
+
+
+# Run all the tests
+test_run_pipeline()
+test_stage_run_batch()
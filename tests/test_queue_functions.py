@@ -0,0 +1,111 @@
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append('..')  # Add parent directory to path
+
+from queue_functions import ProjectQueue
+
+
+def make_queue(**kwargs):
+    queue_dir = tempfile.mkdtemp()
+    return ProjectQueue(os.path.join(queue_dir, "queue.db"), **kwargs)
+
+def test_lease_and_complete():
+    """Test leasing projects and reporting their results"""
+    queue = make_queue()
+    all_repo_data = [
+        {"title": "Project Alpha", "repo-name": "project-alpha", "authors": "John Smith"},
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": ""}
+    ]
+
+    # Test 1: Projects are only enqueued once
+    assert queue.enqueue_projects(all_repo_data) == 2
+    assert queue.enqueue_projects(all_repo_data) == 0
+    assert queue.count_remaining() == 2
+    print("✓ Test 1 passed: Projects are only enqueued once")
+
+    # Test 2: Two workers never lease the same project
+    first = queue.lease_project("worker-1")
+    second = queue.lease_project("worker-2")
+    assert first == all_repo_data[0], f"Expected {all_repo_data[0]}, but got {first}"
+    assert second == all_repo_data[1], f"Expected {all_repo_data[1]}, but got {second}"
+    assert queue.lease_project("worker-3") is None
+    print("✓ Test 2 passed: Each project is leased to one worker")
+
+    # Test 3: Only the lease holder can complete a project
+    assert not queue.complete_project("project-alpha", "worker-2", {"title": "wrong worker"})
+    assert queue.complete_project("project-alpha", "worker-1", {"title": "Project Alpha"})
+    assert queue.fail_project("project-beta", "worker-2", "boom")
+    assert queue.count_remaining() == 0
+
+    results, failures = queue.get_results()
+    assert results == [{"title": "Project Alpha"}], f"Unexpected results {results}"
+    assert failures == [(all_repo_data[1], "boom")], f"Unexpected failures {failures}"
+    print("✓ Test 3 passed: Results and failures are reported")
+
+def test_expired_leases_are_requeued():
+    """Test that projects leased by a crashed worker are handed to another worker"""
+    queue = make_queue(lease_seconds=0.05, max_attempts=2)
+    queue.enqueue_projects([{"title": "Project Alpha", "repo-name": "project-alpha", "authors": ""}])
+
+    # Test 1: A heartbeat keeps the lease alive
+    assert queue.lease_project("crashed-worker") is not None
+    assert queue.heartbeat("project-alpha", "crashed-worker")
+    assert queue.lease_project("worker-2") is None
+    print("✓ Test 1 passed: Heartbeat keeps the lease")
+
+    # Test 2: Once the lease expires, another worker gets the project and the old worker loses it
+    time.sleep(0.1)
+    assert queue.lease_project("worker-2") is not None
+    assert not queue.heartbeat("project-alpha", "crashed-worker")
+    assert not queue.complete_project("project-alpha", "crashed-worker", {})
+    print("✓ Test 2 passed: Expired lease re-queued")
+
+    # Test 3: After max_attempts expired leases the project is failed instead of re-queued
+    time.sleep(0.1)
+    assert queue.lease_project("worker-3") is None
+    assert queue.count_remaining() == 0
+    results, failures = queue.get_results()
+    assert len(failures) == 1 and "expired" in failures[0][1], f"Unexpected failures {failures}"
+    print("✓ Test 3 passed: Repeatedly expired project marked as failed")
+
+def test_enqueue_again_retries_failed_and_edited_projects():
+    """Test that enqueueing the projects again retries failed projects and picks up edited project data"""
+    queue = make_queue()
+    alpha = {"title": "Project Alpha", "repo-name": "project-alpha", "authors": "John Smith"}
+    beta = {"title": "Project Beta", "repo-name": "project-beta", "authors": ""}
+    gamma = {"title": "Project Gamma", "repo-name": "project-gamma", "authors": ""}
+    queue.enqueue_projects([alpha, beta, gamma])
+    queue.lease_project("worker-1")
+    queue.lease_project("worker-1")
+    queue.complete_project("project-alpha", "worker-1", {"title": "Project Alpha"})
+    queue.fail_project("project-beta", "worker-1", "boom")
+
+    # Test 1: A re-run re-queues the failed project and updates the pending one, keeping the done one
+    edited_gamma = dict(gamma, authors="Alice Johnson")
+    assert queue.enqueue_projects([alpha, beta, edited_gamma]) == 2
+    assert queue.count_remaining() == 2
+    assert queue.lease_project("worker-2") == beta
+    assert queue.lease_project("worker-2") == edited_gamma
+    results, failures = queue.get_results()
+    assert results == [{"title": "Project Alpha"}] and failures == [], f"Unexpected {results}, {failures}"
+    print("✓ Test 1 passed: Failed project retried and pending project updated")
+
+    # Test 2: A project being processed is left alone
+    assert queue.enqueue_projects([dict(beta, authors="Jane Doe")]) == 0
+    assert queue.heartbeat("project-beta", "worker-2")
+    print("✓ Test 2 passed: Leased project untouched")
+
+    # Test 3: A done project whose data was edited is processed again with the new data
+    edited_alpha = dict(alpha, authors="John Smith, Jane Doe")
+    assert queue.enqueue_projects([edited_alpha]) == 1
+    assert queue.lease_project("worker-3") == edited_alpha
+    assert queue.get_results() == ([], []), f"Stale result still reported: {queue.get_results()}"
+    print("✓ Test 3 passed: Edited done project re-queued")
+
+# Run all the tests
+test_lease_and_complete()
+test_expired_leases_are_requeued()
+test_enqueue_again_retries_failed_and_edited_projects()
\ No newline at end of file
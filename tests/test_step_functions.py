@@ -0,0 +1,58 @@
+import sys
+import threading
+
+sys.path.append('..')  # Add parent directory to path
+
+from step_functions import run_step_graph
+from step_functions import validate_step_graph
+
+
+def test_run_step_graph():
+    """Test the run_step_graph function"""
+
+    # Test 1: Independent steps run at the same time, dependent steps get their dependencies' results
+    both_started = threading.Barrier(2, timeout=5)
+    def independent(value):
+        both_started.wait()  # Only returns if the other independent step is running too
+        return value
+    order = []
+    steps = {
+        "repo": ([], lambda: independent("repo")),
+        "sheet": ([], lambda: independent("sheet")),
+        "update": (["repo", "sheet"], lambda repo, sheet: order.append("update") or f"{repo}+{sheet}"),
+        "pages": (["update"], lambda update: order.append("pages") or f"pages after {update}")
+    }
+    results = run_step_graph(steps)
+    expected = {"repo": "repo", "sheet": "sheet", "update": "repo+sheet", "pages": "pages after repo+sheet"}
+    assert results == expected, f"Expected {expected}, but got {results}"
+    assert order == ["update", "pages"], f"Expected update before pages, but got {order}"
+    print("✓ Test 1 passed: Independent steps overlap, dependencies respected")
+
+    # Test 2: A failed step (None) skips everything that depends on it, but not the other branch
+    steps = {
+        "repo": ([], lambda: None),
+        "sheet": ([], lambda: "sheet"),
+        "share": (["sheet"], lambda sheet: "shared"),
+        "update": (["repo", "sheet"], lambda repo, sheet: "should not run"),
+        "pages": (["update"], lambda update: "should not run")
+    }
+    results = run_step_graph(steps)
+    expected = {"repo": None, "sheet": "sheet", "share": "shared", "update": None, "pages": None}
+    assert results == expected, f"Expected {expected}, but got {results}"
+    print("✓ Test 2 passed: Failed step skips its dependents")
+
+def test_validate_step_graph():
+    """Test that unknown dependencies and cycles are rejected"""
+    for steps in ({"a": (["missing"], None)},
+                  {"a": (["b"], None), "b": (["a"], None)}):
+        try:
+            validate_step_graph(steps)
+        except ValueError as e:
+            print(f"✓ Rejected: {e}")
+        else:
+            assert False, f"Expected {steps} to be rejected"
+
+
+# Run all the tests
+test_run_step_graph()
+test_validate_step_graph()
@@ -0,0 +1,110 @@
+import sys
+
+sys.path.append('..')  # Add parent directory to path
+
+from sync_functions import locate_project_resources
+from sync_functions import build_sync_plan
+
+
+LIVE_REPOS = {
+    "codes2029-project-alpha": {"name": "codes2029-project-alpha", "node_id": "R_alpha", "description": "Story: Project Alpha"},
+    "codes2029-project-beta": {"name": "codes2029-project-beta", "node_id": "R_beta", "description": "Story: Project Beta"},
+}
+LIVE_SHEET_NAMES = {
+    "sheet-alpha": "Scrolly Story Project Alpha",
+    "sheet-beta": "Scrolly Story Project Beta",
+}
+
+def test_locate_project_resources():
+    """Test finding the live repo and sheet of each project"""
+    all_repo_data = [
+        # Renamed since it was created, but found through the URLs written back to the input sheet
+        {"title": "Project Alpha Revisited", "repo-name": "project-alpha-revisited", "authors": "",
+         "github_url": "https://github.com/codes2029/codes2029-project-alpha",
+         "google_sheet_url": "https://docs.google.com/spreadsheets/d/sheet-alpha/edit"},
+        # No URLs, found by name
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": ""},
+        {"title": "Project Gamma", "repo-name": "project-gamma", "authors": ""},
+    ]
+    located, missing = locate_project_resources(all_repo_data, LIVE_REPOS, LIVE_SHEET_NAMES, "codes2029", "Scrolly Story ")
+
+    # Test 1: Projects are found by URL and by name
+    assert [(data['title'], repo['node_id'], sheet_id) for data, repo, sheet_id in located] == [
+        ("Project Alpha Revisited", "R_alpha", "sheet-alpha"),
+        ("Project Beta", "R_beta", "sheet-beta")], f"Unexpected located projects {located}"
+    print("✓ Test 1 passed: Projects located by URL and by name")
+
+    # Test 2: Projects that were never created are reported
+    assert len(missing) == 1 and missing[0][0]['title'] == "Project Gamma", f"Unexpected missing projects {missing}"
+    assert "codes2029-project-gamma" in missing[0][1], f"Unexpected reason: {missing[0][1]}"
+    print("✓ Test 2 passed: Missing projects reported")
+
+    # Test 3: A repo and sheet claimed through written-back URLs are not also synced to a row found by name
+    all_repo_data = [
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": "Bob"},
+        {"title": "Project Beta Renamed", "repo-name": "project-beta-renamed", "authors": "Alice",
+         "github_url": "https://github.com/codes2029/codes2029-project-beta",
+         "google_sheet_url": "https://docs.google.com/spreadsheets/d/sheet-beta/edit"},
+    ]
+    located, missing = locate_project_resources(all_repo_data, LIVE_REPOS, LIVE_SHEET_NAMES, "codes2029", "Scrolly Story ")
+    assert [(data['title'], sheet_id) for data, _, sheet_id in located] == [("Project Beta Renamed", "sheet-beta")], located
+    assert [(data['title'], reason) for data, reason in missing] == [
+        ("Project Beta", "GitHub repository 'codes2029-project-beta' belongs to project \"Project Beta Renamed\"")], missing
+    print("✓ Test 3 passed: Repo and sheet synced for only one project")
+
+    # Test 4: Repo names are matched regardless of case, as GitHub does
+    all_repo_data = [
+        {"title": "Project Alpha", "repo-name": "project-alpha", "authors": "",
+         "github_url": "https://github.com/codes2029/Codes2029-Project-Alpha",
+         "google_sheet_url": "https://docs.google.com/spreadsheets/d/sheet-alpha/edit"},
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": ""},
+    ]
+    live_repos = dict(LIVE_REPOS, **{"Codes2029-Project-Beta": LIVE_REPOS["codes2029-project-beta"]})
+    del live_repos["codes2029-project-beta"]
+    located, missing = locate_project_resources(all_repo_data, live_repos, LIVE_SHEET_NAMES, "codes2029", "Scrolly Story ")
+    assert [repo['node_id'] for _, repo, _ in located] == ["R_alpha", "R_beta"], f"Unexpected {located}, {missing}"
+    print("✓ Test 4 passed: Repo names matched regardless of case")
+
+def test_build_sync_plan():
+    """Test that only the changed parts of changed projects are planned"""
+    alpha = {"title": "Project Alpha Revisited", "repo-name": "project-alpha-revisited", "authors": "John Smith"}
+    beta = {"title": "Project Beta", "repo-name": "project-beta", "authors": "Alice Johnson, Bob Lee"}
+    located = [(alpha, LIVE_REPOS["codes2029-project-alpha"], "sheet-alpha"),
+               (beta, LIVE_REPOS["codes2029-project-beta"], "sheet-beta")]
+    story_info = {
+        "sheet-alpha": ("Project Alpha", "John Smith"),
+        "sheet-beta": ("Project Beta", "Alice Johnson"),
+    }
+    plan = build_sync_plan(located, LIVE_SHEET_NAMES, story_info, "Story:", "Scrolly Story ")
+
+    # Test 1: A new title changes the description, sheet name and story info
+    assert plan["repo_descriptions"] == {"R_alpha": "Story: Project Alpha Revisited"}, plan["repo_descriptions"]
+    assert plan["sheet_names"] == {"sheet-alpha": "Scrolly Story Project Alpha Revisited"}, plan["sheet_names"]
+    print("✓ Test 1 passed: Title change planned")
+
+    # Test 2: A new author only changes the story info
+    assert plan["story_info"] == {
+        "sheet-alpha": ("Project Alpha Revisited", "John Smith"),
+        "sheet-beta": ("Project Beta", "Alice Johnson, Bob Lee")}, plan["story_info"]
+    assert plan["changed_projects"] == [
+        (alpha, ["repo description", "sheet name", "story title and authors"]),
+        (beta, ["story title and authors"])], plan["changed_projects"]
+    print("✓ Test 2 passed: Author change planned")
+
+    # Test 3: Nothing is planned for projects that are up to date
+    story_info["sheet-beta"] = ("Project Beta", "Alice Johnson, Bob Lee")
+    plan = build_sync_plan(located[1:], LIVE_SHEET_NAMES, story_info, "Story:", "Scrolly Story ")
+    assert plan["changed_projects"] == [], plan["changed_projects"]
+    print("✓ Test 3 passed: Up to date project left alone")
+
+    # Test 4: A Story tab that could not be read is reported, not overwritten
+    story_info["sheet-beta"] = (None, None)
+    plan = build_sync_plan(located[1:], LIVE_SHEET_NAMES, story_info, "Story:", "Scrolly Story ")
+    assert plan["story_info"] == {} and plan["changed_projects"] == [], plan
+    assert plan["unreadable_story_info"] == [beta], plan["unreadable_story_info"]
+    print("✓ Test 4 passed: Unreadable story info left alone and reported")
+
+
+# Run all the tests
+test_locate_project_resources()
+test_build_sync_plan()
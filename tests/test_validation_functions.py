@@ -0,0 +1,107 @@
+import sys
+import threading
+
+sys.path.append('..')  # Add parent directory to path
+
+import validation_functions
+from validation_functions import build_name_collision_index
+from validation_functions import run_preflight_checks
+from validation_functions import check_template_sheet
+from validation_functions import check_github_token
+from validation_functions import check_github_quota
+
+
+def test_build_name_collision_index():
+    """Test the build_name_collision_index function"""
+
+    # Test 1: No collisions
+    all_repo_data = [
+        {"title": "Project Alpha", "repo-name": "project-alpha", "authors": ""},
+        {"title": "Project Beta", "repo-name": "project-beta", "authors": ""}
+    ]
+    accepted, rejected = build_name_collision_index(all_repo_data, "codes2029", "Scrolly Story ")
+    assert accepted == all_repo_data, f"Expected {all_repo_data}, but got {accepted}"
+    assert rejected == [], f"Expected no rejections, but got {rejected}"
+    print("✓ Test 1 passed: No collisions")
+
+    # Test 2: Different titles that sanitize to the same repo name, first one wins
+    all_repo_data = [
+        {"title": "Café Stories", "repo-name": "caf-stories", "authors": ""},
+        {"title": "Caf Stories", "repo-name": "caf-stories", "authors": ""}
+    ]
+    accepted, rejected = build_name_collision_index(all_repo_data, "codes2029", "Scrolly Story ")
+    assert accepted == all_repo_data[:1], f"Expected {all_repo_data[:1]}, but got {accepted}"
+    assert len(rejected) == 1 and rejected[0][0] is all_repo_data[1], f"Expected second project rejected, got {rejected}"
+    assert "codes2029-caf-stories" in rejected[0][1], f"Unexpected reason: {rejected[0][1]}"
+    print("✓ Test 2 passed: Repo name collision rejected")
+
+    # Test 3: Different repo names but the same sheet name
+    all_repo_data = [
+        {"title": "Maps: Stories", "repo-name": "maps-stories", "authors": ""},
+        {"title": "Maps Stories", "repo-name": "maps-stories-2", "authors": ""}
+    ]
+    accepted, rejected = build_name_collision_index(all_repo_data, "codes2029", "Scrolly Story ")
+    assert accepted == all_repo_data[:1], f"Expected {all_repo_data[:1]}, but got {accepted}"
+    assert "Google Sheet name" in rejected[0][1], f"Unexpected reason: {rejected[0][1]}"
+    print("✓ Test 3 passed: Sheet name collision rejected")
+
+    # Test 4: Empty and too long names
+    all_repo_data = [
+        {"title": "!!!", "repo-name": "", "authors": ""},
+        {"title": "x" * 120, "repo-name": "x" * 120, "authors": ""}
+    ]
+    accepted, rejected = build_name_collision_index(all_repo_data, "codes2029", "Scrolly Story ")
+    assert accepted == [], f"Expected nothing accepted, but got {accepted}"
+    assert len(rejected) == 2, f"Expected 2 rejections, but got {rejected}"
+    print("✓ Test 4 passed: Empty and too long names rejected")
+
+
+def test_run_preflight_checks():
+    """Test that the preflight checks run at the same time and report every failure"""
+    # Each check waits for all the others, so this only finishes if they run at the same time
+    barrier = threading.Barrier(3, timeout=5)
+    def passing_check():
+        barrier.wait()
+        return None
+    def failing_check():
+        barrier.wait()
+        return "template data sheet has no 'Story' tab"
+    def broken_check():
+        barrier.wait()
+        raise RuntimeError("connection reset")
+
+    failures = run_preflight_checks({"Repo": passing_check, "Sheet": failing_check, "Token": broken_check})
+    assert failures == [("Sheet", "template data sheet has no 'Story' tab"), ("Token", "connection reset")], failures
+    print("✓ Test 1 passed: Checks run concurrently and all failures are reported")
+
+def test_preflight_checks():
+    """Test the checks that interpret API responses"""
+    original_get_sheet_tab_sizes = validation_functions.get_sheet_tab_sizes
+    try:
+        # Test 1: The Story tab must exist and be big enough for B2 and D2
+        validation_functions.get_sheet_tab_sizes = lambda sheet_id: ({"Story": (1000, 26)}, None)
+        assert check_template_sheet("sheet") is None
+        validation_functions.get_sheet_tab_sizes = lambda sheet_id: ({"Sheet1": (1000, 26)}, None)
+        assert "no 'Story' tab" in check_template_sheet("sheet")
+        print("✓ Test 1 passed: Template sheet tabs checked")
+
+        # Test 2: Classic tokens need repo scope (and write:org for teams)
+        rate_limit = (4000, 5000, ["repo"], None)
+        assert check_github_token(rate_limit) is None
+        assert "write:org" in check_github_token(rate_limit, needs_org_write=True)
+        assert check_github_token((10, 15000, None, None), needs_org_write=True) is None
+        assert "can't be read" in check_github_token((None, None, None, "401 - Bad credentials"))
+        print("✓ Test 2 passed: Token scopes checked")
+
+        # Test 3: A roster bigger than the quota left this hour only gets a warning with the hours it needs
+        assert check_github_quota(rate_limit, 400) is None
+        warning = check_github_quota(rate_limit, 2000)  # About 20000 requests: this hour's 4000, then 4 more hours
+        assert "4000 of 5000" in warning and "about 5 hours" in warning, warning
+        print("✓ Test 3 passed: Quota estimated")
+    finally:
+        validation_functions.get_sheet_tab_sizes = original_get_sheet_tab_sizes
+
+# Run all the tests
+test_build_name_collision_index()
+test_run_preflight_checks()
+test_preflight_checks()
@@ -0,0 +1,152 @@
+import sys
+import os
+import tempfile
+
+sys.path.append('..')  # Add parent directory to path
+
+from watch_functions import watch_for_changes
+from watch_functions import load_watch_state
+from watch_functions import select_new_projects
+
+
+class FakeChangesSource:
+    """Stands in for the Drive changes feed: polls[i] is the set of file IDs changed before poll i,
+    or a dictionary of file ID -> modified time, or an exception to raise.
+
+    Page tokens count the polls made so far, across restarts. Files in a set get the modified time "t<poll>".
+    """
+
+    def __init__(self, polls):
+        self.polls = list(polls)
+        self.poll_count = 0
+        self.page_token = None
+
+    def get_start_page_token(self):
+        return "0"
+
+    def list_changes(self, page_token):
+        assert self.page_token in (None, page_token), f"Unexpected page token {page_token}"
+        changed = self.polls[self.poll_count] if self.poll_count < len(self.polls) else set()
+        self.poll_count += 1
+        if isinstance(changed, Exception):
+            raise changed
+        self.page_token = str(int(page_token) + 1)
+        if isinstance(changed, set):
+            changed = {file_id: f"t{self.poll_count}" for file_id in changed}
+        return changed, self.page_token
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def watch(state_file, polls, max_polls):
+    source = FakeChangesSource(polls)
+    clock = FakeClock()
+    runs = []
+    def on_change(state):
+        runs.append(clock.now)
+        state["provisioned"].append(f"run-{len(runs)}")
+    watch_for_changes(source, "input-sheet", on_change, state_file, poll_seconds=10, debounce_seconds=30,
+                      max_polls=max_polls, sleep=clock.sleep, clock=clock)
+    return runs
+
+def test_watch_debounces_bursts():
+    """Test that a burst of changes produces a single run once the sheet is quiet"""
+    state_file = os.path.join(tempfile.mkdtemp(), "watch_state.json")
+
+    # Test 1: A fresh watch provisions straight away
+    assert watch(state_file, [], max_polls=1) == [0.0]
+    state = load_watch_state(state_file)
+    assert state["page_token"] == "1" and not state["pending_change"]
+    print("✓ Test 1 passed: Fresh watch runs once on start")
+
+    # Test 2: Three edits 10s apart, plus changes to other files, make one run 30s after the last edit
+    state_file = os.path.join(tempfile.mkdtemp(), "watch_state.json")
+    watch(state_file, [], max_polls=1)
+    polls = [{"input-sheet"}, {"input-sheet", "other"}, {"input-sheet"}, {"other"}, set(), set(), set(), set()]
+    runs = watch(state_file, polls, max_polls=len(polls))
+    assert runs == [50.0], f"Unexpected runs {runs}"
+    print("✓ Test 2 passed: Burst of edits coalesced into one run")
+
+def test_watch_resumes_pending_change():
+    """Test that a change seen before a restart is still processed after it"""
+    state_file = os.path.join(tempfile.mkdtemp(), "watch_state.json")
+    watch(state_file, [], max_polls=1)
+
+    # Stop right after the change is seen, before the debounce delay has passed
+    assert watch(state_file, [{"input-sheet"}], max_polls=1) == []
+    assert load_watch_state(state_file)["pending_change"]
+
+    # After the restart the page token carries on and the pending change is processed
+    runs = []
+    watch_for_changes(FakeChangesSource([]), "input-sheet", lambda state: runs.append(state), state_file,
+                      max_polls=1, sleep=lambda seconds: None)
+    assert len(runs) == 1 and runs[0]["provisioned"] == ["run-1"] and runs[0]["page_token"] == "3"
+    print("✓ Test 3 passed: Pending change processed after a restart")
+
+def test_watch_survives_failures():
+    """Test that failed polls and runs are retried with a back-off instead of stopping the watch"""
+    state_file = os.path.join(tempfile.mkdtemp(), "watch_state.json")
+    watch(state_file, [], max_polls=1)
+
+    # Test 4: A failed poll is retried after the poll interval, then doubling
+    source = FakeChangesSource([ConnectionError("feed down"), ConnectionError("feed down"), {"input-sheet"}])
+    source.page_token = "1"
+    clock = FakeClock()
+    runs = []
+    outcomes = [SystemExit(1), RuntimeError("GitHub down"), None]
+    def on_change(state):
+        runs.append(clock.now)
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+    watch_for_changes(source, "input-sheet", on_change, state_file, poll_seconds=10, debounce_seconds=0,
+                      max_polls=6, sleep=clock.sleep, clock=clock)
+    # Polls fail at 0 and 10 (waiting 10, then 20), the change is seen at 30 and its run
+    # fails at 30 and 70 (waiting 40, then 80) before it succeeds at 150
+    assert runs == [30.0, 70.0, 150.0], f"Unexpected runs {runs}"
+    assert not load_watch_state(state_file)["pending_change"]
+    print("✓ Test 4 passed: Failed polls and runs retried with a back-off")
+
+def test_watch_ignores_own_change():
+    """Test that the change a run makes to the watched file itself doesn't cause another run"""
+    state_file = os.path.join(tempfile.mkdtemp(), "watch_state.json")
+    source = FakeChangesSource([set(), {"input-sheet": "t-own"}, {"input-sheet": "t-later"}])
+    runs = []
+    def on_change(state):
+        runs.append(len(runs))
+        return "t-own"  # The URLs were written back, leaving the sheet with this modified time
+    watch_for_changes(source, "input-sheet", on_change, state_file, poll_seconds=10, debounce_seconds=0,
+                      max_polls=3, sleep=lambda seconds: None)
+    # Run 0 on start; the own write-back seen at poll 2 is ignored; the later edit at poll 3 runs again
+    assert runs == [0, 1], f"Unexpected runs {runs}"
+    print("✓ Test 5 passed: Own write-back ignored, later edits still processed")
+
+def test_select_new_projects():
+    """Test that the watch provisions new rows but not renamed rows that already have a repo and sheet"""
+    all_repo_data = [
+        {"title": "Project Alpha", "repo-name": "project-alpha", "authors": ""},
+        {"title": "Project Beta Renamed", "repo-name": "project-beta-renamed", "authors": "",
+         "github_url": "https://github.com/org/story-project-beta",
+         "google_sheet_url": "https://docs.google.com/spreadsheets/d/beta-sheet-id"},
+        {"title": "Project Gamma", "repo-name": "project-gamma", "authors": ""},
+    ]
+    new, renamed = select_new_projects(all_repo_data, ["project-alpha"])
+    assert new == [all_repo_data[2]], f"Unexpected new projects {new}"
+    assert renamed == [all_repo_data[1]], f"Unexpected renamed projects {renamed}"
+    print("✓ Renamed project with written-back URLs not provisioned again")
+
+# Run all the tests
+test_watch_debounces_bursts()
+test_watch_resumes_pending_change()
+test_watch_survives_failures()
+test_watch_ignores_own_change()
+test_select_new_projects()
@@ -0,0 +1,193 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from google_functions import sanitize_sheet_name
+from google_functions import get_sheet_tab_sizes
+from google_functions import get_drive_folder
+
+from github_functions import get_repo_json
+from github_functions import get_file_text
+from github_functions import get_owner_access
+from github_functions import update_variable_in_source
+
+# GitHub rejects repository names longer than this
+GITHUB_REPO_NAME_MAX_LENGTH = 100
+
+# A generous estimate of the GitHub API requests one project needs, to estimate how long the quota lasts
+GITHUB_REQUESTS_PER_PROJECT = 10
+
+# Every preflight check makes one or two requests and they are all independent, so run them all at once
+PREFLIGHT_WORKERS = 8
+
+def build_name_collision_index(all_repo_data, batch_repo_name_prefix, batch_sheet_name_prefix) -> tuple:
+    """Index every project by the repo and sheet name it will be created under, before any API calls.
+
+    Two different titles can sanitize to the same repo or sheet name (e.g. "Café Stories" and
+    "Caf Stories"), in which case the second project would silently reuse the first one's repo and sheet.
+    The first project to claim a name keeps it; later projects that collide with it are rejected,
+    as are projects whose names are empty or too long for GitHub.
+
+    Returns a tuple of (accepted, rejected).
+        accepted is the list of project dictionaries that are safe to process, in input order.
+        rejected is a list of (project, reason) tuples for the projects that must be skipped.
+    """
+    accepted = []
+    rejected = []
+    repo_names = {}   # lower-cased full repo name -> project that claimed it
+    sheet_names = {}  # case-folded sheet name -> project that claimed it
+
+    for repo_data in all_repo_data:
+        if not repo_data['repo-name']:
+            rejected.append((repo_data, "project name has no characters usable in a GitHub repository name"))
+            continue
+        if not sanitize_sheet_name(repo_data['title']):
+            rejected.append((repo_data, "project name has no characters usable in a Google Sheet name"))
+            continue
+
+        repo_name = f"{batch_repo_name_prefix}-{repo_data['repo-name']}"
+        if len(repo_name) > GITHUB_REPO_NAME_MAX_LENGTH:
+            rejected.append((repo_data, f"repository name '{repo_name}' is longer than "
+                                        f"{GITHUB_REPO_NAME_MAX_LENGTH} characters"))
+            continue
+
+        repo_key = repo_name.lower()  # GitHub repo names are case-insensitive
+        sheet_name = sanitize_sheet_name(f"{batch_sheet_name_prefix}{repo_data['title']}")
+        sheet_key = sheet_name.casefold()
+
+        if repo_key in repo_names:
+            rejected.append((repo_data, f"repository name '{repo_name}' is already used by project "
+                                        f"\"{repo_names[repo_key]['title']}\""))
+            continue
+        if sheet_key in sheet_names:
+            rejected.append((repo_data, f"Google Sheet name '{sheet_name}' is already used by project "
+                                        f"\"{sheet_names[sheet_key]['title']}\""))
+            continue
+
+        repo_names[repo_key] = repo_data
+        sheet_names[sheet_key] = repo_data
+        accepted.append(repo_data)
+
+    return accepted, rejected
+
+
+def check_template_repo(template_path, require_template=True):
+    """Check that the template repository exists and, if required, is marked as a template.
+
+    Returns an error message, or None if the check passed.
+    """
+    repo, e = get_repo_json(template_path)
+    if repo is None:
+        return f"template repository {template_path} can't be read: {e}"
+    if require_template and not repo.get('is_template'):
+        return f"repository {template_path} is not marked as a template (Settings > Template repository)"
+    return None
+
+def check_template_file(template_path, file_name, variable_name):
+    """Check that the template repository has the file to edit, and that it assigns the variable.
+
+    Returns an error message, or None if the check passed.
+    """
+    text, e = get_file_text(template_path, file_name)
+    if text is None:
+        return f"{file_name} can't be read from {template_path}: {e}"
+    _, assignments = update_variable_in_source(text, "", variable_name)
+    if not assignments:
+        return f"{file_name} in {template_path} has no quoted string assigned to {variable_name}"
+    return None
+
+def check_template_sheet(template_sheet_id):
+    """Check that the template data sheet can be read and has the Story!B2 and Story!D2 cells.
+
+    Returns an error message, or None if the check passed.
+    """
+    tab_sizes, e = get_sheet_tab_sizes(template_sheet_id)
+    if e:
+        return f"template data sheet {template_sheet_id} can't be read: {e}"
+    if "Story" not in tab_sizes:
+        return f"template data sheet {template_sheet_id} has no 'Story' tab"
+    rows, columns = tab_sizes["Story"]
+    if rows < 2 or columns < 4:
+        return f"the 'Story' tab of template data sheet {template_sheet_id} is too small for the title (B2) and authors (D2)"
+    return None
+
+def check_sheet_folder(folder_id):
+    """Check that the data sheet folder exists, is a folder, and that the user can add files to it.
+
+    Returns an error message, or None if the check passed.
+    """
+    folder, e = get_drive_folder(folder_id)
+    if folder is None:
+        return f"data sheet folder {folder_id} can't be read: {e}"
+    if folder.get('mimeType') != "application/vnd.google-apps.folder":
+        return f"{folder_id} is not a Google Drive folder"
+    if not folder.get('capabilities', {}).get('canAddChildren'):
+        return f"you can't add files to the data sheet folder {folder_id}"
+    return None
+
+def check_github_token(rate_limit, needs_org_write=False):
+    """Check that the GitHub token works and has the scopes the batch needs.
+
+    rate_limit is the (remaining, limit, scopes, error_message) tuple from get_rate_limit,
+    read once and shared with check_github_quota.
+    Scopes are only checked for classic personal access tokens; other tokens don't report them.
+    Returns an error message, or None if the check passed.
+    """
+    remaining, limit, scopes, e = rate_limit
+    if e:
+        return f"GitHub rate limit can't be read: {e}"
+    if scopes is not None:
+        if "repo" not in scopes and "public_repo" not in scopes:
+            return f"the GitHub token needs the 'repo' or 'public_repo' scope, it has: {', '.join(scopes) or 'none'}"
+        if needs_org_write and "admin:org" not in scopes and "write:org" not in scopes:
+            return f"the GitHub token needs the 'write:org' scope to manage teams, it has: {', '.join(scopes)}"
+    return None
+
+def check_github_quota(rate_limit, project_count):
+    """Estimate whether the GitHub token's hourly API quota lasts for the whole batch.
+
+    rate_limit is the tuple from get_rate_limit, as for check_github_token.
+    Running out is not an error: the quota resets every hour, and projects that fail because of
+    it can be re-run. So this is a warning, with an estimate of how many hours of quota are needed.
+    Returns a warning message, or None if the quota left this hour is enough.
+    """
+    remaining, limit, _, e = rate_limit
+    if e:
+        return f"GitHub rate limit can't be read: {e}"
+    needed = project_count * GITHUB_REQUESTS_PER_PROJECT
+    if remaining >= needed:
+        return None
+    hours = 1 + math.ceil((needed - remaining) / limit)
+    return (f"about {needed} GitHub API requests are needed and {remaining} of {limit} are left this hour, "
+            f"so the batch needs about {hours} hours of quota. Projects that hit the limit will fail; "
+            f"run the script again after the hourly reset to finish them")
+
+def check_owner_access(owner):
+    """Check that the GitHub token can create repositories for the owner.
+
+    Returns an error message, or None if the check passed.
+    """
+    result, e = get_owner_access(owner)
+    if result == "error":
+        return f"access to {owner} can't be checked: {e}"
+    if result == "none":
+        return f"the GitHub token's user is not an active member of {owner}"
+    return None
+
+def run_preflight_checks(checks, max_workers=PREFLIGHT_WORKERS) -> list:
+    """Run independent environment checks all at the same time.
+
+    checks is a dictionary of check name -> function that takes no arguments and returns an
+    error message, or None if the check passed. An exception raised by a check counts as its error.
+
+    Returns a list of (check name, error message) tuples for the failed checks, in the order given.
+    """
+    def run_check(check):
+        try:
+            return check()
+        except Exception as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        errors = list(pool.map(run_check, checks.values()))
+    return [(name, error) for name, error in zip(checks, errors) if error]
+
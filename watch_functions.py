@@ -0,0 +1,125 @@
+import json
+import os
+import time
+
+from google_functions import get_drive_changes_start_page_token
+from google_functions import list_drive_changes
+
+DEFAULT_POLL_SECONDS = 30
+
+# Wait until the input sheet has been quiet this long before running, so a burst of edits
+# (e.g. an instructor moving several students around) turns into one run
+DEFAULT_DEBOUNCE_SECONDS = 60
+
+# After a failed poll or run, wait twice as long as after the last failure before trying again, up to this long
+MAX_RETRY_SECONDS = 15 * 60
+
+
+class DriveChangesSource:
+    """Polls the Google Drive changes feed. Anything with the same two methods can stand in for it."""
+
+    def __init__(self, client=None):
+        self.client = client
+
+    def get_start_page_token(self) -> str:
+        return get_drive_changes_start_page_token(client=self.client)
+
+    def list_changes(self, page_token) -> tuple:
+        """Returns a tuple of (changed_files, new_page_token); changed_files maps file IDs to their modified time."""
+        return list_drive_changes(page_token, client=self.client)
+
+
+def load_watch_state(state_file) -> dict:
+    """Load the watch state saved by an earlier run, or a fresh state if there is none.
+
+    The state has the Drive changes 'page_token', whether a change is still waiting to be
+    processed ('pending_change'), the repo names already provisioned ('provisioned'), and the
+    modified time of the watch's own last change to the file ('own_modified_time').
+    A fresh state has a pending change, so everything missing is provisioned on start.
+    """
+    state = {"page_token": None, "pending_change": True, "provisioned": [], "own_modified_time": None}
+    if os.path.exists(state_file):
+        with open(state_file, "r") as f:
+            state.update(json.load(f))
+    return state
+
+def save_watch_state(state_file, state) -> None:
+    """Save the watch state, swapping the file in so an interrupted write never corrupts it."""
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, state_file)
+
+def select_new_projects(all_repo_data, provisioned) -> tuple:
+    """Pick the projects the watch should provision from a fresh read of the input sheet.
+
+    A project counts as new if its repo name has not been provisioned yet and its row has no
+    GitHub or Data Sheet URL written back by an earlier run. A row with URLs whose repo name is
+    not provisioned was renamed after its repo and sheet were created; like --sync, which finds
+    projects by those URLs, the watch treats it as an existing project instead of creating a
+    second repo and sheet for it. --sync brings the existing ones in line with the new title.
+
+    Returns a tuple of (new, renamed) lists of projects, in input order.
+    """
+    provisioned = set(provisioned)
+    new = []
+    renamed = []
+    for repo_data in all_repo_data:
+        if repo_data['repo-name'] in provisioned:
+            continue
+        if repo_data.get('github_url') or repo_data.get('google_sheet_url'):
+            renamed.append(repo_data)
+        else:
+            new.append(repo_data)
+    return new, renamed
+
+def watch_for_changes(changes_source, watched_file_id, on_change, state_file,
+                      poll_seconds=DEFAULT_POLL_SECONDS, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                      max_polls=None, sleep=time.sleep, clock=time.monotonic) -> None:
+    """Poll for changes to one file and call on_change(state) once per burst of changes.
+
+    A change is only acted on once no further change has been seen for debounce_seconds.
+    The page token and the pending flag are saved after every poll, and on_change can record
+    what it provisioned in the state, so after a restart the watch carries on where it left
+    off, including a change that was seen but not yet processed.
+
+    on_change returns the file's modified time after its own change to the file (e.g. writing
+    URLs back), or None if it made none or can't be sure no one else changed the file meanwhile.
+    The change with exactly that modified time is then ignored, rather than causing another run.
+
+    A poll or run that fails (with any exception, or exit()) is reported and retried after a
+    back-off that doubles with every failure in a row, up to MAX_RETRY_SECONDS; a failed run's
+    change stays pending. Only KeyboardInterrupt stops the watch.
+
+    max_polls limits the number of polls (for tests); by default the watch runs until interrupted.
+    """
+    state = load_watch_state(state_file)
+    last_change_at = clock() - debounce_seconds if state["pending_change"] else None
+    failures = 0
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        polls += 1
+        try:
+            if state["page_token"] is None:
+                state["page_token"] = changes_source.get_start_page_token()
+            changed_files, state["page_token"] = changes_source.list_changes(state["page_token"])
+            if watched_file_id in changed_files and changed_files[watched_file_id] != state["own_modified_time"]:
+                state["pending_change"] = True
+                last_change_at = clock()
+            save_watch_state(state_file, state)
+
+            if state["pending_change"] and clock() - last_change_at >= debounce_seconds:
+                state["own_modified_time"] = on_change(state)
+                state["pending_change"] = False
+                save_watch_state(state_file, state)
+            failures = 0
+        except (Exception, SystemExit) as e:
+            # exit() is raised by helpers that stop the script on errors a one-off run can't recover from
+            retry_seconds = min(poll_seconds * 2 ** failures, MAX_RETRY_SECONDS)
+            failures += 1
+            print(f"\n❌ Watch failed, retrying in {retry_seconds:.0f} seconds: {e!r}")
+            save_watch_state(state_file, state)
+            sleep(retry_seconds)
+            continue
+
+        sleep(poll_seconds)